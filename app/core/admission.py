@@ -0,0 +1,205 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Coroutine, Deque, Dict, Optional
+from fastapi import Request, Response
+from app.core.config import settings
+from app.core.dependencies import client_id
+from app.core.exceptions import RateLimitExceededException, ServiceOverloadedException
+from app.core.metrics import span, ADMISSION_QUEUED, ADMISSION_REJECTED
+from app.core.profiling import SpanRoute
+
+class ConcurrencyLimiter:
+    """Caps concurrent requests, queueing a bounded number of others in FIFO order.
+
+    A request that finds the queue full, or waits longer than `max_wait`
+    seconds, is rejected at once with `ServiceOverloadedException` (503 and
+    `Retry-After`) instead of piling onto the MongoDB connection pool, so the
+    latency of admitted requests stays bounded under overload.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUED.inc(self.name)
+        try:
+            # release() hands its slot straight to the waiter, already counted as active
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            self._forget(waiter)
+            self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # granted just as the request went away
+            else:
+                self._forget(waiter)
+            raise
+        finally:
+            ADMISSION_QUEUED.dec(self.name)
+
+    def _forget(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        ADMISSION_REJECTED.inc(self.name, reason)
+        raise ServiceOverloadedException(settings.admission_retry_after_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
+
+class TokenBucketLimiter:
+    """Per-client token buckets: `rate` requests per second with bursts of up to `burst`.
+
+    Only the `max_clients` most recently seen clients are tracked; an evicted
+    client starts again with a full bucket.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, max_clients: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.rejected = 0
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def check(self, client_id: str):
+        now = time.monotonic()
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = self._buckets[client_id] = [self.burst, now]
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            self.rejected += 1
+            ADMISSION_REJECTED.inc(self.name, "rate_limited")
+            raise RateLimitExceededException(math.ceil((1 - bucket[0]) / self.rate))
+        bucket[0] -= 1
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "burst": self.burst, "clients": len(self._buckets), "rejected": self.rejected}
+
+class AdmissionController:
+    """Per-route admission: a client rate limit, then a concurrency limit.
+
+    Routes listed in ADMISSION_ROUTE_CONCURRENCY get a limiter of their own;
+    every other route shares the default limiter, which bounds the worker's
+    total database-bound concurrency. Exempt routes (streams, in-memory reads)
+    are not limited.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        max_queue, max_wait = settings.admission_max_queue, settings.admission_max_wait_ms / 1000
+        self.default = ConcurrencyLimiter("default", settings.admission_max_concurrency, max_queue, max_wait)
+        self.routes: Dict[str, ConcurrencyLimiter] = {
+            route: ConcurrencyLimiter(route, int(limit), max_queue, max_wait)
+            for route, limit in settings.admission_route_concurrency.items()
+        }
+        self.rate_limits: Dict[str, TokenBucketLimiter] = {
+            route: TokenBucketLimiter(
+                route, rate, max(1.0, rate * settings.rate_limit_burst_seconds), settings.rate_limit_max_clients
+            )
+            for route, rate in settings.rate_limits.items() if rate > 0
+        }
+
+    def limiter_for(self, route: str) -> Optional[ConcurrencyLimiter]:
+        if route in settings.admission_exempt_routes:
+            return None
+        limiter = self.routes.get(route, self.default)
+        return limiter if limiter.limit > 0 else None
+
+    def check_rate(self, route: str, client_id: Optional[str]):
+        rate_limit = self.rate_limits.get(route)
+        if rate_limit is not None:
+            rate_limit.check(client_id or "anonymous")
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": {limiter.name: limiter.stats() for limiter in (self.default, *self.routes.values())},
+            "rate_limits": {name: limiter.stats() for name, limiter in self.rate_limits.items()},
+        }
+
+admission = AdmissionController()
+
+class AdmittedResponse:
+    """Sends the wrapped response, then gives the concurrency slot back"""
+
+    def __init__(self, response: Response, limiter: ConcurrencyLimiter):
+        self.response = response
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+class AdmissionRoute(SpanRoute):
+    """Route class applying admission control before the endpoint and its dependencies run.
+
+    The concurrency slot is held until the response is sent, so streamed bodies
+    (exports, NDJSON listings) that keep reading the database count too.
+    Rejections raise exceptions handled by `add_exception_handlers`.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[None, None, Response]]:
+        handler = super().get_route_handler()
+        name = self.name
+
+        async def admitted_handler(request: Request) -> Response:
+            admission.check_rate(name, client_id(request))
+            limiter = admission.limiter_for(name)
+            if limiter is None:
+                return await handler(request)
+            with span("queue"):
+                await limiter.acquire()
+            try:
+                response = await handler(request)
+            except BaseException:
+                limiter.release()
+                raise
+            return AdmittedResponse(response, limiter)
+
+        return admitted_handler
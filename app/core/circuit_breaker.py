@@ -0,0 +1,103 @@
+import time
+from loguru import logger
+from app.core.config import settings
+from app.core.exceptions import CircuitOpenException
+from app.core.metrics import CIRCUIT_BREAKER_STATE
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitBreaker:
+    """Fails calls to an unhealthy dependency fast instead of waiting on each one.
+
+    Closed: calls go through; `failure_threshold` consecutive failures open the
+    circuit. Open: calls are rejected at once with `CircuitOpenException` for
+    `recovery_timeout` seconds. Half-open: up to `half_open_max_calls` trial
+    calls go through; a success closes the circuit, a failure opens it again.
+
+    Callers wrap each call in `before_call()` and `record_success()` /
+    `record_failure()`, or `record_abandoned()` when the call was cancelled
+    before it had an outcome, so a half-open trial slot is never held forever.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.reset()
+
+    def reset(self):
+        self._state = CLOSED
+        self.failures = 0
+        self.opened_count = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        CIRCUIT_BREAKER_STATE.set(STATE_VALUES[CLOSED], self.name)
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def before_call(self):
+        """Raise `CircuitOpenException` unless a call may go through now"""
+        state = self.state
+        if state == HALF_OPEN and self._trial_calls < self.half_open_max_calls:
+            self._trial_calls += 1
+            return
+        if state != CLOSED:
+            self.rejected += 1
+            raise CircuitOpenException(self.retry_after())
+
+    def record_success(self):
+        self.failures = 0
+        if self._state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        if self._state == HALF_OPEN or (self._state == CLOSED and self.failures >= self.failure_threshold):
+            self._transition(OPEN)
+
+    def record_abandoned(self):
+        """Release the trial slot of a call that ended without an outcome"""
+        if self._state == HALF_OPEN and self._trial_calls > 0:
+            self._trial_calls -= 1
+
+    def retry_after(self) -> int:
+        """Whole seconds until the next trial call is allowed"""
+        if self._state == CLOSED:
+            return 0
+        remaining = self.recovery_timeout - (time.monotonic() - self._opened_at)
+        return max(1, int(remaining + 0.999))
+
+    def _transition(self, state: str):
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.opened_count += 1
+        self._trial_calls = 0
+        self._state = state
+        CIRCUIT_BREAKER_STATE.set(STATE_VALUES[state], self.name)
+        log = logger.warning if state == OPEN else logger.info
+        log("Circuit breaker {} is now {} after {} consecutive failures", self.name, state, self.failures)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            "retry_after": self.retry_after(),
+            "opened": self.opened_count,
+            "rejected": self.rejected,
+        }
+
+external_api_breaker = CircuitBreaker(
+    "external_api",
+    failure_threshold=settings.external_breaker_failure_threshold,
+    recovery_timeout=settings.external_breaker_recovery_seconds,
+    half_open_max_calls=settings.external_breaker_half_open_calls,
+)
@@ -0,0 +1,207 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _get_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _get_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _get_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return value.strip().lower() in ("1", "true", "yes", "on") if value else default
+
+
+def _get_list(name: str, default=()) -> set:
+    """Parse "a,b,c" into a set of names"""
+    value = os.getenv(name)
+    if value is None:
+        return set(default)
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+
+def _get_rates(name: str) -> dict:
+    """Parse "route=rate,route=rate" into a dict of floats"""
+    rates = {}
+    for item in os.getenv(name, "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            rates[key.strip()] = float(value)
+    return rates
+
+
+class Settings:
+    """Application settings read from the environment (and `.env`)."""
+
+    def __init__(self):
+        self.mongodb_url = os.getenv("MONGODB_URL")
+        self.database_name = os.getenv("DATABASE_NAME")
+        self.dadjokes_api_url = os.getenv("DADJOKES_API_URL")
+
+        # Logging
+        self.log_level = os.getenv("LOG_LEVEL", "INFO")
+        self.log_file_level = os.getenv("LOG_FILE_LEVEL", "DEBUG")
+        self.log_json = _get_bool("LOG_JSON", False)
+        self.log_enqueue = _get_bool("LOG_ENQUEUE", True)
+        # Fraction of requests per route (endpoint function name) whose INFO records
+        # reach the console, e.g. "get_joke=0.01,get_random_jokes=0.1"
+        self.log_sample_rates = _get_rates("LOG_SAMPLE_RATES")
+
+        # MongoDB connection pool (per worker)
+        self.mongo_max_pool_size = _get_int("MONGO_MAX_POOL_SIZE", 50)
+        self.mongo_min_pool_size = _get_int("MONGO_MIN_POOL_SIZE", 0)
+        self.mongo_max_idle_time_ms = _get_int("MONGO_MAX_IDLE_TIME_MS", 60_000)
+        self.mongo_connect_timeout_ms = _get_int("MONGO_CONNECT_TIMEOUT_MS", 5_000)
+        self.mongo_server_selection_timeout_ms = _get_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5_000)
+
+        # Shared HTTP client for the external jokes API (per worker)
+        self.http_max_connections = _get_int("HTTP_MAX_CONNECTIONS", 20)
+        self.http_max_keepalive_connections = _get_int("HTTP_MAX_KEEPALIVE_CONNECTIONS", 10)
+        self.http_keepalive_expiry_seconds = _get_float("HTTP_KEEPALIVE_EXPIRY_SECONDS", 30)
+        self.http_timeout_seconds = _get_float("HTTP_TIMEOUT_SECONDS", 10)  # write and pool waits
+        self.http_connect_timeout_seconds = _get_float("HTTP_CONNECT_TIMEOUT_SECONDS", 2)
+        self.http_read_timeout_seconds = _get_float("HTTP_READ_TIMEOUT_SECONDS", 5)
+
+        # External API circuit breaker: open after N consecutive failures, try again after
+        # the recovery time with a few trial calls
+        self.external_breaker_failure_threshold = _get_int("EXTERNAL_BREAKER_FAILURE_THRESHOLD", 5)
+        self.external_breaker_recovery_seconds = _get_float("EXTERNAL_BREAKER_RECOVERY_SECONDS", 30)
+        self.external_breaker_half_open_calls = _get_int("EXTERNAL_BREAKER_HALF_OPEN_CALLS", 1)
+
+        # Jokes prefetched per worker for POST /jokes/sync (0 disables the buffer)
+        self.sync_buffer_size = _get_int("SYNC_BUFFER_SIZE", 10)
+        self.sync_buffer_retry_seconds = _get_float("SYNC_BUFFER_RETRY_SECONDS", 5)
+
+        # Per-worker read-through cache for GET /jokes/{joke_id}
+        self.joke_cache_max_size = _get_int("JOKE_CACHE_MAX_SIZE", 10_000)
+        self.joke_cache_ttl_seconds = _get_float("JOKE_CACHE_TTL_SECONDS", 60)
+        self.joke_cache_negative_ttl_seconds = _get_float("JOKE_CACHE_NEGATIVE_TTL_SECONDS", 5)
+
+        # Prefetched pool behind GET /jokes/random
+        self.random_pool_size = _get_int("RANDOM_POOL_SIZE", 1000)
+        self.random_pool_refill_seconds = _get_float("RANDOM_POOL_REFILL_SECONDS", 30)
+        self.random_no_repeat_window = _get_int("RANDOM_NO_REPEAT_WINDOW", 50)
+        self.random_pool_max_clients = _get_int("RANDOM_POOL_MAX_CLIENTS", 10_000)
+        self.random_max_count = _get_int("RANDOM_MAX_COUNT", 50)
+
+        # In-process full-text index behind GET /jokes/search; every SEARCH_REFRESH_SECONDS it applies
+        # jokes written or deleted by other workers, read from the change feed
+        self.search_refresh_seconds = _get_float("SEARCH_REFRESH_SECONDS", 30)
+        self.search_max_prefix_expansions = _get_int("SEARCH_MAX_PREFIX_EXPANSIONS", 50)
+        self.search_max_page_size = _get_int("SEARCH_MAX_PAGE_SIZE", 100)
+
+        # In-process MinHash LSH index of near-duplicate jokes, behind GET /admin/duplicates.
+        # NEAR_DUPLICATE_THRESHOLD (estimated similarity, 0-1) makes creates reject jokes at
+        # least that similar to a stored one; 0 disables the check. Each band is hashed into
+        # 2**NEAR_DUPLICATE_BUCKET_BITS buckets, which bounds the candidates a lookup scores
+        self.near_duplicate_index = _get_bool("NEAR_DUPLICATE_INDEX", True)
+        self.near_duplicate_threshold = _get_float("NEAR_DUPLICATE_THRESHOLD", 0)
+        self.near_duplicate_bucket_bits = _get_int("NEAR_DUPLICATE_BUCKET_BITS", 16)
+
+        # Counters behind GET /jokes/stats: each worker flushes its deltas every
+        # STATS_FLUSH_SECONDS; one worker recounts them every STATS_RECONCILE_SECONDS
+        self.stats_flush_seconds = _get_float("STATS_FLUSH_SECONDS", 1)
+        self.stats_reconcile_seconds = _get_float("STATS_RECONCILE_SECONDS", 3600)
+        self.stats_max_days = _get_int("STATS_MAX_DAYS", 366)
+
+        # Opt-in profiling (per worker). Requests sent with `X-Profile: <PROFILING_TOKEN>`, and a
+        # PROFILING_SAMPLE_RATE fraction of all requests, are profiled into PROFILING_DIR: folded
+        # stacks sampled every PROFILING_INTERVAL_MS (PROFILING_MODE=sample, flamegraph-ready) or
+        # cProfile stats (PROFILING_MODE=cprofile). Requests taking SLOW_REQUEST_MS or more are
+        # logged with their DB / external API / serialization / queue breakdown; 0 disables it
+        self.profiling_token = os.getenv("PROFILING_TOKEN", "")
+        self.profiling_sample_rate = _get_float("PROFILING_SAMPLE_RATE", 0)
+        self.profiling_mode = os.getenv("PROFILING_MODE", "sample")
+        self.profiling_interval_ms = _get_float("PROFILING_INTERVAL_MS", 1)
+        self.profiling_dir = os.getenv("PROFILING_DIR", "logs/profiles")
+        self.slow_request_ms = _get_float("SLOW_REQUEST_MS", 0)
+        self.slow_request_history = _get_int("SLOW_REQUEST_HISTORY", 100)
+
+        # Pagination for GET /jokes/
+        self.jokes_page_size = _get_int("JOKES_PAGE_SIZE", 100)
+        self.jokes_max_page_size = _get_int("JOKES_MAX_PAGE_SIZE", 1000)
+        self.jokes_stream_batch_size = _get_int("JOKES_STREAM_BATCH_SIZE", 500)
+        # Read routes (endpoint function names, e.g. "get_jokes,get_joke") served through
+        # raw Motor documents and orjson instead of Beanie documents and response_model
+        self.fast_read_routes = _get_list("FAST_READ_ROUTES")
+
+        # Change feed on GET /jokes/changes. Changes younger than CHANGE_FEED_SETTLE_MS are held
+        # back, so a write that took its position before a slower concurrent one committed is
+        # not skipped (keep worker clocks in sync). Tombstones of deleted jokes are pruned after
+        # CHANGE_FEED_RETENTION_SECONDS by one worker, checking every CHANGE_FEED_PRUNE_SECONDS;
+        # cursors older than that get 410 and must resync
+        self.change_feed_page_size = _get_int("CHANGE_FEED_PAGE_SIZE", 100)
+        self.change_feed_max_page_size = _get_int("CHANGE_FEED_MAX_PAGE_SIZE", 1000)
+        self.change_feed_settle_ms = _get_float("CHANGE_FEED_SETTLE_MS", 2000)
+        self.change_feed_retention_seconds = _get_float("CHANGE_FEED_RETENTION_SECONDS", 7 * 24 * 3600)
+        self.change_feed_prune_seconds = _get_float("CHANGE_FEED_PRUNE_SECONDS", 3600)
+
+        # Server-sent events on GET /jokes/stream
+        self.events_queue_size = _get_int("EVENTS_QUEUE_SIZE", 1000)  # per subscriber, then it is dropped
+        self.events_history_size = _get_int("EVENTS_HISTORY_SIZE", 10_000)  # for Last-Event-ID resume
+        self.events_heartbeat_seconds = _get_float("EVENTS_HEARTBEAT_SECONDS", 15)
+        self.events_change_stream = _get_bool("EVENTS_CHANGE_STREAM", False)  # needs a replica set
+
+        # Coalesce concurrent POST /jokes/ inserts into insert_many batches of up to
+        # WRITE_BATCH_MAX_SIZE jokes, waiting at most WRITE_BATCH_MAX_DELAY_MS for a batch to fill
+        self.write_coalescing = _get_bool("WRITE_COALESCING", False)
+        self.write_batch_max_size = _get_int("WRITE_BATCH_MAX_SIZE", 100)
+        self.write_batch_max_delay_ms = _get_float("WRITE_BATCH_MAX_DELAY_MS", 2)
+
+        # Bulk ingest via POST /jokes/bulk
+        self.bulk_chunk_size = _get_int("BULK_CHUNK_SIZE", 1000)
+        self.bulk_max_items = _get_int("BULK_MAX_ITEMS", 100_000)
+
+        # Backups via GET /jokes/export and POST /jokes/import (NDJSON, optionally gzip).
+        # Both stream: memory is bounded by one batch/chunk whatever the collection size.
+        # Level 1 keeps on-the-fly compression cheap; import chunks use BULK_CHUNK_SIZE
+        self.export_batch_size = _get_int("EXPORT_BATCH_SIZE", 1000)
+        self.export_gzip_level = _get_int("EXPORT_GZIP_LEVEL", 1)
+        self.import_max_line_bytes = _get_int("IMPORT_MAX_LINE_BYTES", 64 * 1024)
+        self.import_max_reported_errors = _get_int("IMPORT_MAX_REPORTED_ERRORS", 100)
+
+        # Admission control for the /jokes routes (per worker). Routes share a limit of
+        # ADMISSION_MAX_CONCURRENCY requests in progress (0 disables it) unless given their own in
+        # ADMISSION_ROUTE_CONCURRENCY=bulk_create_jokes=4,export_jokes=2. Up to ADMISSION_MAX_QUEUE
+        # more wait at most ADMISSION_MAX_WAIT_MS; the rest get 503 with Retry-After at once.
+        # RATE_LIMITS=create_joke=5 allows each client 5 requests/s per route (429 beyond),
+        # with bursts of RATE_LIMIT_BURST_SECONDS worth of tokens
+        self.admission_max_concurrency = _get_int("ADMISSION_MAX_CONCURRENCY", 64)
+        self.admission_route_concurrency = _get_rates("ADMISSION_ROUTE_CONCURRENCY")
+        self.admission_max_queue = _get_int("ADMISSION_MAX_QUEUE", 128)
+        self.admission_max_wait_ms = _get_float("ADMISSION_MAX_WAIT_MS", 1000)
+        self.admission_retry_after_seconds = _get_int("ADMISSION_RETRY_AFTER_SECONDS", 1)
+        self.admission_exempt_routes = _get_list("ADMISSION_EXEMPT_ROUTES", ("stream_joke_events", "get_random_jokes"))
+        self.rate_limits = _get_rates("RATE_LIMITS")
+        self.rate_limit_burst_seconds = _get_float("RATE_LIMIT_BURST_SECONDS", 2)
+        self.rate_limit_max_clients = _get_int("RATE_LIMIT_MAX_CLIENTS", 100_000)
+
+        # Cluster-wide leases for jobs that must run on one worker only (e.g. the periodic sync).
+        # A dead holder is replaced within ttl + renew interval; keep worker clocks in sync
+        self.lease_ttl_seconds = _get_float("LEASE_TTL_SECONDS", 15)
+        self.lease_renew_seconds = _get_float("LEASE_RENEW_SECONDS", 5)
+
+        # Startup: the worker accepts connections at once and warms up (database, indexes,
+        # random pool) in the background; /health/ready flips to 200 when done. A warning
+        # is logged if import + warm-up exceed the budget
+        self.startup_budget_seconds = _get_float("STARTUP_BUDGET_SECONDS", 5)
+        self.startup_retry_seconds = _get_float("STARTUP_RETRY_SECONDS", 2)
+
+        # Periodic sync with the external jokes API
+        self.sync_interval_seconds = _get_float("SYNC_INTERVAL_SECONDS", 3600)
+        self.sync_batch_size = _get_int("SYNC_BATCH_SIZE", 50)
+        self.sync_concurrency = _get_int("SYNC_CONCURRENCY", 5)
+        self.sync_rate_limit = _get_float("SYNC_RATE_LIMIT", 5.0)  # requests per second, 0 to disable
+        self.sync_max_retries = _get_int("SYNC_MAX_RETRIES", 3)
+        self.sync_backoff_base_seconds = _get_float("SYNC_BACKOFF_BASE_SECONDS", 0.5)
+        self.sync_backoff_max_seconds = _get_float("SYNC_BACKOFF_MAX_SECONDS", 30)
+
+
+settings = Settings()
@@ -1,9 +1,17 @@
-from fastapi import Path
+from fastapi import Path, Query, Request
 from bson import ObjectId
 from bson.errors import InvalidId
-from app.core.exceptions import InvalidJokeIdException, JokeNotFoundException
+from app.core.cache import joke_cache, MISSING
+from app.core.logging import set_request_sampled
+from app.core.metrics import db_timer
+from app.core.exceptions import (
+    InvalidJokeIdException, InvalidCursorException, JokeNotFoundException, ServiceNotReadyException
+)
 from app.models import Joke
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated, Optional
+
+if TYPE_CHECKING:
+    import httpx
 
 async def validate_joke_id(
     joke_id: Annotated[str, Path(description="The ID of the joke to get")]
@@ -13,8 +21,46 @@ async def validate_joke_id(
     except InvalidId:
         raise InvalidJokeIdException()
 
+async def validate_cursor(
+    after: Annotated[Optional[str], Query(description="Cursor returned in the X-Next-Cursor header of the previous page")] = None
+) -> Optional[ObjectId]:
+    if after is None:
+        return None
+    try:
+        return ObjectId(after)
+    except InvalidId:
+        raise InvalidCursorException()
+
+async def sample_request_logs(request: Request):
+    """Router-level dependency applying the per-route INFO log sample rate"""
+    route = request.scope.get("route")
+    set_request_sampled(route.name if route is not None else "")
+
+def is_ready(request: Request) -> bool:
+    """Whether the worker finished warming up; always true when the app runs without its lifespan"""
+    resources = getattr(request.app.state, "resources", None)
+    return resources is None or resources.ready
+
+async def require_ready(request: Request):
+    """Router-level dependency answering 503 until the worker is warmed up"""
+    if not is_ready(request):
+        raise ServiceNotReadyException()
+
+def client_id(request: Request) -> Optional[str]:
+    """The caller's X-Client-Id header, or its address"""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else None)
+
+def get_http_client(request: Request) -> Optional["httpx.AsyncClient"]:
+    """The worker's shared HTTP client, or None when the app runs without its lifespan"""
+    resources = getattr(request.app.state, "resources", None)
+    return resources.http_client if resources is not None else None
+
 async def get_joke_or_404(obj_id: ObjectId) -> Joke:
-    joke = await Joke.get(obj_id)
+    joke = joke_cache.get(obj_id)
+    if joke is MISSING:
+        with db_timer("get_joke"):
+            joke = await Joke.get(obj_id)
+        joke_cache.set(obj_id, joke)
     if not joke:
         raise JokeNotFoundException()
-    return joke 
\ No newline at end of file
+    return joke
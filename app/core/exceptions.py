@@ -14,6 +14,27 @@ class InvalidJokeIdException(HTTPException):
             detail="Invalid joke ID format"
         )
 
+class InvalidCursorException(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+class ChangeCursorExpiredException(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_410_GONE,
+            detail="Changes after this cursor were pruned; resync from the start of the feed"
+        )
+
+class InvalidBulkPayloadException(HTTPException):
+    def __init__(self, detail: str = "Bulk body must be a JSON array or NDJSON"):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail
+        )
+
 class DuplicateJokeException(HTTPException):
     def __init__(self):
         super().__init__(
@@ -21,6 +42,13 @@ class DuplicateJokeException(HTTPException):
             detail="Joke already exists"
         )
 
+class NearDuplicateJokeException(HTTPException):
+    def __init__(self, similar_id: str):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A similar joke already exists: {similar_id}"
+        )
+
 class ExternalAPIException(HTTPException):
     def __init__(self):
         super().__init__(
@@ -28,6 +56,50 @@ class ExternalAPIException(HTTPException):
             detail="Failed to fetch joke from external API"
         ) 
 
+class CircuitOpenException(ExternalAPIException):
+    def __init__(self, retry_after: int = 1):
+        super().__init__()
+        self.detail = "External API is unavailable, retry later"
+        self.headers = {"Retry-After": str(retry_after)}
+
+class SearchIndexUnavailableException(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search index is not ready yet"
+        )
+
+class DuplicateIndexUnavailableException(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Near-duplicate index is not ready yet"
+        )
+
+class ServiceNotReadyException(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service is starting up",
+            headers={"Retry-After": "1"}
+        )
+
+class ServiceOverloadedException(HTTPException):
+    def __init__(self, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is overloaded, retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class RateLimitExceededException(HTTPException):
+    def __init__(self, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(retry_after)}
+        )
+
 class DatabaseException(HTTPException):
     def __init__(self, detail: str = "A database error occurred"):
         super().__init__(
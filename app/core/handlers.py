@@ -3,8 +3,18 @@ from fastapi.responses import JSONResponse
 from app.core.exceptions import (
     JokeNotFoundException,
     InvalidJokeIdException,
+    InvalidCursorException,
+    ChangeCursorExpiredException,
+    InvalidBulkPayloadException,
     DuplicateJokeException,
+    NearDuplicateJokeException,
     ExternalAPIException,
+    CircuitOpenException,
+    SearchIndexUnavailableException,
+    DuplicateIndexUnavailableException,
+    ServiceNotReadyException,
+    ServiceOverloadedException,
+    RateLimitExceededException,
     DatabaseException
 )
 
@@ -20,17 +30,81 @@ async def invalid_joke_id_handler(request: Request, exc: InvalidJokeIdException)
         content={"detail": exc.detail}
     )
 
+async def invalid_cursor_handler(request: Request, exc: InvalidCursorException):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail}
+    )
+
+async def change_cursor_expired_handler(request: Request, exc: ChangeCursorExpiredException):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail}
+    )
+
+async def invalid_bulk_payload_handler(request: Request, exc: InvalidBulkPayloadException):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail}
+    )
+
 async def duplicate_joke_handler(request: Request, exc: DuplicateJokeException):
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail}
     )
 
+async def near_duplicate_joke_handler(request: Request, exc: NearDuplicateJokeException):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail}
+    )
+
 async def external_api_handler(request: Request, exc: ExternalAPIException):
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail}
     )
+async def circuit_open_handler(request: Request, exc: CircuitOpenException):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers=exc.headers
+    )
+
+async def search_index_unavailable_handler(request: Request, exc: SearchIndexUnavailableException):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail}
+    )
+
+async def duplicate_index_unavailable_handler(request: Request, exc: DuplicateIndexUnavailableException):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail}
+    )
+
+async def service_not_ready_handler(request: Request, exc: ServiceNotReadyException):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers=exc.headers
+    )
+
+async def service_overloaded_handler(request: Request, exc: ServiceOverloadedException):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers=exc.headers
+    )
+
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceededException):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers=exc.headers
+    )
+
 async def database_exception_handler(request: Request, exc: DatabaseException):
     return JSONResponse(
         status_code=exc.status_code,
@@ -41,6 +115,16 @@ def add_exception_handlers(app):
     """Register all exception handlers to the app"""
     app.add_exception_handler(JokeNotFoundException, joke_not_found_handler)
     app.add_exception_handler(InvalidJokeIdException, invalid_joke_id_handler)
+    app.add_exception_handler(InvalidCursorException, invalid_cursor_handler)
+    app.add_exception_handler(ChangeCursorExpiredException, change_cursor_expired_handler)
+    app.add_exception_handler(InvalidBulkPayloadException, invalid_bulk_payload_handler)
     app.add_exception_handler(DuplicateJokeException, duplicate_joke_handler) 
+    app.add_exception_handler(NearDuplicateJokeException, near_duplicate_joke_handler)
     app.add_exception_handler(ExternalAPIException, external_api_handler) 
+    app.add_exception_handler(CircuitOpenException, circuit_open_handler)
+    app.add_exception_handler(SearchIndexUnavailableException, search_index_unavailable_handler)
+    app.add_exception_handler(DuplicateIndexUnavailableException, duplicate_index_unavailable_handler)
+    app.add_exception_handler(ServiceNotReadyException, service_not_ready_handler)
+    app.add_exception_handler(ServiceOverloadedException, service_overloaded_handler)
+    app.add_exception_handler(RateLimitExceededException, rate_limit_exceeded_handler)
     app.add_exception_handler(DatabaseException, database_exception_handler) 
\ No newline at end of file
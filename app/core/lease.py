@@ -0,0 +1,109 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from loguru import logger
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.models import Lease
+
+# Identifies this process across the cluster (host, pid and a random suffix for restarts)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class LeaderLease:
+    """MongoDB-backed lease so that one worker cluster-wide runs a job.
+
+    The holder renews the lease every `renew_interval` seconds; if it stops
+    (crash, hang, lost database), the lease expires after `ttl` seconds and the
+    next worker to try takes it. Acquiring and renewing are one conditional
+    upsert: it matches only a lease we hold or one that has expired, and the
+    unique `_id` makes a concurrent insert fail for all but one worker.
+
+    Leadership is also tracked locally against the monotonic clock, so a holder
+    that cannot reach the database gives up its job no later than others may
+    take over.
+    """
+
+    def __init__(self, name: str, ttl: float = 15, renew_interval: float = 5, worker_id: str = WORKER_ID):
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.worker_id = worker_id
+        self._valid_until = 0.0
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._valid_until
+
+    async def try_acquire(self) -> bool:
+        """Acquire or renew the lease; returns whether this worker holds it"""
+        started = time.monotonic()
+        now = datetime.utcnow()
+        try:
+            await Lease.get_motor_collection().update_one(
+                {"_id": self.name, "$or": [{"holder": self.worker_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {
+                    "holder": self.worker_id,
+                    "expires_at": now + timedelta(seconds=self.ttl),
+                    "renewed_at": now,
+                }},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Held by another worker and not expired
+            self._valid_until = 0.0
+            return False
+        if not self.is_leader:
+            logger.info("Acquired lease {} as {}", self.name, self.worker_id)
+        self._valid_until = started + self.ttl
+        return True
+
+    async def release(self):
+        """Give up the lease so another worker can take over right away"""
+        self._valid_until = 0.0
+        await Lease.get_motor_collection().delete_one({"_id": self.name, "holder": self.worker_id})
+
+    async def run(self, job: Callable[[], Awaitable]):
+        """Keep competing for the lease and run `job()` only while holding it"""
+        task: Optional[asyncio.Task] = None
+        try:
+            while True:
+                try:
+                    leader = await self.try_acquire()
+                except Exception as e:
+                    logger.error("Error renewing lease {}: {}", self.name, e)
+                    leader = self.is_leader
+                if leader and (task is None or task.done()):
+                    task = asyncio.create_task(job())
+                elif not leader and task is not None:
+                    logger.warning("Lost lease {}, stopping its job", self.name)
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    task = None
+                await asyncio.sleep(self.renew_interval)
+        finally:
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            if self.is_leader:
+                try:
+                    await self.release()
+                except Exception as e:
+                    logger.error("Error releasing lease {}: {}", self.name, e)
+
+    async def status(self) -> dict:
+        doc = await Lease.get_motor_collection().find_one({"_id": self.name})
+        now = datetime.utcnow()
+        return {
+            "name": self.name,
+            "holder": doc["holder"] if doc else None,
+            "expires_at": doc["expires_at"] if doc else None,
+            "expired": doc is None or doc["expires_at"] < now,
+            "is_leader": self.is_leader,
+        }
+
+def create_lease(name: str) -> LeaderLease:
+    return LeaderLease(name, ttl=settings.lease_ttl_seconds, renew_interval=settings.lease_renew_seconds)
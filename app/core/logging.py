@@ -1,8 +1,143 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import random
 import sys
+import threading
+import traceback
+from contextvars import ContextVar
 from pathlib import Path
+from queue import SimpleQueue
 from loguru import logger
 from fastapi.logger import logger as fastapi_logger
+from app.core.config import settings
+
+# Whether INFO records of the current request reach the console, see set_request_sampled
+_request_sampled: ContextVar[bool] = ContextVar("request_sampled", default=True)
+
+_COLORS = {
+    "TRACE": "\x1b[36m", "DEBUG": "\x1b[34m", "INFO": "\x1b[1m", "SUCCESS": "\x1b[32;1m",
+    "WARNING": "\x1b[33;1m", "ERROR": "\x1b[31;1m", "CRITICAL": "\x1b[41;1m",
+}
+_RESET, _GREEN, _CYAN = "\x1b[0m", "\x1b[32m", "\x1b[36m"
+
+def set_request_sampled(route_name: str):
+    """Decide once per request whether its INFO records reach the console"""
+    rate = settings.log_sample_rates.get(route_name, 1.0)
+    _request_sampled.set(rate >= 1.0 or random.random() < rate)
+
+def _sampled(record) -> bool:
+    return record["level"].name != "INFO" or _request_sampled.get()
+
+def format_record(record, serialize: bool = False, colorize: bool = False) -> str:
+    """Render a loguru record as a text line (or a JSON object per line)"""
+    exception = record["exception"]
+    error = "".join(traceback.format_exception(*exception)) if exception else ""
+    if serialize:
+        return json.dumps({
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "name": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "message": record["message"],
+            "extra": record["extra"],
+            "exception": error or None,
+        }, default=str)
+    level = record["level"].name
+    time = record["time"].strftime("%Y-%m-%d %H:%M:%S")
+    location = f"{record['name']}:{record['function']}:{record['line']}"
+    if colorize:
+        color = _COLORS.get(level, "")
+        line = f"{_GREEN}{time}{_RESET} | {color}{level: <8}{_RESET} | {_CYAN}{location}{_RESET} - {color}{record['message']}{_RESET}"
+    else:
+        line = f"{time} | {level: <8} | {location} - {record['message']}"
+    return line + ("\n" + error.rstrip("\n") if error else "")
+
+class BackgroundLogWriter:
+    """Queue-backed loguru sinks whose formatting and I/O run on one writer thread.
+
+    The logging call only builds the loguru record and puts it on a queue, so a
+    slow stdout pipe or disk never adds to request latency. Output goes through
+    stdlib handlers (for file rotation and retention).
+    """
+
+    def __init__(self, enqueue: bool = True):
+        self.enqueue = enqueue
+        self._queue = SimpleQueue()
+        self._thread = None
+
+    def sink(self, handler: logging.Handler, serialize: bool = False, colorize: bool = False):
+        """Build a loguru sink writing to `handler`"""
+        def write(message):
+            item = (handler, serialize, colorize, message.record)
+            if self.enqueue:
+                self._queue.put(item)
+            else:
+                self._write(item)
+        return write
+
+    def start(self):
+        if self.enqueue and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Write out everything still queued and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._write(item)
+
+    @staticmethod
+    def _write(item):
+        handler, serialize, colorize, record = item
+        try:
+            line = format_record(record, serialize, colorize)
+            handler.handle(logging.makeLogRecord({"msg": line, "levelno": record["level"].no}))
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+
+_writer = None
+
+def shutdown_logging():
+    if _writer is not None:
+        _writer.stop()
+
+def configure_sinks(console_stream=None, log_file: Path = Path("logs/app.log")) -> BackgroundLogWriter:
+    """Route loguru to a sampled console sink and a full file sink behind one background writer"""
+    global _writer
+    shutdown_logging()
+    console_stream = console_stream or sys.stdout
+    console = logging.StreamHandler(console_stream)
+    # Rotated daily, 7 days kept
+    file = logging.handlers.TimedRotatingFileHandler(log_file, when="midnight", backupCount=7, encoding="utf-8")
+    colorize = not settings.log_json and hasattr(console_stream, "isatty") and console_stream.isatty()
+
+    _writer = BackgroundLogWriter(enqueue=settings.log_enqueue)
+    logger.configure(handlers=[
+        {
+            "sink": _writer.sink(console, settings.log_json, colorize),
+            "format": "{message}",
+            "level": settings.log_level,
+            "filter": _sampled,
+        },
+        {
+            "sink": _writer.sink(file, settings.log_json),
+            "format": "{message}",
+            "level": settings.log_file_level,
+        },
+    ])
+    _writer.start()
+    return _writer
 
 # Add loguru to requirements.txt
 def setup_logging():
@@ -14,23 +149,6 @@ def setup_logging():
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
 
-    # Configure loguru
-    config = {
-        "handlers": [
-            {
-                "sink": sys.stdout,
-                "format": "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-                "level": "INFO",
-            },
-            {
-                "sink": "logs/app.log",
-                "format": "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-                "rotation": "1 day",
-                "retention": "7 days",
-                "level": "DEBUG",
-            },
-        ],
-    }
-
-    logger.configure(**config)
-    return logger 
\ No newline at end of file
+    configure_sinks(sys.stdout, log_dir / "app.log")
+    atexit.register(shutdown_logging)
+    return logger
@@ -0,0 +1,329 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from pymongo import monitoring
+
+# Metrics are plain dict/list updates without locks: they are written from the event
+# loop thread, so recording a sample costs a dict lookup and an increment. The one
+# exception is the Mongo pool listener, which PyMongo calls from Motor's executor
+# threads; it takes its own lock, off the request path.
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        # Snapshot first: threads (e.g. the Mongo pool listener) may add label sets while we render
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in list(self._values.items())
+        ]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last slot is +Inf) and the sum
+        self._counts: Dict[tuple, List[int]] = {}
+        self._sums: Dict[tuple, float] = {}
+
+    def observe(self, value: float, *labels):
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def count(self, *labels) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, counts in list(self._counts.items()):  # snapshot, as in Counter.render
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(self._sums.get(labels, 0.0))}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class RequestSpans:
+    """Where one request's time went: seconds and number of calls per span ("db", "external_http", ...)"""
+
+    __slots__ = ("seconds", "calls", "endpoint_returned")
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.endpoint_returned: Optional[float] = None  # set by SpanRoute
+
+    def add(self, name: str, seconds: float):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+# Spans of the request being served; None unless ProfilingMiddleware is capturing them,
+# so recording a span outside a captured request costs one ContextVar lookup
+current_spans: ContextVar[Optional[RequestSpans]] = ContextVar("current_spans", default=None)
+
+def record_span(name: str, seconds: float):
+    spans = current_spans.get()
+    if spans is not None:
+        spans.add(name, seconds)
+
+class span:
+    """Time a block into the current request's spans: `with span("serialization"): ...`"""
+
+    __slots__ = ("name", "spans", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.spans = current_spans.get()
+        if self.spans is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.spans is not None:
+            self.spans.add(self.name, time.perf_counter() - self.started)
+        return False
+
+class Timer:
+    """Context manager observing the elapsed time into a histogram and counting errors.
+
+    With `span`, the time is also added to the current request's spans.
+    """
+
+    __slots__ = ("histogram", "labels", "errors", "span", "started")
+
+    def __init__(self, histogram: Histogram, labels: tuple, errors: Counter = None, span: str = None):
+        self.histogram = histogram
+        self.labels = labels
+        self.errors = errors
+        self.span = span
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        self.histogram.observe(elapsed, *self.labels)
+        if self.span is not None:
+            record_span(self.span, elapsed)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(*self.labels)
+        return False
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and status",
+    ("method", "route", "status"), LATENCY_BUCKETS,
+))
+HTTP_REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served",
+))
+DB_OPERATION_DURATION = registry.register(Histogram(
+    "db_operation_duration_seconds", "MongoDB operation latency by operation",
+    ("operation",), LATENCY_BUCKETS,
+))
+DB_OPERATION_ERRORS = registry.register(Counter(
+    "db_operation_errors_total", "MongoDB operations that raised, by operation", ("operation",),
+))
+EXTERNAL_API_DURATION = registry.register(Histogram(
+    "external_api_request_duration_seconds", "Latency of requests to the external jokes API",
+    (), LATENCY_BUCKETS,
+))
+EXTERNAL_API_ERRORS = registry.register(Counter(
+    "external_api_errors_total", "Failed requests to the external jokes API by reason", ("reason",),
+))
+EXTERNAL_API_IN_FLIGHT = registry.register(Gauge(
+    "external_api_requests_in_flight", "Requests to the external jokes API currently open on the shared client",
+))
+CIRCUIT_BREAKER_STATE = registry.register(Gauge(
+    "circuit_breaker_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open", ("breaker",),
+))
+SYNC_BUFFER_DEPTH = registry.register(Gauge(
+    "sync_buffer_depth", "Prefetched external jokes waiting for POST /jokes/sync",
+))
+MONGO_POOL_CONNECTIONS = registry.register(Gauge(
+    "mongo_pool_connections", "Open MongoDB pool connections by server", ("address",),
+))
+MONGO_POOL_CHECKED_OUT = registry.register(Gauge(
+    "mongo_pool_checked_out_connections", "MongoDB pool connections in use by server", ("address",),
+))
+
+EVENT_SUBSCRIBERS = registry.register(Gauge(
+    "joke_event_subscribers", "Open GET /jokes/stream connections",
+))
+EVENT_SUBSCRIBERS_DROPPED = registry.register(Counter(
+    "joke_event_subscribers_dropped_total", "Event stream subscribers disconnected for falling behind",
+))
+
+WRITE_BATCH_SIZE = registry.register(Histogram(
+    "joke_insert_batch_size", "Jokes per coalesced insert_many batch (WRITE_COALESCING)",
+    (), (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+))
+
+ADMISSION_QUEUED = registry.register(Gauge(
+    "admission_queued_requests", "Requests waiting for a concurrency slot, by limiter", ("limiter",),
+))
+ADMISSION_REJECTED = registry.register(Counter(
+    "admission_rejected_total", "Requests shed by admission control, by limiter and reason", ("limiter", "reason"),
+))
+
+SLOW_REQUESTS = registry.register(Counter(
+    "slow_requests_total", "Requests slower than SLOW_REQUEST_MS, by route", ("route",),
+))
+PROFILED_REQUESTS = registry.register(Counter(
+    "profiled_requests_total", "Requests profiled into PROFILING_DIR, by reason", ("reason",),
+))
+
+STARTUP_SECONDS = registry.register(Gauge(
+    "app_startup_seconds", "Duration of each startup phase of this worker", ("phase",),
+))
+
+def db_timer(operation: str) -> Timer:
+    """Time a MongoDB operation: `with db_timer("create_joke"): ...`"""
+    return Timer(DB_OPERATION_DURATION, (operation,), DB_OPERATION_ERRORS, span="db")
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Tracks pool connection counts from PyMongo's connection pool events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def _update(self, gauge: Gauge, event, amount: int):
+        host, port = event.address
+        with self._lock:
+            gauge.inc(f"{host}:{port}", amount=amount)
+
+    def connection_created(self, event):
+        self._update(MONGO_POOL_CONNECTIONS, event, 1)
+
+    def connection_closed(self, event):
+        self._update(MONGO_POOL_CONNECTIONS, event, -1)
+
+    def connection_checked_out(self, event):
+        self._update(MONGO_POOL_CHECKED_OUT, event, 1)
+
+    def connection_checked_in(self, event):
+        self._update(MONGO_POOL_CHECKED_OUT, event, -1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by route template and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                scope["method"], route.path if route is not None else "unmatched", str(status_code)
+            )
@@ -0,0 +1,56 @@
+import functools
+import hashlib
+import re
+import unicodedata
+import zlib
+from typing import List
+
+# 64 permutations of 16 bits each: 128 bytes per joke. LSH splits them into 16 bands of
+# 4 values, so each band is exactly one uint64 and two jokes become candidates when any
+# band matches; with Jaccard similarity s that happens with probability 1 - (1 - s^4)^16
+# (~0.64 at s=0.5, ~0.89 at s=0.6, ~0.99 at s=0.7), while unrelated jokes rarely collide.
+NUM_PERMUTATIONS = 64
+BANDS = 16
+SIGNATURE_DTYPE = "<u2"  # NumPy is imported on first use, keeping it off the app's import path
+SIGNATURE_BYTES = NUM_PERMUTATIONS * 2
+EMPTY_SIGNATURE = b"\xff" * SIGNATURE_BYTES  # text without words; never a near duplicate
+
+TOKEN_RE = re.compile(r"\w+")
+APOSTROPHES_RE = re.compile(r"['\u2019]")  # "don't" and "dont" are the same word
+
+def _coefficients(label: str) -> List[int]:
+    # Derived from a fixed hash rather than a RNG so signatures stay stable across versions
+    return [
+        int.from_bytes(hashlib.blake2b(f"{label}-{i}".encode(), digest_size=8).digest(), "little")
+        for i in range(NUM_PERMUTATIONS)
+    ]
+
+@functools.lru_cache(maxsize=None)
+def _permutations():
+    """Multipliers, increments and shift of the hash permutations, built on first use"""
+    import numpy as np
+    multipliers = np.array(_coefficients("minhash-a"), dtype=np.uint64) | np.uint64(1)
+    increments = np.array(_coefficients("minhash-b"), dtype=np.uint64)
+    return multipliers, increments, np.uint64(64 - 8 * SIGNATURE_BYTES // NUM_PERMUTATIONS)
+
+def shingles(joke_text: str) -> List[str]:
+    """Words and word pairs of the normalized text, so case, punctuation and spacing don't matter"""
+    words = TOKEN_RE.findall(APOSTROPHES_RE.sub("", unicodedata.normalize("NFKC", joke_text).casefold()))
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+def minhash(joke_text: str) -> bytes:
+    """MinHash signature of a joke's shingles, as stored in `Joke.minhash`"""
+    features = set(shingles(joke_text))
+    if not features:
+        return EMPTY_SIGNATURE
+    import numpy as np
+    multipliers, increments, shift = _permutations()
+    hashes = np.fromiter((zlib.crc32(feature.encode()) for feature in features), dtype=np.uint64, count=len(features))
+    # Multiply-shift hashing: one universal hash per permutation, evaluated for all shingles at once
+    values = (hashes[:, None] * multipliers + increments) >> shift
+    return values.min(axis=0).astype(SIGNATURE_DTYPE).tobytes()
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Estimated Jaccard similarity of the shingles behind two signatures"""
+    import numpy as np
+    return float(np.mean(np.frombuffer(first, SIGNATURE_DTYPE) == np.frombuffer(second, SIGNATURE_DTYPE)))
@@ -0,0 +1,238 @@
+import asyncio
+import cProfile
+import functools
+import hmac
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as StackCounter, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Coroutine, Deque, Optional
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from loguru import logger
+from app.core.config import settings
+from app.core.metrics import current_spans, RequestSpans, PROFILED_REQUESTS, SLOW_REQUESTS
+
+# Latest requests slower than SLOW_REQUEST_MS with their span breakdown, behind GET /admin/slow-requests
+slow_requests: Deque[dict] = deque(maxlen=settings.slow_request_history)
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+class StackSampler:
+    """Samples the event loop thread's Python stack every `interval` seconds from a background thread.
+
+    Stacks are counted in the folded format ("outer;inner;leaf count" per line)
+    that flamegraph.pl, speedscope and inferno read directly. Sampling runs
+    beside the loop instead of tracing every call, so it barely slows the
+    profiled request down. The loop serves other requests concurrently, so
+    their stacks show up too.
+    """
+
+    suffix = ".folded"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = StackCounter()
+        self._target = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path: Path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+class CallProfiler:
+    """cProfile over the event loop thread: exact call counts, readable with pstats or snakeviz.
+
+    Traces every call the loop runs while the request is in flight, so it runs
+    several times slower.
+    """
+
+    suffix = ".prof"
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def write(self, path: Path):
+        self._profile.dump_stats(str(path))
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling opted-in requests and capturing the span breakdown of slow ones.
+
+    A request is profiled when it carries `X-Profile: <PROFILING_TOKEN>` or is
+    drawn at PROFILING_SAMPLE_RATE; the profile is written under PROFILING_DIR
+    once the response is sent, named after the id returned in `X-Profile-Id`.
+    One request is profiled at a time per worker. Requests taking at least
+    SLOW_REQUEST_MS are logged with where their time went (database, external
+    API, serialization, admission queue). With every option off a request
+    costs a few attribute reads.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.profiling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+            settings.slow_request_ms > 0 or settings.profiling_sample_rate > 0 or settings.profiling_token
+        ):
+            return await self.app(scope, receive, send)
+
+        reason = None if self.profiling else self._profile_reason(scope)
+        profiler = profile_id = None
+        if reason is not None:
+            self.profiling = True
+            profile_id = uuid.uuid4().hex[:12]
+            profiler = (
+                CallProfiler() if settings.profiling_mode == "cprofile"
+                else StackSampler(settings.profiling_interval_ms / 1000)
+            )
+
+        status_code = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if profile_id is not None:
+                    message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        spans = RequestSpans()
+        token = current_spans.set(spans)
+        started = time.perf_counter()
+        if profiler is not None:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+            elapsed = time.perf_counter() - started
+            current_spans.reset(token)
+            route = scope.get("route")
+            profile_file = None
+            if profiler is not None:
+                self.profiling = False
+                profile_file = await self._write_profile(profiler, profile_id, route, reason)
+            if settings.slow_request_ms > 0 and elapsed * 1000 >= settings.slow_request_ms:
+                self._record_slow(scope, route, status_code, elapsed, spans, profile_file)
+
+    @staticmethod
+    def _profile_reason(scope) -> Optional[str]:
+        token = settings.profiling_token
+        if token:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    if hmac.compare_digest(value, token.encode()):
+                        return "header"
+                    break
+        rate = settings.profiling_sample_rate
+        if rate > 0 and random.random() < rate:
+            return "sampled"
+        return None
+
+    @staticmethod
+    async def _write_profile(profiler, profile_id: str, route, reason: str) -> Optional[str]:
+        directory = Path(settings.profiling_dir)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{route.name if route is not None else 'unmatched'}-{profile_id}"
+        path = directory / (name + profiler.suffix)
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(profiler.write, path)
+        except OSError as e:
+            logger.error("Error writing profile {}: {}", path, e)
+            return None
+        PROFILED_REQUESTS.inc(reason)
+        logger.info("Wrote {} profile of {} to {}", reason, route.path if route is not None else "unmatched", path)
+        return path.name
+
+    @staticmethod
+    def _record_slow(scope, route, status_code: int, elapsed: float, spans: RequestSpans, profile_file: Optional[str]):
+        path = route.path if route is not None else "unmatched"
+        duration_ms = elapsed * 1000
+        breakdown = {
+            name: {"ms": round(seconds * 1000, 2), "calls": spans.calls[name]}
+            for name, seconds in sorted(spans.seconds.items(), key=lambda item: -item[1])
+        }
+        # Spans of concurrent calls (e.g. gathered DB writes) can overlap, so "other" is clamped
+        other_ms = max(0.0, duration_ms - sum(spans.seconds.values()) * 1000)
+        slow_requests.append({
+            "time": datetime.now().isoformat(),
+            "method": scope["method"],
+            "path": path,
+            "route": route.name if route is not None else None,
+            "status": status_code,
+            "duration_ms": round(duration_ms, 2),
+            "spans": breakdown,
+            "other_ms": round(other_ms, 2),
+            "profile": profile_file,
+        })
+        SLOW_REQUESTS.inc(path)
+        logger.warning(
+            "Slow request {} {} ({}) took {:.1f}ms: {}, other {:.1f}ms",
+            scope["method"], path, status_code, duration_ms,
+            ", ".join(f"{name} {span['ms']}ms/{span['calls']}" for name, span in breakdown.items()) or "no spans",
+            other_ms,
+        )
+
+class SpanRoute(APIRoute):
+    """Route class adding a "serialization" span: the time between the endpoint returning and the response being built.
+
+    That covers response_model validation and JSON rendering; endpoints
+    returning a Response (the fast read path) time their own rendering.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[None, None, Response]]:
+        endpoint = self.dependant.call
+        if asyncio.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def timed_endpoint(*args, **kwargs):
+                result = await endpoint(*args, **kwargs)
+                spans = current_spans.get()
+                if spans is not None:
+                    spans.endpoint_returned = time.perf_counter()
+                return result
+
+            self.dependant.call = timed_endpoint
+        handler = super().get_route_handler()
+
+        async def span_handler(request: Request) -> Response:
+            response = await handler(request)
+            spans = current_spans.get()
+            if spans is not None and spans.endpoint_returned is not None:
+                spans.add("serialization", time.perf_counter() - spans.endpoint_returned)
+                spans.endpoint_returned = None
+            return response
+
+        return span_handler
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.core.metrics import STARTUP_SECONDS
+from app.database import init_db
+
+if TYPE_CHECKING:
+    import httpx
+
+def create_http_client() -> "httpx.AsyncClient":
+    """Pooled keep-alive client for the external jokes API"""
+    # httpx (with httpcore) is only needed once the worker talks to the external API,
+    # so it is imported here rather than on the app's import path
+    import httpx
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+        ),
+        timeout=httpx.Timeout(
+            settings.http_timeout_seconds,
+            connect=settings.http_connect_timeout_seconds,
+            read=settings.http_read_timeout_seconds,
+        ),
+    )
+
+class Resources:
+    """Clients and background tasks owned by one worker, opened and closed by the app lifespan"""
+
+    def __init__(self):
+        self.mongo_client: Optional[AsyncIOMotorClient] = None
+        self.http_client: Optional["httpx.AsyncClient"] = None
+        self.tasks: List[asyncio.Task] = []
+        # Set once the worker is warmed up and may receive traffic, see app.main.warm_up
+        self.ready = False
+        self.startup_seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def timed(self, phase: str):
+        """Record how long a startup phase takes"""
+        started = time.perf_counter()
+        yield
+        self.startup_seconds[phase] = round(time.perf_counter() - started, 3)
+        STARTUP_SECONDS.set(self.startup_seconds[phase], phase)
+
+    async def open(self):
+        with self.timed("database"):
+            self.mongo_client = await init_db()
+        with self.timed("http_client"):
+            self.http_client = create_http_client()
+
+    def start_task(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self.tasks.append(task)
+        return task
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks.clear()
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+        if self.mongo_client is not None:
+            self.mongo_client.close()
+            self.mongo_client = None
+        logger.info("Closed shared MongoDB and HTTP clients")
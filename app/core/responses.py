@@ -0,0 +1,28 @@
+from typing import Any, List, Mapping, Optional
+from fastapi import Request
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from app.core.config import settings
+from app.core.metrics import span
+from app.models import JokeOut
+
+# Fast read path: raw Motor documents (or cached jokes) are validated once against
+# JokeOut and encoded with orjson, skipping Beanie document construction and the
+# response_model round trip. Bytes match the regular path: same key order and
+# separators, UTF-8 unescaped, and naive datetimes render identically in both.
+_jokes_adapter = TypeAdapter(List[JokeOut])
+
+def fast_read_enabled(request: Request) -> bool:
+    """Whether the matched route is opted into the fast path (FAST_READ_ROUTES)"""
+    route = request.scope.get("route")
+    return route is not None and route.name in settings.fast_read_routes
+
+def jokes_response(documents: List[Mapping[str, Any]], headers: Optional[dict] = None) -> ORJSONResponse:
+    with span("serialization"):
+        jokes = _jokes_adapter.validate_python(documents)
+        return ORJSONResponse(_jokes_adapter.dump_python(jokes, by_alias=True), headers=headers)
+
+def joke_response(joke: Any, headers: Optional[dict] = None) -> ORJSONResponse:
+    """Render one joke, given as a raw document or a `Joke`"""
+    with span("serialization"):
+        return ORJSONResponse(JokeOut.model_validate(joke).model_dump(by_alias=True), headers=headers)
@@ -1,4 +1,7 @@
-from app.routers import jokes
+from app.routers import admin, health, jokes, metrics
 
 def include_routers(app):
-    app.include_router(jokes.router, tags=["jokes"])
\ No newline at end of file
+    app.include_router(jokes.router, tags=["jokes"])
+    app.include_router(admin.router, tags=["admin"])
+    app.include_router(metrics.router, tags=["metrics"])
+    app.include_router(health.router, tags=["health"])
\ No newline at end of file
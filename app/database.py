@@ -1,18 +1,31 @@
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional
-import os
-from dotenv import load_dotenv
+from app.core.config import settings
+from app.core.metrics import MongoPoolMetrics
 
-load_dotenv()
-
-async def init_db():
-    # Create Motor client
-    client = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
+async def init_db() -> AsyncIOMotorClient:
+    # Create Motor client; the pool is per worker, so size it for one process
+    client = AsyncIOMotorClient(
+        settings.mongodb_url,
+        maxPoolSize=settings.mongo_max_pool_size,
+        minPoolSize=settings.mongo_min_pool_size,
+        maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+        connectTimeoutMS=settings.mongo_connect_timeout_ms,
+        serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+        event_listeners=[MongoPoolMetrics()],
+    )
     
-    # Initialize beanie with the Product document class
-    from app.models import Joke
-    await init_beanie(
-        database=client[os.getenv("DATABASE_NAME")],
-        document_models=[Joke]
-    ) 
\ No newline at end of file
+    try:
+        # Fail fast (and warm the first pooled connection) before building indexes
+        await client.admin.command("ping")
+
+        # Initialize beanie with the document classes
+        from app.models import ChangeSequence, Joke, JokeStats, JokeTombstone, Lease
+        await init_beanie(
+            database=client[settings.database_name],
+            document_models=[Joke, JokeStats, JokeTombstone, ChangeSequence, Lease]
+        )
+    except Exception:
+        client.close()
+        raise
+    return client
@@ -1,28 +1,107 @@
-from fastapi import FastAPI
-from app.database import init_db
+import time
+# Measured before the framework imports below, reported as the "import" startup phase
+_import_started = time.perf_counter()
+
 import asyncio
-from app.tasks.joke_tasks import periodic_joke_sync
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from app.core.resources import Resources
+from app.services.events import joke_events
+from app.services.random_pool import random_joke_pool
+from app.services.duplicate_index import joke_duplicate_index
+from app.services.joke_stats import joke_stats
+from app.services.search_index import joke_search_index
+from app.services.sync_buffer import external_joke_buffer
+from app.services.write_coalescer import joke_insert_coalescer
+from app.tasks.joke_tasks import (
+    changes_lease, periodic_joke_sync, periodic_stats_reconciliation, periodic_tombstone_pruning, stats_lease,
+    sync_lease
+)
+from app.core.config import settings
 from app.core.handlers import add_exception_handlers
 from app.core.logging import setup_logging
+from app.core.metrics import STARTUP_SECONDS, MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
 from app.core.routers import include_routers
 
 # Setup logging
 logger = setup_logging()
 
-app = FastAPI(title="Dad Jokes API")
+async def warm_up(resources: Resources, import_seconds: float):
+    """Connect, build indexes and fill the random pool, then start the background jobs and mark the worker ready.
+
+    Runs after the lifespan has returned, so the worker accepts connections (and
+    answers /health/live) at once; the jokes routes answer 503 until this is done.
+    """
+    started = time.perf_counter()
+    while True:
+        try:
+            await resources.open()
+            break
+        except Exception as e:
+            logger.error("Startup failed, retrying in {}s: {}", settings.startup_retry_seconds, e)
+            await asyncio.sleep(settings.startup_retry_seconds)
+    with resources.timed("random_pool"):
+        try:
+            await random_joke_pool.refill()
+        except Exception as e:
+            logger.error("Error warming random joke pool: {}", e)
+
+    # Every worker competes for the lease; only the holder runs the sync loop
+    resources.start_task(sync_lease.run(lambda: periodic_joke_sync(resources.http_client)))
+    resources.start_task(stats_lease.run(periodic_stats_reconciliation))
+    resources.start_task(changes_lease.run(periodic_tombstone_pruning))
+    resources.start_task(joke_stats.run())
+    resources.start_task(random_joke_pool.run())
+    if settings.sync_buffer_size > 0:
+        resources.start_task(external_joke_buffer.run(resources.http_client))
+    # The search index builds in the background; /jokes/search answers 503 until it is ready
+    resources.start_task(joke_search_index.run())
+    if settings.near_duplicate_index:
+        resources.start_task(joke_duplicate_index.run())
+    if settings.events_change_stream:
+        resources.start_task(joke_events.watch())
 
+    resources.startup_seconds["warm_up"] = round(time.perf_counter() - started, 3)
+    total = import_seconds + resources.startup_seconds["warm_up"]
+    STARTUP_SECONDS.set(resources.startup_seconds["warm_up"], "warm_up")
+    STARTUP_SECONDS.set(total, "total")
+    resources.ready = True
+    logger.info("Application ready in {:.3f}s (import {:.3f}s, {})", total, import_seconds, resources.startup_seconds)
+    if total > settings.startup_budget_seconds:
+        logger.warning("Startup took {:.3f}s, over the {}s budget", total, settings.startup_budget_seconds)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Starting up application")
+    resources = Resources()
+    resources.startup_seconds["import"] = import_seconds
+    app.state.resources = resources
+    warm_up_task = asyncio.create_task(warm_up(resources, import_seconds))
+    logger.info("Application accepting connections, warming up in the background")
+    try:
+        yield
+    finally:
+        logger.info("Shutting down application")
+        warm_up_task.cancel()
+        await asyncio.gather(warm_up_task, return_exceptions=True)
+        await joke_insert_coalescer.close()
+        if resources.ready:
+            await joke_stats.flush()
+        await resources.close()
+
+app = FastAPI(title="Dad Jokes API", lifespan=lifespan)
+
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 add_exception_handlers(app)
 include_routers(app)
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Starting up application")
-    await init_db()
-    asyncio.create_task(periodic_joke_sync())
-    logger.info("Application startup complete")
+import_seconds = round(time.perf_counter() - _import_started, 3)
+STARTUP_SECONDS.set(import_seconds, "import")
 
 
 @app.get("/")
 async def root():
     logger.info("Root endpoint accessed")
-    return {"message": "Welcome to the Dad Jokes API!"} 
\ No newline at end of file
+    return {"message": "Welcome to the Dad Jokes API!"}
@@ -1,20 +1,197 @@
-from beanie import Document
-from typing import Optional
-from datetime import datetime
-from pydantic import BaseModel
+from beanie import Document, PydanticObjectId
+from typing import Annotated, List, Optional
+from datetime import date, datetime
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, field_validator, model_validator
+from pymongo import ASCENDING, IndexModel
+import hashlib
+import unicodedata
+
+def normalize_joke_text(joke_text: str) -> str:
+    """Normalize joke text for duplicate detection (case, unicode form and whitespace)"""
+    return " ".join(unicodedata.normalize("NFKC", joke_text).casefold().split())
+
+def content_hash(joke_text: str) -> str:
+    """Hash of the normalized joke text, used as the unique duplicate key"""
+    return hashlib.sha256(normalize_joke_text(joke_text).encode("utf-8")).hexdigest()
 
 class Joke(Document):
     joke_text: str
     source_id: Optional[str] = None
-    created_at: datetime = datetime.now()
+    created_at: datetime = Field(default_factory=datetime.now)
     updated_at: Optional[datetime] = None
+    content_hash: Optional[str] = Field(default=None, exclude=True)
+    minhash: Optional[bytes] = Field(default=None, exclude=True)  # near-duplicate signature, see app.core.minhash
+    # Position in GET /jokes/changes, reassigned on every write, see app.services.change_feed
+    change_seq: Optional[int] = Field(default=None, exclude=True)
+    changed_at: Optional[datetime] = Field(default=None, exclude=True)
+    created_seq: Optional[int] = Field(default=None, exclude=True)  # change_seq of the insert
+
+    @model_validator(mode="before")
+    @classmethod
+    def fill_content_hash(cls, data):
+        if isinstance(data, dict) and "joke_text" in data:
+            if data.get("content_hash") is None:
+                data = {**data, "content_hash": content_hash(data["joke_text"])}
+            if data.get("minhash") is None:
+                from app.core.minhash import minhash  # deferred: keeps numpy off the model import path
+                data = {**data, "minhash": minhash(data["joke_text"])}
+        return data
 
     class Settings:
         name = "jokes"
+        indexes = [
+            # Sparse so that documents written before the field existed don't collide
+            IndexModel(
+                [("content_hash", ASCENDING)],
+                name="content_hash_unique",
+                unique=True,
+                sparse=True,
+            ),
+            # Lets the stats reconciliation group by day and source off the index
+            IndexModel([("created_at", ASCENDING), ("source_id", ASCENDING)], name="created_at_source_id"),
+            # Pages of the change feed; sparse as jokes written before the feed have no sequence
+            IndexModel([("change_seq", ASCENDING)], name="change_seq", sparse=True),
+        ]
+
+class JokeTombstone(Document):
+    """Marks a deleted joke in the change feed, see app.services.change_feed"""
+    id: PydanticObjectId  # the deleted joke's id
+    change_seq: int
+    changed_at: datetime  # when the joke was deleted
+
+    class Settings:
+        name = "joke_tombstones"
+        indexes = [
+            IndexModel([("change_seq", ASCENDING)], name="change_seq"),
+            # Pruning past CHANGE_FEED_RETENTION_SECONDS
+            IndexModel([("changed_at", ASCENDING)], name="changed_at"),
+        ]
+
+class ChangeSequence(Document):
+    """Cluster-wide counter handing out change feed positions"""
+    id: str  # "jokes"
+    value: int = 0  # last position handed out
+    pruned_through: int = 0  # tombstones up to this position were pruned
+
+    class Settings:
+        name = "sequences"
+
+class Lease(Document):
+    """Cluster-wide lease on a background job, see app.core.lease"""
+    id: str  # lease name
+    holder: str
+    expires_at: datetime  # UTC
+    renewed_at: datetime
+
+    class Settings:
+        name = "leases"
+        indexes = [
+            # Clean up leases abandoned by dead workers; takeover itself checks expires_at
+            IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        ]
+
+class JokeStats(Document):
+    """Incrementally maintained joke counts, see app.services.joke_stats"""
+    id: str  # "all", or "day:YYYY-MM-DD" for the jokes created that day
+    total: int = 0
+    external: int = 0  # jokes with a source_id, i.e. synced from the external API
+    reconciled_at: Optional[datetime] = None
+
+    class Settings:
+        name = "joke_stats"
+
+class JokeOut(BaseModel):
+    """Lightweight read schema for the fast path, serializing exactly like `Joke`"""
+    model_config = ConfigDict(populate_by_name=True, from_attributes=True)
+
+    id: Annotated[str, BeforeValidator(str)] = Field(alias="_id")
+    joke_text: str
+    source_id: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
 
 class JokeCreate(BaseModel):
     joke_text: str
     source_id: Optional[str] = None
 
+class JokeImport(JokeCreate):
+    """One line of a GET /jokes/export backup; ids and timestamps are kept when present"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: Optional[str] = Field(None, alias="_id")
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class JokeUpdate(BaseModel):
-    joke_text: Optional[str] = None 
\ No newline at end of file
+    joke_text: Optional[str] = None  # omit to leave unchanged; null is rejected
+
+    @field_validator("joke_text")
+    @classmethod
+    def reject_null_text(cls, joke_text: Optional[str]) -> str:
+        if joke_text is None:
+            raise ValueError("joke_text cannot be null")
+        return joke_text
+
+class JokeBulkUpdate(BaseModel):
+    id: str
+    joke_text: str
+
+class JokeBulkDelete(BaseModel):
+    ids: List[str]
+
+class JokeSearchResponse(BaseModel):
+    total: int
+    results: List[Joke]
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # "created"/"updated", "duplicate", "not_found", "invalid" or "failed"
+    id: Optional[str] = None
+    detail: Optional[str] = None
+
+class BulkCreateResponse(BaseModel):
+    created: int
+    duplicates: int
+    invalid: int
+    failed: int
+    results: List[BulkItemResult]
+
+class BulkUpdateResponse(BaseModel):
+    updated: int
+    not_found: int
+    duplicates: int
+    invalid: int
+    failed: int
+    results: List[BulkItemResult]
+
+class ImportResponse(BaseModel):
+    created: int
+    duplicates: int
+    invalid: int
+    failed: int
+    errors: List[BulkItemResult]  # the first IMPORT_MAX_REPORTED_ERRORS rejected lines, by line number
+
+class BulkDeleteResponse(BaseModel):
+    deleted: int
+    not_found: int
+
+class JokeChange(BaseModel):
+    op: str  # "created", "updated" or "deleted"
+    id: str = Field(alias="_id")
+    joke: Optional[JokeOut] = None  # the joke as it is now; None when deleted
+
+class JokeChangesResponse(BaseModel):
+    changes: List[JokeChange]  # oldest first
+    next_cursor: str  # pass as `since` to fetch the following changes
+    has_more: bool  # another page can be fetched right away
+
+class DailyJokeCount(BaseModel):
+    date: date
+    count: int
+
+class JokeStatsResponse(BaseModel):
+    total: int
+    external: int  # synced from the external API
+    user: int  # created through the API without a source_id
+    per_day: List[DailyJokeCount]  # jokes created per day, oldest first
+    reconciled_at: Optional[datetime] = None  # last recount from the collection
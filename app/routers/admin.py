@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Query
+from app.core.admission import admission
+from app.core.cache import joke_cache
+from app.core.circuit_breaker import external_api_breaker
+from app.core.config import settings
+from app.core.exceptions import DuplicateIndexUnavailableException
+from app.core.lease import WORKER_ID
+from app.core.profiling import slow_requests
+from app.services.duplicate_index import joke_duplicate_index
+from app.services.joke_service import JokeService
+from app.services.sync_buffer import external_joke_buffer
+from app.tasks.joke_tasks import changes_lease, stats_lease, sync_lease
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+)
+
+@router.get("/cache", summary="Joke cache statistics")
+async def get_cache_stats():
+    """Hit, miss and eviction counters of this worker's joke cache"""
+    return joke_cache.stats()
+
+@router.get("/admission", summary="Admission control statistics")
+async def get_admission_stats():
+    """Active, queued and rejected requests per concurrency limiter and rate limit of this worker"""
+    return admission.stats()
+
+@router.get("/external", summary="External API status")
+async def get_external_api_status():
+    """Circuit breaker state for the external jokes API and this worker's prefetch buffer depth"""
+    return {"circuit_breaker": external_api_breaker.stats(), "sync_buffer": external_joke_buffer.stats()}
+
+@router.get("/leases", summary="Background job leases")
+async def get_leases():
+    """Which worker holds each cluster-wide job lease, and whether it is this one"""
+    leases = [await lease.status() for lease in (sync_lease, stats_lease, changes_lease)]
+    return {"worker_id": WORKER_ID, "leases": leases}
+
+@router.get("/slow-requests", summary="Recent slow requests")
+async def get_slow_requests():
+    """This worker's latest requests over SLOW_REQUEST_MS, newest first, with where their time went"""
+    return {"threshold_ms": settings.slow_request_ms, "requests": list(reversed(slow_requests))}
+
+@router.get("/duplicates", summary="Near-duplicate joke clusters")
+async def get_duplicate_clusters(
+    threshold: float = Query(0.7, gt=0, le=1, description="Minimum estimated similarity between linked jokes"),
+    limit: int = Query(50, ge=1, le=1000, description="Maximum number of clusters, largest first"),
+):
+    """Groups of jokes that reword or re-punctuate each other, from this worker's MinHash index"""
+    if not settings.near_duplicate_index or not joke_duplicate_index.ready:
+        raise DuplicateIndexUnavailableException()
+    clusters = await JokeService.near_duplicate_clusters(threshold, limit)
+    return {
+        "indexed": len(joke_duplicate_index),
+        "clusters": [{"size": len(cluster), "jokes": cluster} for cluster in clusters],
+    }
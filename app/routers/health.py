@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
+from app.core.dependencies import is_ready
+
+router = APIRouter(
+    prefix="/health",
+    tags=["health"],
+)
+
+@router.get("/live", summary="Liveness probe")
+async def live():
+    """The process is up and serving its event loop"""
+    return {"status": "ok"}
+
+@router.get("/ready", summary="Readiness probe")
+async def ready(request: Request):
+    """200 once the worker is warmed up and may receive traffic, 503 while it is starting"""
+    resources = getattr(request.app.state, "resources", None)
+    startup = resources.startup_seconds if resources is not None else {}
+    if is_ready(request):
+        return {"status": "ready", "startup_seconds": startup}
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "starting", "startup_seconds": startup},
+        headers={"Retry-After": "1"},
+    )
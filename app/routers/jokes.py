@@ -1,14 +1,35 @@
-from fastapi import APIRouter, Depends, status
-from typing import List
-from app.models import Joke, JokeCreate, JokeUpdate
-from app.services.joke_service import JokeService
-from app.core.dependencies import validate_joke_id, get_joke_or_404
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from app.models import (
+    Joke, JokeCreate, JokeUpdate, JokeBulkDelete, BulkCreateResponse, BulkUpdateResponse,
+    BulkDeleteResponse, ImportResponse, JokeChangesResponse, JokeSearchResponse, JokeStatsResponse
+)
+from app.services.joke_service import JokeService, ndjson_lines
+from app.services.change_feed import decode_cursor
+from app.services.events import joke_events
+from app.services.random_pool import random_joke_pool
+from app.services.sync_buffer import external_joke_buffer
+from app.services.search_index import joke_search_index
+from app.core.admission import AdmissionRoute
+from app.core.cache import joke_etag, etag_matches
+from app.core.config import settings
+from app.core.responses import fast_read_enabled, joke_response, jokes_response
+from app.core.dependencies import (
+    validate_joke_id, validate_cursor, get_joke_or_404, get_http_client, client_id, require_ready,
+    sample_request_logs
+)
+from app.core.exceptions import InvalidBulkPayloadException, InvalidJokeIdException, SearchIndexUnavailableException
 from bson import ObjectId
+from bson.errors import InvalidId
 from loguru import logger
+import json
 
 router = APIRouter(
     prefix="/jokes",
     tags=["jokes"],
+    dependencies=[Depends(require_ready), Depends(sample_request_logs)],
+    route_class=AdmissionRoute,
 )
 joke_service = JokeService()
 
@@ -22,37 +43,247 @@ async def create_joke(joke: JokeCreate):
         source_id=joke.source_id
     )
 
-@router.get("/", response_model=List[Joke])
-async def get_jokes():
-    logger.info("Fetching all jokes")
-    jokes = await Joke.find_all().to_list()
-    logger.info(f"Retrieved {len(jokes)} jokes")
+async def read_bulk_items(request: Request) -> list:
+    """Parse a bulk body: a JSON array, or one JSON object per line for NDJSON.
+
+    Unparseable NDJSON lines are kept as `None` so they are reported as invalid.
+    """
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError:
+            raise InvalidBulkPayloadException()
+        if not isinstance(items, list):
+            raise InvalidBulkPayloadException()
+
+    if len(items) > settings.bulk_max_items:
+        raise InvalidBulkPayloadException(f"Bulk body exceeds {settings.bulk_max_items} items")
+    return items
+
+@router.post("/bulk", response_model=BulkCreateResponse,
+             summary="Create many jokes",
+             description="Accepts a JSON array of jokes, or NDJSON with `Content-Type: application/x-ndjson`. "
+                         "Each item is reported as created, duplicate, invalid or failed; "
+                         "one bad item does not fail the batch.")
+async def bulk_create_jokes(request: Request):
+    items = await read_bulk_items(request)
+    logger.info("Received bulk request with {} jokes", len(items))
+    results = await joke_service.bulk_create_jokes(items, settings.bulk_chunk_size)
+    return BulkCreateResponse(
+        created=sum(r.status == "created" for r in results),
+        duplicates=sum(r.status == "duplicate" for r in results),
+        invalid=sum(r.status == "invalid" for r in results),
+        failed=sum(r.status == "failed" for r in results),
+        results=results,
+    )
+
+@router.post("/import", response_model=ImportResponse,
+             summary="Import jokes",
+             description="Loads an NDJSON stream such as the output of GET /jokes/export, gzip-compressed when "
+                         "sent as `Content-Type: application/gzip` or with `Content-Encoding: gzip`. The body "
+                         "is read and written in chunks, so uploads of any size use bounded memory. Ids and "
+                         "timestamps are kept when present; duplicates (by content or id) are skipped.")
+async def import_jokes(request: Request):
+    compressed = (request.headers.get("content-encoding") == "gzip"
+                  or request.headers.get("content-type", "").startswith("application/gzip"))
+    logger.info("Importing jokes{}", " (gzip)" if compressed else "")
+    lines = ndjson_lines(request.stream(), compressed, settings.import_max_line_bytes)
+    return await joke_service.import_jokes(lines, settings.bulk_chunk_size)
+
+@router.get("/", response_model=List[Joke],
+            summary="List jokes",
+            description="Returns jokes in ID order, one page at a time. Pass the X-Next-Cursor header "
+                        "of a page as `after` to fetch the next one. With `stream=true` the remaining "
+                        "jokes are streamed as NDJSON instead.")
+async def get_jokes(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.jokes_max_page_size,
+                                 description="Page size (ignored when streaming)"),
+    after: Optional[ObjectId] = Depends(validate_cursor),
+    stream: bool = Query(False, description="Stream all remaining jokes as NDJSON"),
+):
+    if stream:
+        logger.info("Streaming jokes")
+        return StreamingResponse(
+            joke_service.stream_jokes(after, settings.jokes_stream_batch_size),
+            media_type="application/x-ndjson"
+        )
+
+    limit = limit or settings.jokes_page_size
+    logger.info("Fetching jokes page")
+    if fast_read_enabled(request):
+        documents = await joke_service.list_joke_documents(limit, after)
+        headers = {"X-Next-Cursor": str(documents[-1]["_id"])} if len(documents) == limit else None
+        logger.info("Retrieved {} jokes", len(documents))
+        return jokes_response(documents, headers)
+
+    jokes = await joke_service.list_jokes(limit, after)
+    if len(jokes) == limit:
+        response.headers["X-Next-Cursor"] = str(jokes[-1].id)
+    logger.info("Retrieved {} jokes", len(jokes))
     return jokes
 
-@router.get("/{joke_id}", response_model=Joke)
-async def get_joke(obj_id: ObjectId = Depends(validate_joke_id)):
-    logger.info(f"Fetching joke with ID: {obj_id}")
-    return await get_joke_or_404(obj_id)
+@router.get("/export",
+            summary="Export all jokes",
+            description="Streams the whole collection as NDJSON in ID order, read in batches from the "
+                        "database; `gzip=true` compresses the stream on the fly. "
+                        "Load it again with POST /jokes/import.")
+async def export_jokes(gzip: bool = Query(False, description="Compress the stream with gzip")):
+    logger.info("Exporting jokes{}", " (gzip)" if gzip else "")
+    filename = "jokes.ndjson.gz" if gzip else "jokes.ndjson"
+    return StreamingResponse(
+        joke_service.export_jokes(settings.export_batch_size, settings.export_gzip_level if gzip else None),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/random", response_model=List[Joke],
+            summary="Get random jokes",
+            description="Serves random jokes from a prefetched in-memory pool. Jokes recently served "
+                        "to the same client (X-Client-Id header, or client address) are avoided.")
+async def get_random_jokes(
+    request: Request,
+    count: int = Query(1, ge=1, le=settings.random_max_count)
+):
+    # Cold worker: fill the pool once instead of waiting for the background refill
+    await random_joke_pool.fill_if_cold()
+    return random_joke_pool.pick(count, client_id(request))
+
+@router.get("/search", response_model=JokeSearchResponse,
+            summary="Search jokes",
+            description="Full-text search over joke text, best matches first. All words must match; "
+                        "with `prefix=true` the last word also matches as a prefix, for typeahead.")
+async def search_jokes(
+    q: str = Query(..., min_length=1, description="Search query"),
+    limit: int = Query(20, ge=1, le=settings.search_max_page_size),
+    offset: int = Query(0, ge=0),
+    prefix: bool = Query(True, description="Match the last word as a prefix")
+):
+    if not joke_search_index.ready:
+        raise SearchIndexUnavailableException()
+    logger.info("Searching jokes")
+    total, jokes = await joke_service.search_jokes(q, limit, offset, prefix)
+    return JokeSearchResponse(total=total, results=jokes)
+
+@router.get("/stats", response_model=JokeStatsResponse,
+            summary="Joke statistics",
+            description="Total jokes, split into synced (with a `source_id`) and user-created, and jokes "
+                        "created on each of the last `days` days. Served from incrementally maintained "
+                        "counters, so the cost does not grow with the collection.")
+async def get_joke_stats(days: int = Query(30, ge=1, le=settings.stats_max_days)):
+    return await joke_service.get_stats(days)
+
+@router.get("/changes", response_model=JokeChangesResponse,
+            summary="Joke change feed",
+            description="Jokes created, updated or deleted after the `since` cursor, oldest first. Start "
+                        "without `since` to walk the whole collection, then pass each page's `next_cursor`; "
+                        "poll again later when `has_more` is false. A joke changed several times appears once, "
+                        "at its latest change. 410 means the cursor is too old: start over without `since`.")
+async def get_joke_changes(
+    since: Optional[str] = Query(None, description="`next_cursor` of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.change_feed_max_page_size, description="Page size"),
+):
+    position = decode_cursor(since) if since is not None else 0
+    return await joke_service.get_changes(position, limit or settings.change_feed_page_size)
+
+@router.get("/stream",
+            summary="Stream joke changes",
+            description="Server-sent events (`created`, `updated`, `deleted`) for jokes as they change, "
+                        "with heartbeat comments while idle. Reconnect with the `Last-Event-ID` header "
+                        "(or `last_event_id`) to resume; a `reset` event means events were missed and "
+                        "the client should refetch.",
+            response_class=StreamingResponse)
+async def stream_joke_events(
+    request: Request,
+    last_event_id: Optional[str] = Query(None, description="Resume after this event id")
+):
+    subscriber = joke_events.subscribe(request.headers.get("last-event-id") or last_event_id)
+    return StreamingResponse(
+        joke_events.stream(subscriber, settings.events_heartbeat_seconds),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/{joke_id}", response_model=Joke,
+            responses={status.HTTP_304_NOT_MODIFIED: {"description": "Joke unchanged since the given ETag"}})
+async def get_joke(
+    request: Request,
+    response: Response,
+    obj_id: ObjectId = Depends(validate_joke_id)
+):
+    logger.info("Fetching joke with ID: {}", obj_id)
+    joke = await get_joke_or_404(obj_id)
+    etag = joke_etag(joke)
+    if etag_matches(etag, request.headers.get("if-none-match")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    if fast_read_enabled(request):
+        return joke_response(joke, {"ETag": etag})
+    response.headers["ETag"] = etag
+    return joke
 
 @router.put("/{joke_id}", response_model=Joke)
 async def update_joke(
     joke_update: JokeUpdate,
     obj_id: ObjectId = Depends(validate_joke_id)
 ):
-    logger.info(f"Updating joke with ID: {obj_id}")
-    joke = await get_joke_or_404(obj_id)
+    logger.info("Updating joke with ID: {}", obj_id)
     update_data = joke_update.dict(exclude_unset=True)
-    return await joke_service.update_joke(joke, update_data)
+    return await joke_service.update_joke(obj_id, update_data)
 
 @router.delete("/{joke_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_joke(obj_id: ObjectId = Depends(validate_joke_id)):
-    logger.info(f"Deleting joke with ID: {obj_id}")
-    joke = await get_joke_or_404(obj_id)
-    await joke.delete()
-    logger.info(f"Successfully deleted joke with ID: {obj_id}")
+    logger.info("Deleting joke with ID: {}", obj_id)
+    await joke_service.delete_joke(obj_id)
+    logger.info("Successfully deleted joke with ID: {}", obj_id)
+
+@router.patch("/", response_model=BulkUpdateResponse,
+              summary="Update many jokes",
+              description="Accepts a JSON array (or NDJSON) of `{\"id\", \"joke_text\"}` items and applies "
+                          "them in one bulk write. Each item is reported as updated, not_found, "
+                          "duplicate, invalid or failed.")
+async def bulk_update_jokes(request: Request):
+    items = await read_bulk_items(request)
+    logger.info("Received bulk update with {} jokes", len(items))
+    results = await joke_service.bulk_update_jokes(items)
+    return BulkUpdateResponse(
+        updated=sum(r.status == "updated" for r in results),
+        not_found=sum(r.status == "not_found" for r in results),
+        duplicates=sum(r.status == "duplicate" for r in results),
+        invalid=sum(r.status == "invalid" for r in results),
+        failed=sum(r.status == "failed" for r in results),
+        results=results,
+    )
+
+@router.delete("/", response_model=BulkDeleteResponse,
+               summary="Delete many jokes",
+               description="Deletes the jokes with the given IDs in one round trip.")
+async def bulk_delete_jokes(body: JokeBulkDelete):
+    if len(body.ids) > settings.bulk_max_items:
+        raise InvalidBulkPayloadException(f"Bulk body exceeds {settings.bulk_max_items} items")
+    try:
+        joke_ids = list({ObjectId(joke_id): None for joke_id in body.ids})
+    except InvalidId:
+        raise InvalidJokeIdException()
+    logger.info("Received bulk delete with {} jokes", len(joke_ids))
+    deleted = await joke_service.bulk_delete_jokes(joke_ids)
+    return BulkDeleteResponse(deleted=deleted, not_found=len(joke_ids) - deleted)
 
 @router.post("/sync", response_model=Joke, status_code=status.HTTP_201_CREATED)
-async def sync_joke():
-    """Manually trigger fetching and saving a new joke"""
+async def sync_joke(client=Depends(get_http_client)):
+    """Manually trigger fetching and saving a new joke, served from the prefetch buffer when possible"""
     logger.info("Manually syncing new joke")
-    return await joke_service.fetch_and_save_joke()
\ No newline at end of file
+    joke_data = external_joke_buffer.take()
+    if joke_data is not None:
+        return await joke_service.save_external_joke(joke_data)
+    return await joke_service.fetch_and_save_joke(client)
\ No newline at end of file
@@ -0,0 +1,151 @@
+import base64
+import struct
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from bson import ObjectId
+from loguru import logger
+from pymongo import ReplaceOne, ReturnDocument
+from app.core.config import settings
+from app.core.exceptions import ChangeCursorExpiredException, InvalidCursorException
+from app.models import ChangeSequence, Joke, JokeChange, JokeOut, JokeTombstone
+
+SEQUENCE_KEY = "jokes"
+CURSOR_VERSION = 1
+_cursor_format = struct.Struct(">BQ")  # version, position
+# Fields the feed returns, plus its own
+FEED_PROJECTION = {
+    "joke_text": 1, "source_id": 1, "created_at": 1, "updated_at": 1, "change_seq": 1, "changed_at": 1,
+    "created_seq": 1,
+}
+
+def encode_cursor(position: int) -> str:
+    return base64.urlsafe_b64encode(_cursor_format.pack(CURSOR_VERSION, position)).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        version, position = _cursor_format.unpack(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, struct.error):
+        raise InvalidCursorException()
+    if version != CURSOR_VERSION:
+        raise InvalidCursorException()
+    return position
+
+class JokeChangeFeed:
+    """Ordered feed of created, updated and deleted jokes behind GET /jokes/changes.
+
+    Every write takes the next positions of one cluster-wide counter (a batch
+    takes a block with a single `$inc`) and stores them on the jokes as
+    `change_seq`; inserts also keep theirs as `created_seq`, so a joke still at
+    the position of its insert is reported as created and one rewritten since
+    as updated. Deletes leave a tombstone at a new position. A page is the
+    jokes and tombstones after the cursor, merged by position off their
+    `change_seq` indexes. A joke written again moves to its new position, so
+    a consumer only ever sees its latest state.
+
+    Positions are taken before the write commits, so a slow write can land
+    behind positions already served; changes younger than CHANGE_FEED_SETTLE_MS
+    are held back until such writes have committed.
+    """
+
+    async def reserve(self, count: int = 1) -> Tuple[int, datetime]:
+        """Take `count` consecutive positions; returns the first one and the change time"""
+        doc = await ChangeSequence.get_motor_collection().find_one_and_update(
+            {"_id": SEQUENCE_KEY}, {"$inc": {"value": count}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return doc["value"] - count + 1, datetime.now()
+
+    async def stamp(self, docs: List[dict], created: bool = False):
+        """Set `change_seq` and `changed_at` on raw joke documents (or `$set` updates) about to be written.
+
+        With `created`, the documents are inserts and also get `created_seq`.
+        """
+        if not docs:
+            return
+        first, now = await self.reserve(len(docs))
+        for position, doc in enumerate(docs):
+            doc["change_seq"] = first + position
+            doc["changed_at"] = now
+            if created:
+                doc["created_seq"] = first + position
+
+    async def record_deletes(self, joke_ids: List[ObjectId]):
+        """Write a tombstone for each deleted joke, replacing one left by an earlier delete of the same id"""
+        if not joke_ids:
+            return
+        first, now = await self.reserve(len(joke_ids))
+        await JokeTombstone.get_motor_collection().bulk_write([
+            ReplaceOne({"_id": joke_id}, {"change_seq": first + position, "changed_at": now}, upsert=True)
+            for position, joke_id in enumerate(joke_ids)
+        ], ordered=False)
+
+    async def read(self, since: int, limit: int) -> Tuple[List[JokeChange], int, bool]:
+        """Up to `limit` settled changes after position `since`, the position to continue from, and whether more are ready"""
+        sequence = await ChangeSequence.get_motor_collection().find_one({"_id": SEQUENCE_KEY}) or {}
+        # A consumer starting from 0 has no copies of pruned jokes to delete
+        if 0 < since < sequence.get("pruned_through", 0):
+            raise ChangeCursorExpiredException()
+
+        query = {"change_seq": {"$gt": since}}
+        jokes = await Joke.get_motor_collection().find(query, FEED_PROJECTION).sort("change_seq", 1).to_list(limit + 1)
+        tombstones = await JokeTombstone.get_motor_collection().find(query).sort("change_seq", 1).to_list(limit + 1)
+        entries = sorted(jokes + tombstones, key=lambda doc: doc["change_seq"])[:limit + 1]
+
+        settled_before = datetime.now() - timedelta(milliseconds=settings.change_feed_settle_ms)
+        changes, position = [], since
+        for doc in entries[:limit]:
+            if doc["changed_at"] > settled_before:
+                return changes, position, False
+            if "joke_text" in doc:
+                op = "updated" if doc.get("created_seq", doc["change_seq"]) != doc["change_seq"] else "created"
+                changes.append(JokeChange(op=op, _id=str(doc["_id"]), joke=JokeOut.model_validate(doc)))
+            else:
+                changes.append(JokeChange(op="deleted", _id=str(doc["_id"])))
+            position = doc["change_seq"]
+        return changes, position, len(entries) > limit and entries[limit]["changed_at"] <= settled_before
+
+    async def position(self) -> int:
+        """The last position handed out"""
+        doc = await ChangeSequence.get_motor_collection().find_one({"_id": SEQUENCE_KEY})
+        return doc["value"] if doc is not None else 0
+
+    async def scan(self, since: int, projection: dict) -> Tuple[List[dict], int]:
+        """Every joke (with `projection`) and tombstone after position `since`, in order, and where to scan from next.
+
+        For in-process copies such as the search index: nothing is held back,
+        but the returned position stops before the first change younger than
+        CHANGE_FEED_SETTLE_MS, so slower concurrent writes are picked up next
+        time. Applying a change twice must be harmless. Tombstones have no
+        fields besides `_id`, `change_seq` and `changed_at`.
+        """
+        query = {"change_seq": {"$gt": since}}
+        projection = {**projection, "change_seq": 1, "changed_at": 1}
+        jokes = await Joke.get_motor_collection().find(query, projection).to_list(None)
+        tombstones = await JokeTombstone.get_motor_collection().find(query).to_list(None)
+        entries = sorted(jokes + tombstones, key=lambda doc: doc["change_seq"])
+
+        settled_before = datetime.now() - timedelta(milliseconds=settings.change_feed_settle_ms)
+        position = since
+        for doc in entries:
+            if doc["changed_at"] > settled_before:
+                break
+            position = doc["change_seq"]
+        return entries, position
+
+    async def prune(self, retention_seconds: float) -> int:
+        """Delete tombstones older than `retention_seconds`, recording how far the feed was pruned"""
+        collection = JokeTombstone.get_motor_collection()
+        cutoff = datetime.now() - timedelta(seconds=retention_seconds)
+        newest = await collection.find({"changed_at": {"$lt": cutoff}}, {"change_seq": 1}) \
+            .sort("change_seq", -1).limit(1).to_list(1)
+        if not newest:
+            return 0
+        pruned_through = newest[0]["change_seq"]
+        # Recorded first, so cursors are rejected before the tombstones they need disappear
+        await ChangeSequence.get_motor_collection().update_one(
+            {"_id": SEQUENCE_KEY}, {"$max": {"pruned_through": pruned_through}}, upsert=True
+        )
+        result = await collection.delete_many({"change_seq": {"$lte": pruned_through}})
+        logger.info("Pruned {} joke tombstones through position {}", result.deleted_count, pruned_through)
+        return result.deleted_count
+
+joke_change_feed = JokeChangeFeed()
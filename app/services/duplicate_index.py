@@ -0,0 +1,275 @@
+import asyncio
+from array import array
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from bson import ObjectId
+from loguru import logger
+from app.core.config import settings
+from app.core.minhash import BANDS, EMPTY_SIGNATURE, NUM_PERMUTATIONS, SIGNATURE_DTYPE, minhash
+from app.models import Joke
+from app.services.change_feed import joke_change_feed
+
+if TYPE_CHECKING:
+    import numpy as np
+
+ID_SIZE = 12  # bytes in an ObjectId
+BAND_MIX = 0x9E3779B97F4A7C15  # spreads a band's 64 bits over the bucket range
+REINDEX_OVERFLOW_BUCKETS = 100_000  # fold new jokes into the CSR tables past this many overflow buckets
+
+class JokeDuplicateIndex:
+    """In-process MinHash LSH index for finding near-duplicate jokes.
+
+    Signatures (see `app.core.minhash`) live in one growable NumPy matrix,
+    128 bytes per joke. Each of the 16 bands hashes to one of `2**bucket_bits`
+    buckets. Buckets are a CSR table per band (ordinals sorted by bucket, plus
+    bucket offsets) built with one vectorized argsort; jokes added since go to
+    a small overflow table of `array('I')` until the next `reindex()`.
+
+    A lookup collects the ordinals of its 16 buckets and scores them all
+    against its signature in one vectorized comparison, so its cost grows with
+    bucket occupancy (about 16 * jokes / 2**bucket_bits candidates), not with
+    the collection. Removal only clears an alive flag; `compact()` drops
+    removed jokes once most of the index is dead.
+
+    The NumPy arrays are allocated on first use, so importing this module (and
+    the app) does not load NumPy.
+    """
+
+    def __init__(self, bucket_bits: int = 16):
+        self.bucket_bits = bucket_bits
+        self.reset()
+
+    def reset(self, capacity: int = 1024):
+        self._capacity = capacity
+        self._signatures: Optional["np.ndarray"] = None  # see _allocate
+        self._size = 0
+        self._ids = bytearray()
+        self._ordinals: Dict[bytes, int] = {}
+        self._indexed = 0  # ordinals below this are in the CSR tables
+        self._overflow: Dict[int, array] = {}  # band << bucket_bits | bucket -> ordinals
+        self._position = 0  # change feed position the index is up to date with
+        self.ready = False
+
+    def _allocate(self):
+        import numpy as np
+        self._signatures = np.empty((self._capacity, NUM_PERMUTATIONS), dtype=SIGNATURE_DTYPE)
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        self._members = np.empty((BANDS, 0), dtype=np.uint32)
+        self._offsets = np.zeros((BANDS, (1 << self.bucket_bits) + 1), dtype=np.int64)
+
+    def __len__(self):
+        return len(self._ordinals)
+
+    def __contains__(self, joke_id: ObjectId):
+        return joke_id.binary in self._ordinals
+
+    def _bucket_keys(self, signatures: "np.ndarray") -> "np.ndarray":
+        """Bucket of each band, for one signature or a matrix of them"""
+        import numpy as np
+        bands = np.ascontiguousarray(signatures).view("<u8")
+        return (bands * np.uint64(BAND_MIX)) >> np.uint64(64 - self.bucket_bits)
+
+    def _append(self, joke_id: ObjectId, signature: bytes) -> Optional[int]:
+        """Store a signature without bucketing it, returning its ordinal (None if there is nothing new to bucket)"""
+        key = joke_id.binary
+        signature = bytes(signature)  # Binary when read back through some drivers
+        if key in self._ordinals:
+            if self._signatures[self._ordinals[key]].tobytes() == signature:
+                return None  # unchanged, e.g. a catch-up replaying this worker's own write
+            self._remove_key(key)
+        if signature == EMPTY_SIGNATURE:
+            return None
+        import numpy as np
+        if self._signatures is None:
+            self._allocate()
+        if self._size == len(self._alive):
+            self._grow(2 * self._size)
+        ordinal = self._size
+        self._size += 1
+        self._signatures[ordinal] = np.frombuffer(signature, dtype=SIGNATURE_DTYPE)
+        self._alive[ordinal] = True
+        self._ids += key
+        self._ordinals[key] = ordinal
+        return ordinal
+
+    def add(self, joke_id: ObjectId, signature: bytes):
+        """Index a joke's signature, replacing any previous version of it"""
+        ordinal = self._append(joke_id, signature)
+        if ordinal is None:
+            return
+        for band, bucket in enumerate(self._bucket_keys(self._signatures[ordinal]).tolist()):
+            key = band << self.bucket_bits | bucket
+            ordinals = self._overflow.get(key)
+            if ordinals is None:
+                ordinals = self._overflow[key] = array("I")
+            ordinals.append(ordinal)
+
+    def reindex(self):
+        """Move every stored signature into the CSR bucket tables, emptying the overflow"""
+        import numpy as np
+        if self._signatures is None:
+            self._allocate()
+        bands = self._signatures[:self._size].view("<u8")
+        self._members = np.empty((BANDS, self._size), dtype=np.uint32)
+        mix, shift = np.uint64(BAND_MIX), np.uint64(64 - self.bucket_bits)
+        for band in range(BANDS):  # one band at a time keeps the temporaries small
+            keys = ((bands[:, band] * mix) >> shift).astype(np.int64)
+            self._members[band] = np.argsort(keys, kind="stable")
+            np.cumsum(np.bincount(keys, minlength=1 << self.bucket_bits), out=self._offsets[band, 1:])
+        self._indexed = self._size
+        self._overflow = {}
+
+    def remove(self, joke_id: ObjectId):
+        key = joke_id.binary
+        if key in self._ordinals:
+            self._remove_key(key)
+            self._maybe_compact()
+
+    def _remove_key(self, key: bytes):
+        self._alive[self._ordinals.pop(key)] = False
+
+    def _grow(self, capacity: int):
+        import numpy as np
+        signatures = np.empty((capacity, NUM_PERMUTATIONS), dtype=SIGNATURE_DTYPE)
+        signatures[:self._size] = self._signatures[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._signatures, self._alive = signatures, alive
+
+    def _maybe_compact(self):
+        dead = self._size - len(self._ordinals)
+        if dead > 10_000 and dead > len(self._ordinals):
+            self.compact()
+
+    def compact(self):
+        """Rebuild without removed jokes"""
+        import numpy as np
+        if self._signatures is None:
+            return
+        live = np.flatnonzero(self._alive[:self._size])
+        signatures = self._signatures[live]
+        ids = b"".join(bytes(self._ids[ordinal * ID_SIZE:(ordinal + 1) * ID_SIZE]) for ordinal in live.tolist())
+        ready, position = self.ready, self._position
+        self.reset(capacity=max(1024, len(live)))
+        self._allocate()
+        self._signatures[:len(live)] = signatures
+        self._alive[:len(live)] = True
+        self._size = len(live)
+        self._ids = bytearray(ids)
+        self._ordinals = {ids[i * ID_SIZE:(i + 1) * ID_SIZE]: i for i in range(len(live))}
+        self.reindex()
+        self.ready, self._position = ready, position
+
+    def _id_at(self, ordinal: int) -> ObjectId:
+        return ObjectId(bytes(self._ids[ordinal * ID_SIZE:(ordinal + 1) * ID_SIZE]))
+
+    def similar(self, signature: bytes, threshold: float, limit: int = 10) -> List[Tuple[ObjectId, float]]:
+        """Indexed jokes whose estimated similarity to `signature` is at least `threshold`, best first"""
+        signature = bytes(signature)
+        if signature == EMPTY_SIGNATURE or self._signatures is None:
+            return []
+        import numpy as np
+        row = np.frombuffer(signature, dtype=SIGNATURE_DTYPE)
+        buckets = []
+        for band, bucket in enumerate(self._bucket_keys(row).tolist()):
+            start, end = self._offsets[band, bucket], self._offsets[band, bucket + 1]
+            if end > start:
+                buckets.append(self._members[band, start:end])
+            ordinals = self._overflow.get(band << self.bucket_bits | bucket)
+            if ordinals:
+                buckets.append(np.frombuffer(ordinals, dtype=np.uint32))
+        if not buckets:
+            return []
+        candidates = np.unique(np.concatenate(buckets))
+        candidates = candidates[self._alive[candidates]]
+        scores = (self._signatures[candidates] == row).mean(axis=1)
+        matches = np.flatnonzero(scores >= threshold)
+        best = matches[np.argsort(-scores[matches], kind="stable")][:limit]
+        return [(self._id_at(int(candidates[i])), float(scores[i])) for i in best]
+
+    async def clusters(self, threshold: float, window: int = 64) -> List[List[ObjectId]]:
+        """Groups of jokes linked by pairwise similarity of at least `threshold`, largest first.
+
+        Candidate pairs share a band; per band the signatures are sorted by
+        band value and each joke is compared with the next `window` jokes in
+        its group, all vectorized. Yields to the event loop between bands.
+        """
+        if self._signatures is None:
+            return []
+        import numpy as np
+        live = np.flatnonzero(self._alive[:self._size])
+        signatures = self._signatures[live]
+        bands = signatures.view("<u8")
+        parent = list(range(len(live)))
+
+        def find(node: int) -> int:
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for band in range(BANDS):
+            order = np.argsort(bands[:, band], kind="stable")
+            values = bands[order, band]
+            for offset in range(1, window + 1):
+                same = np.flatnonzero(values[:-offset] == values[offset:])
+                if not len(same):
+                    break
+                left, right = order[same], order[same + offset]
+                scores = (signatures[left] == signatures[right]).mean(axis=1)
+                linked = scores >= threshold
+                for first, second in zip(left[linked].tolist(), right[linked].tolist()):
+                    parent[find(first)] = find(second)
+            await asyncio.sleep(0)
+
+        groups: Dict[int, List[int]] = {}
+        for node in range(len(live)):
+            root = find(node)
+            if root != node or node in groups:
+                groups.setdefault(root, []).append(node)
+        clusters = [members for members in groups.values() if len(members) > 1]
+        clusters.sort(key=len, reverse=True)
+        return [[self._id_at(int(live[node])) for node in members] for members in clusters]
+
+    async def build(self, batch_size: int = 5000):
+        """(Re)build the index from a streamed cursor, hashing jokes stored without a signature"""
+        self.reset()
+        # Taken first: jokes written during the scan are applied again by the next catch-up
+        position = await joke_change_feed.position()
+        cursor = Joke.get_motor_collection().find({}, {"minhash": 1, "joke_text": 1}, batch_size=batch_size)
+        async for doc in cursor:
+            self._append(doc["_id"], doc.get("minhash") or minhash(doc["joke_text"]))
+        self.reindex()
+        self._position = position
+        self.ready = True
+        logger.info("Built near-duplicate index over {} jokes", len(self))
+
+    async def catch_up(self):
+        """Apply jokes created, updated and deleted since the last build or catch-up, by any worker"""
+        changes, self._position = await joke_change_feed.scan(self._position, {"minhash": 1, "joke_text": 1})
+        for doc in changes:
+            if "joke_text" in doc:
+                self.add(doc["_id"], doc.get("minhash") or minhash(doc["joke_text"]))
+            else:  # tombstone
+                self.remove(doc["_id"])
+
+    async def run(self):
+        """Build the index, retrying with backoff, then periodically apply changes made by other workers"""
+        delay = settings.startup_retry_seconds
+        while True:
+            try:
+                await self.build()
+                break
+            except Exception as e:
+                logger.error("Error building near-duplicate index, retrying in {}s: {}", delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, settings.search_refresh_seconds)
+        while True:
+            await asyncio.sleep(settings.search_refresh_seconds)
+            try:
+                await self.catch_up()
+                if len(self._overflow) > REINDEX_OVERFLOW_BUCKETS:
+                    self.reindex()
+            except Exception as e:
+                logger.error("Error refreshing near-duplicate index: {}", e)
+
+joke_duplicate_index = JokeDuplicateIndex(bucket_bits=settings.near_duplicate_bucket_bits)
@@ -0,0 +1,186 @@
+import asyncio
+import uuid
+from collections import deque
+from typing import Any, Deque, Optional, Set, Tuple
+import orjson
+from loguru import logger
+from pymongo.errors import OperationFailure, PyMongoError
+from app.core.config import settings
+from app.core.metrics import EVENT_SUBSCRIBERS, EVENT_SUBSCRIBERS_DROPPED
+from app.models import Joke, JokeOut
+
+NOT_A_REPLICA_SET = 40573  # change streams need a replica set or sharded cluster
+RESET_FRAME = b"event: reset\ndata: {}\n\n"
+HEARTBEAT_FRAME = b": keep-alive\n\n"
+
+def joke_payload(joke: Any) -> dict:
+    """Event data for a joke given as a `Joke` or raw document, shaped like the API output"""
+    return JokeOut.model_validate(joke).model_dump(by_alias=True)
+
+class Subscriber:
+    """One SSE connection: a bounded queue of encoded frames.
+
+    A subscriber that falls `max_size` frames behind is dropped rather than
+    slowing the broadcaster or growing without bound; its stream ends and the
+    client reconnects with `Last-Event-ID` to resume from the history.
+    """
+
+    __slots__ = ("max_size", "dropped", "_frames", "_ready")
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.dropped = False
+        self._frames: Deque[bytes] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, frame: bytes) -> bool:
+        if self.dropped:
+            return False
+        if len(self._frames) >= self.max_size:
+            self.dropped = True
+            self._frames.clear()
+        else:
+            self._frames.append(frame)
+        self._ready.set()
+        return not self.dropped
+
+    async def next(self) -> Optional[bytes]:
+        """The next frame, or None once the subscriber has been dropped"""
+        while not self._frames:
+            if self.dropped:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        return self._frames.popleft()
+
+class JokeEventBroadcaster:
+    """In-process fan-out of joke created/updated/deleted events to SSE subscribers.
+
+    Each event is encoded once as an SSE frame and appended to every
+    subscriber's queue, so publishing costs O(subscribers) appends and idle
+    connections cost nothing until an event or heartbeat. Event ids are
+    `<epoch>-<sequence>`; the epoch changes per process, so a client resuming
+    against another worker (or after a restart) gets a `reset` event telling it
+    to refetch instead of silently missing events.
+
+    By default `JokeService` publishes the writes of this worker. With
+    `watch()` running against a replica set, events come from a MongoDB change
+    stream instead, which also covers writes made by other workers.
+    """
+
+    def __init__(self, queue_size: int, history_size: int):
+        self.queue_size = queue_size
+        self.history_size = history_size
+        self.change_stream_active = False
+        self.reset()
+
+    def reset(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._history: Deque[Tuple[int, bytes]] = deque(maxlen=self.history_size)
+        self._subscribers: Set[Subscriber] = set()
+        EVENT_SUBSCRIBERS.set(0)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def publish(self, event_type: str, data: dict):
+        """Send an event to all subscribers"""
+        self._sequence += 1
+        frame = b"id: %s-%d\nevent: %s\ndata: %s\n\n" % (
+            self.epoch.encode(), self._sequence, event_type.encode(), orjson.dumps(data)
+        )
+        self._history.append((self._sequence, frame))
+        dropped = [subscriber for subscriber in self._subscribers if not subscriber.push(frame)]
+        for subscriber in dropped:
+            self.unsubscribe(subscriber)
+            EVENT_SUBSCRIBERS_DROPPED.inc()
+        if dropped:
+            logger.warning("Dropped {} slow event stream subscribers", len(dropped))
+
+    def notify(self, event_type: str, data: dict):
+        """Publish a write made by this worker, unless the change stream already covers it"""
+        if not self.change_stream_active:
+            self.publish(event_type, data)
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscriber:
+        """Register a subscriber, replaying events after `last_event_id` when still in history"""
+        subscriber = Subscriber(self.queue_size)
+        if last_event_id:
+            backlog = self._events_after(last_event_id)
+            if backlog is None or len(backlog) > self.queue_size:
+                subscriber.push(RESET_FRAME)
+            else:
+                for frame in backlog:
+                    subscriber.push(frame)
+        self._subscribers.add(subscriber)
+        EVENT_SUBSCRIBERS.set(len(self._subscribers))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        EVENT_SUBSCRIBERS.set(len(self._subscribers))
+
+    def _events_after(self, last_event_id: str):
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        oldest = self._history[0][0] if self._history else self._sequence + 1
+        if sequence < oldest - 1 or sequence > self._sequence:
+            return None
+        return [frame for number, frame in self._history if number > sequence]
+
+    async def stream(self, subscriber: Subscriber, heartbeat: float):
+        """Yield SSE frames for one subscriber, with heartbeats while idle"""
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.next(), heartbeat)
+                except asyncio.TimeoutError:
+                    frame = HEARTBEAT_FRAME
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def watch(self):
+        """Publish events from a MongoDB change stream on the jokes collection.
+
+        Falls back to events from this worker's own writes if the deployment
+        does not support change streams.
+        """
+        resume_token = None
+        while True:
+            try:
+                collection = Joke.get_motor_collection()
+                async with collection.watch(full_document="updateLookup", resume_after=resume_token) as changes:
+                    self.change_stream_active = True
+                    logger.info("Publishing joke events from the MongoDB change stream")
+                    async for change in changes:
+                        resume_token = changes.resume_token
+                        self._publish_change(change)
+            except OperationFailure as e:
+                self.change_stream_active = False
+                if e.code == NOT_A_REPLICA_SET:
+                    logger.warning("Change streams need a replica set; publishing this worker's writes only")
+                    return
+                logger.error("Joke change stream failed: {}", e)
+            except PyMongoError as e:
+                self.change_stream_active = False
+                logger.error("Joke change stream failed: {}", e)
+            await asyncio.sleep(1)
+
+    def _publish_change(self, change: dict):
+        operation = change["operationType"]
+        document = change.get("fullDocument")
+        if operation == "insert":
+            self.publish("created", joke_payload(document))
+        elif operation in ("update", "replace") and document is not None:
+            self.publish("updated", joke_payload(document))
+        elif operation == "delete":
+            self.publish("deleted", {"_id": str(change["documentKey"]["_id"])})
+
+joke_events = JokeEventBroadcaster(settings.events_queue_size, settings.events_history_size)
@@ -1,77 +1,694 @@
-import httpx
-from app.models import Joke
-from app.core.exceptions import DuplicateJokeException, ExternalAPIException, DatabaseException
-import os
-from dotenv import load_dotenv
+from app.models import (
+    Joke, JokeCreate, JokeImport, JokeBulkUpdate, JokeChangesResponse, JokeStatsResponse, BulkItemResult,
+    ImportResponse, content_hash
+)
+from app.core.cache import joke_cache
+from app.core.circuit_breaker import external_api_breaker
+from app.core.minhash import minhash
+from app.core.config import settings
+from app.core.dependencies import get_joke_or_404
+from app.core.metrics import db_timer, record_span, EXTERNAL_API_DURATION, EXTERNAL_API_ERRORS, EXTERNAL_API_IN_FLIGHT
+from app.services.change_feed import encode_cursor, joke_change_feed
+from app.services.duplicate_index import JokeDuplicateIndex, joke_duplicate_index
+from app.services.events import joke_events, joke_payload
+from app.services.joke_stats import joke_stats
+from app.services.random_pool import random_joke_pool
+from app.services.search_index import joke_search_index
+from app.services.write_coalescer import joke_insert_coalescer
+from app.core.exceptions import (
+    DuplicateJokeException, NearDuplicateJokeException, ExternalAPIException, DatabaseException,
+    JokeNotFoundException, InvalidBulkPayloadException
+)
 from datetime import datetime
+import asyncio
+import time
+import zlib
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+from pydantic import ValidationError
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 from loguru import logger
 
-load_dotenv()
+if TYPE_CHECKING:
+    import httpx
+
+DUPLICATE_KEY_ERROR = 11000
+# Fields returned by the API, for raw Motor reads on the fast path
+JOKE_PROJECTION = {"joke_text": 1, "source_id": 1, "created_at": 1, "updated_at": 1}
+# Fields the /jokes/stats counters are keyed on
+STATS_PROJECTION = {"source_id": 1, "created_at": 1}
+
+GZIP_WBITS = 31  # zlib window bits for the gzip container
+INFLATE_STEP = 1 << 20  # decompress at most this many bytes per step (bounds gzip bombs)
+
+def _inflate(decompressor, data: bytes) -> Iterator[bytes]:
+    while data:
+        yield decompressor.decompress(data, INFLATE_STEP)
+        data = decompressor.unconsumed_tail
+
+async def ndjson_lines(chunks: AsyncIterator[bytes], compressed: bool = False,
+                       max_line_bytes: int = 64 * 1024) -> AsyncIterator[List[Optional[bytes]]]:
+    """Split a streamed, optionally gzip-compressed body into lists of complete lines.
+
+    Only the current partial line is buffered. A line longer than `max_line_bytes`
+    is skipped and reported as a single `None` entry.
+    """
+    decompressor = zlib.decompressobj(GZIP_WBITS) if compressed else None
+    buffer = b""
+    skipping = False
+    try:
+        async for chunk in chunks:
+            for data in (_inflate(decompressor, chunk) if decompressor else (chunk,)):
+                lines = (buffer + data).split(b"\n")
+                buffer = lines.pop()
+                if skipping and lines:
+                    del lines[0]  # tail of the oversized line
+                    skipping = False
+                lines = [line if len(line) <= max_line_bytes else None for line in lines]
+                if len(buffer) > max_line_bytes:
+                    if not skipping:
+                        lines.append(None)
+                    buffer, skipping = b"", True
+                if lines:
+                    yield lines
+    except zlib.error:
+        raise InvalidBulkPayloadException("Body is not valid gzip")
+    if decompressor is not None and not decompressor.eof:
+        raise InvalidBulkPayloadException("Truncated gzip body")
+    if buffer and not skipping:
+        yield [buffer]
+
+def forget_joke(joke_id: ObjectId):
+    """Drop a changed or deleted joke from this worker's in-memory read paths"""
+    joke_cache.invalidate(joke_id)
+    random_joke_pool.discard(joke_id)
+
+def forget_jokes(joke_ids: List[ObjectId]):
+    """`forget_joke` for a batch, filtering the random pool once"""
+    for joke_id in joke_ids:
+        joke_cache.invalidate(joke_id)
+    random_joke_pool.discard_many(set(joke_ids))
+
+def index_joke(joke_id: ObjectId, joke_text: str, signature: bytes):
+    """Add a new or changed joke to this worker's search and near-duplicate indexes"""
+    joke_search_index.add(joke_id, joke_text)
+    joke_duplicate_index.add(joke_id, signature)
+
+def unindex_joke(joke_id: ObjectId):
+    joke_search_index.remove(joke_id)
+    joke_duplicate_index.remove(joke_id)
 
 class JokeService:
+    @staticmethod
+    def _find_after(after: Optional[ObjectId], **kwargs):
+        """Jokes in `_id` order, starting after the given keyset cursor"""
+        query = {"_id": {"$gt": after}} if after is not None else {}
+        return Joke.find(query, **kwargs).sort("_id")
+
+    @staticmethod
+    async def list_jokes(limit: int, after: Optional[ObjectId] = None) -> List[Joke]:
+        """Return one keyset-paginated page of jokes"""
+        with db_timer("list_jokes"):
+            return await JokeService._find_after(after).limit(limit).to_list()
+
+    @staticmethod
+    async def list_joke_documents(limit: int, after: Optional[ObjectId] = None) -> List[dict]:
+        """Like `list_jokes`, but as raw projected documents instead of Beanie documents"""
+        query = {"_id": {"$gt": after}} if after is not None else {}
+        cursor = Joke.get_motor_collection().find(query, JOKE_PROJECTION).sort("_id", 1).limit(limit)
+        with db_timer("list_jokes"):
+            return await cursor.to_list(length=None)
+
+    @staticmethod
+    async def stream_jokes(after: Optional[ObjectId] = None, batch_size: int = 500) -> AsyncIterator[str]:
+        """Yield jokes as NDJSON lines, reading the collection one cursor batch at a time"""
+        async for joke in JokeService._find_after(after, batch_size=batch_size):
+            yield joke.model_dump_json(by_alias=True) + "\n"
+
+    @staticmethod
+    async def export_jokes(batch_size: int = 1000, gzip_level: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield the whole collection as NDJSON in `_id` order, one chunk per cursor batch.
+
+        With `gzip_level` the output is a gzip stream compressed on the fly.
+        """
+        compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, GZIP_WBITS) if gzip_level is not None else None
+        cursor = Joke.get_motor_collection().find({}, JOKE_PROJECTION, batch_size=batch_size).sort("_id", 1)
+        while True:
+            with db_timer("export_jokes"):
+                documents = await cursor.to_list(length=batch_size)
+            if not documents:
+                break
+            # default=str renders the ObjectId; datetimes are ISO 8601 as in the API output
+            chunk = b"".join(orjson.dumps(doc, default=str, option=orjson.OPT_APPEND_NEWLINE) for doc in documents)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if compressor is not None:
+            yield compressor.flush()
+
+    @staticmethod
+    async def import_jokes(lines: AsyncIterator[List[Optional[bytes]]], chunk_size: int = 1000) -> ImportResponse:
+        """Insert jokes from NDJSON lines (as produced by `export_jokes`), one chunk at a time.
+
+        The next lines are only read once the current chunk is written, so memory
+        stays bounded and a slow database slows the upload down. Duplicates, by
+        content or by `_id`, are rejected by the unique indexes, which makes
+        re-running an interrupted import safe.
+        """
+        counts = {"created": 0, "duplicate": 0, "invalid": 0, "failed": 0}
+        errors: List[BulkItemResult] = []
+        pending: List[Tuple[int, dict]] = []
+        now = datetime.now()
+
+        def report(index: int, status: str, detail: Optional[str] = None):
+            counts[status] += 1
+            if status != "created" and len(errors) < settings.import_max_reported_errors:
+                errors.append(BulkItemResult(index=index, status=status, detail=detail))
+
+        async def flush():
+            failed = await JokeService._insert_new_jokes([doc for _, doc in pending], "import_jokes")
+            for position, (index, _) in enumerate(pending):
+                if position not in failed:
+                    report(index, "created")
+                elif failed[position] == DUPLICATE_KEY_ERROR:
+                    report(index, "duplicate", "Joke already exists")
+                else:
+                    report(index, "failed", "Failed to insert joke")
+            pending.clear()
+
+        index = -1  # line number, counting blank lines
+        async for batch in lines:
+            for line in batch:
+                index += 1
+                if line is not None and not line.strip():
+                    continue
+                try:
+                    if line is None:
+                        raise ValueError(f"Line exceeds {settings.import_max_line_bytes} bytes")
+                    joke = JokeImport.model_validate(orjson.loads(line))
+                    joke_id = ObjectId(joke.id) if joke.id is not None else ObjectId()
+                except ValidationError as e:
+                    report(index, "invalid", e.errors()[0]["msg"])
+                except (ValueError, InvalidId) as e:  # unparseable line or bad _id
+                    report(index, "invalid", str(e))
+                else:
+                    pending.append((index, {
+                        "_id": joke_id,
+                        "joke_text": joke.joke_text,
+                        "source_id": joke.source_id,
+                        "created_at": joke.created_at or now,
+                        "updated_at": joke.updated_at,
+                        "content_hash": content_hash(joke.joke_text),
+                        "minhash": minhash(joke.joke_text),
+                    }))
+                    if len(pending) >= chunk_size:
+                        await flush()
+        if pending:
+            await flush()
+        errors.sort(key=lambda error: error.index)
+
+        logger.info("Import finished: {} created, {} duplicates, {} invalid, {} failed",
+                    counts["created"], counts["duplicate"], counts["invalid"], counts["failed"])
+        return ImportResponse(
+            created=counts["created"], duplicates=counts["duplicate"],
+            invalid=counts["invalid"], failed=counts["failed"], errors=errors,
+        )
+
+    @staticmethod
+    async def get_stats(days: int) -> JokeStatsResponse:
+        """Joke counts from the incrementally maintained counters, without scanning the collection"""
+        with db_timer("get_stats"):
+            return await joke_stats.read(days)
+
+    @staticmethod
+    async def get_changes(since: int, limit: int) -> JokeChangesResponse:
+        """One page of the change feed after position `since`"""
+        with db_timer("get_changes"):
+            changes, position, has_more = await joke_change_feed.read(since, limit)
+        return JokeChangesResponse(changes=changes, next_cursor=encode_cursor(position), has_more=has_more)
+
+    @staticmethod
+    async def search_jokes(query: str, limit: int, offset: int = 0, prefix: bool = True) -> Tuple[int, List[Joke]]:
+        """Rank jokes against the search index and load the requested page"""
+        total, ids = joke_search_index.search(query, limit=limit, offset=offset, prefix=prefix)
+        if not ids:
+            return total, []
+        with db_timer("search_jokes"):
+            found = {joke.id: joke for joke in await Joke.find({"_id": {"$in": ids}}).to_list()}
+        # Jokes deleted by another worker may still be indexed here; skip them
+        return total, [found[joke_id] for joke_id in ids if joke_id in found]
+
+    @staticmethod
+    async def near_duplicate_clusters(threshold: float, limit: int) -> List[List[dict]]:
+        """The `limit` largest groups of near-duplicate jokes, each as `_id`/`joke_text` documents"""
+        clusters = (await joke_duplicate_index.clusters(threshold))[:limit]
+        ids = [joke_id for cluster in clusters for joke_id in cluster]
+        if not ids:
+            return []
+        with db_timer("near_duplicate_clusters"):
+            texts = {
+                doc["_id"]: doc["joke_text"]
+                async for doc in Joke.get_motor_collection().find({"_id": {"$in": ids}}, {"joke_text": 1})
+            }
+        # Jokes deleted by another worker may still be indexed here; skip them
+        clusters = [
+            [{"_id": str(joke_id), "joke_text": texts[joke_id]} for joke_id in cluster if joke_id in texts]
+            for cluster in clusters
+        ]
+        return [cluster for cluster in clusters if len(cluster) > 1]
+
     @staticmethod
     async def create_joke(joke_text: str, source_id: str = None) -> Joke:
-        logger.info(f"Creating new joke with text: {joke_text[:30]}...")
+        logger.info("Creating new joke with text: {}...", joke_text[:30])
         try:
-            # Check for duplicate
-            existing_joke = await Joke.find_one({"joke_text": joke_text})
-            if existing_joke:
-                logger.warning(f"Duplicate joke found: {joke_text[:30]}...")
-                raise DuplicateJokeException()
-            
             new_joke = Joke(
                 joke_text=joke_text,
                 source_id=source_id
             )
-            await new_joke.insert()
-            logger.info(f"Successfully created joke with ID: {new_joke.id}")
+            similar = await JokeService._near_duplicates([{"_id": new_joke.id, "minhash": new_joke.minhash}])
+            if similar:
+                raise NearDuplicateJokeException(str(similar[0]))
+            # Shielded: a queued joke is written even if the caller goes away, so its
+            # stats, index entries and event must follow it
+            await asyncio.shield(JokeService._insert_joke(new_joke))
+            logger.info("Successfully created joke with ID: {}", new_joke.id)
             return new_joke
-        except DuplicateJokeException:
+        except DuplicateKeyError:
+            logger.warning("Duplicate joke found: {}...", joke_text[:30])
+            raise DuplicateJokeException()
+        except NearDuplicateJokeException:
+            logger.warning("Near-duplicate joke found: {}...", joke_text[:30])
             raise
         except Exception as e:
-            logger.error(f"An error occurred while creating a joke: {str(e)}")
+            logger.error("An error occurred while creating a joke: {}", e)
             raise DatabaseException("Failed to update joke") from e
 
     @staticmethod
-    async def update_joke(joke: Joke, update_data: dict) -> Joke:
-        logger.info(f"Updating joke with ID: {joke.id}")
+    async def _insert_joke(new_joke: Joke):
+        """Insert a new joke, then record it in this worker's caches, indexes, stats and event stream"""
+        # Duplicates are rejected by the unique content_hash index
+        with db_timer("create_joke"):
+            if settings.write_coalescing:  # the coalescer stamps change_seq per batch
+                new_joke.id = ObjectId()
+                await joke_insert_coalescer.insert({
+                    "_id": new_joke.id,
+                    "joke_text": new_joke.joke_text,
+                    "source_id": new_joke.source_id,
+                    "created_at": new_joke.created_at,
+                    "updated_at": new_joke.updated_at,
+                    "content_hash": new_joke.content_hash,
+                    "minhash": new_joke.minhash,
+                })
+            else:
+                new_joke.change_seq, new_joke.changed_at = await joke_change_feed.reserve()
+                new_joke.created_seq = new_joke.change_seq
+                await new_joke.insert()
+        joke_cache.invalidate(new_joke.id)
+        index_joke(new_joke.id, new_joke.joke_text, new_joke.minhash)
+        joke_stats.record(new_joke.created_at, new_joke.source_id)
+        joke_events.notify("created", joke_payload(new_joke))
+
+    @staticmethod
+    async def update_joke(joke_id: ObjectId, update_data: dict) -> Joke:
+        """Apply a partial update in one round trip and return the updated joke.
+
+        Duplicates are rejected by the unique content_hash index and a missing
+        joke by the empty `find_one_and_update` result.
+        """
+        logger.info("Updating joke with ID: {}", joke_id)
+        if not update_data:
+            return await get_joke_or_404(joke_id)
+        update_data = dict(update_data)
+        if "joke_text" in update_data:
+            update_data["content_hash"] = content_hash(update_data["joke_text"])
+            update_data["minhash"] = minhash(update_data["joke_text"])
+        update_data["updated_at"] = datetime.now()
         try:
-            if update_data:
-                existing_joke = await Joke.find_one({"joke_text":update_data['joke_text']})
-                if existing_joke:
-                    logger.warning(f"Duplicate joke found: {update_data['joke_text'][:30]}...")
-                    raise DuplicateJokeException()
-                update_data["updated_at"] = datetime.now()
-                await joke.update({"$set": update_data})
-                logger.info(f"Successfully updated joke with ID: {joke.id}")
-            return joke
-        except DuplicateJokeException:
-            raise
+            # Beanie's Document.update hides duplicate key errors, so write through Motor
+            with db_timer("update_joke"):
+                await joke_change_feed.stamp([update_data])
+                doc = await Joke.get_motor_collection().find_one_and_update(
+                    {"_id": joke_id}, {"$set": update_data}, return_document=ReturnDocument.AFTER
+                )
+        except DuplicateKeyError:
+            logger.warning("Duplicate joke found: {}...", update_data['joke_text'][:30])
+            raise DuplicateJokeException()
         except Exception as e:
-            logger.error(f"An error occurred while updating joke with ID {joke.id}: {str(e)}")
+            logger.error("An error occurred while updating joke with ID {}: {}", joke_id, e)
             raise DatabaseException("Failed to update joke") from e
 
+        if doc is None:
+            raise JokeNotFoundException()
+        joke = Joke.model_validate(doc)
+        forget_joke(joke_id)
+        index_joke(joke_id, joke.joke_text, joke.minhash)
+        joke_events.notify("updated", joke_payload(doc))
+        logger.info("Successfully updated joke with ID: {}", joke_id)
+        return joke
+
     @staticmethod
-    async def fetch_and_save_joke():
-        """Fetch a single joke from the API and save it to database"""
-        logger.info("Fetching new joke from external API")
+    async def delete_joke(joke_id: ObjectId):
+        """Delete a joke in one round trip, raising JokeNotFoundException if it is missing"""
+        logger.info("Deleting joke with ID: {}", joke_id)
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    os.getenv("DADJOKES_API_URL"),
-                    headers={"Accept": "application/json"}
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"External API returned status code: {response.status_code}")
-                    raise ExternalAPIException()
-                
-                joke_data = response.json()
-                logger.debug(f"Received joke from API: {joke_data['joke'][:30]}...")
-                return await JokeService.create_joke(
-                    joke_text=joke_data["joke"],
-                    source_id=joke_data["id"]
+            with db_timer("delete_joke"):
+                doc = await Joke.get_motor_collection().find_one_and_delete(
+                    {"_id": joke_id}, projection=STATS_PROJECTION
                 )
+        except Exception as e:
+            logger.error("An error occurred while deleting joke with ID {}: {}", joke_id, e)
+            raise DatabaseException("Failed to delete joke") from e
+        finally:
+            forget_joke(joke_id)
+            unindex_joke(joke_id)
+        if doc is None:
+            raise JokeNotFoundException()
+        await JokeService._record_deletes([joke_id])
+        joke_stats.record(doc.get("created_at"), doc.get("source_id"), -1)
+        joke_events.notify("deleted", {"_id": str(joke_id)})
+
+    @staticmethod
+    async def bulk_delete_jokes(joke_ids: List[ObjectId]) -> int:
+        """Delete many jokes with one `delete_many` and return how many existed.
+
+        The jokes' stats fields are read first with one `$in` query, so that
+        the counters behind /jokes/stats can be decremented per day and source.
+        """
+        logger.info("Bulk deleting {} jokes", len(joke_ids))
+        collection = Joke.get_motor_collection()
+        try:
+            with db_timer("bulk_delete_jokes"):
+                docs = await collection.find({"_id": {"$in": joke_ids}}, STATS_PROJECTION).to_list(None)
+                result = await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        except Exception as e:
+            logger.error("Bulk delete of {} jokes failed: {}", len(joke_ids), e)
+            raise DatabaseException("Failed to delete jokes") from e
+        finally:
+            forget_jokes(joke_ids)
+            for joke_id in joke_ids:
+                unindex_joke(joke_id)
+        await JokeService._record_deletes([doc["_id"] for doc in docs])
+        for doc in docs:
+            joke_stats.record(doc.get("created_at"), doc.get("source_id"), -1)
+            joke_events.notify("deleted", {"_id": str(doc["_id"])})
+        return result.deleted_count
+
+    @staticmethod
+    async def bulk_update_jokes(items: List[Any]) -> List[BulkItemResult]:
+        """Update many jokes with one unordered `bulk_write`, reporting a result per item.
+
+        Items are `{"id": ..., "joke_text": ...}`. Duplicates come from the unique
+        index errors; ids that matched nothing are found with one `$in` read.
+        """
+        logger.info("Bulk updating {} jokes", len(items))
+        results: List[Optional[BulkItemResult]] = [None] * len(items)
+        pending = []
+        now = datetime.now()
+        for index, item in enumerate(items):
+            try:
+                update = JokeBulkUpdate.model_validate(item)
+                joke_id = ObjectId(update.id)
+            except ValidationError as e:
+                results[index] = BulkItemResult(index=index, status="invalid", detail=e.errors()[0]["msg"])
+                continue
+            except InvalidId:
+                results[index] = BulkItemResult(index=index, status="invalid", detail="Invalid joke ID format")
+                continue
+            signature = minhash(update.joke_text)
+            pending.append((index, joke_id, update.joke_text, signature, {
+                "joke_text": update.joke_text,
+                "content_hash": content_hash(update.joke_text),
+                "minhash": signature,
+                "updated_at": now,
+            }))
+
+        if pending:
+            collection = Joke.get_motor_collection()
+            errors = {}
+            try:
+                with db_timer("bulk_update_jokes"):
+                    await joke_change_feed.stamp([fields for *_, fields in pending])
+                    await collection.bulk_write([
+                        UpdateOne({"_id": joke_id}, {"$set": fields}) for _, joke_id, *_, fields in pending
+                    ], ordered=False)
+            except BulkWriteError as e:
+                errors = {error["index"]: error["code"] for error in e.details["writeErrors"]}
+            except PyMongoError as e:
+                logger.error("Bulk update of {} jokes failed: {}", len(pending), e)
+                errors = {position: None for position in range(len(pending))}
+
+            ids = [joke_id for _, joke_id, *_ in pending]
+            forget_jokes(ids)
+            try:
+                with db_timer("bulk_update_jokes"):
+                    existing = {
+                        doc["_id"]: doc async for doc in collection.find({"_id": {"$in": ids}}, JOKE_PROJECTION)
+                    }
+            except PyMongoError as e:
+                # The updates are written; the indexes pick them up from the change feed
+                logger.error("Reading back {} bulk-updated jokes failed: {}", len(ids), e)
+                raise DatabaseException("Jokes were updated, but their results could not be read") from e
+
+            for position, (index, joke_id, joke_text, signature, _) in enumerate(pending):
+                if position in errors:
+                    duplicate = errors[position] == DUPLICATE_KEY_ERROR
+                    results[index] = BulkItemResult(
+                        index=index, id=str(joke_id), status="duplicate" if duplicate else "failed",
+                        detail="Joke already exists" if duplicate else "Failed to update joke",
+                    )
+                elif joke_id not in existing:
+                    unindex_joke(joke_id)
+                    results[index] = BulkItemResult(index=index, id=str(joke_id), status="not_found", detail="Joke not found")
+                else:
+                    index_joke(joke_id, joke_text, signature)
+                    joke_events.notify("updated", joke_payload(existing[joke_id]))
+                    results[index] = BulkItemResult(index=index, id=str(joke_id), status="updated")
+
+        logger.opt(lazy=True).info(
+            "Bulk update finished: {} of {} updated",
+            lambda: sum(r.status == "updated" for r in results), lambda: len(items)
+        )
+        return results
+
+    @staticmethod
+    async def _insert_new_jokes(docs: List[dict], operation: str) -> Dict[int, Optional[int]]:
+        """Insert raw joke documents with one unordered `insert_many` and publish the inserted ones.
+
+        Returns the error code of each position that was not inserted (None when unknown).
+        """
+        errors = {}
+        try:
+            with db_timer(operation):
+                await joke_change_feed.stamp(docs, created=True)
+                await Joke.get_motor_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = {error["index"]: error["code"] for error in e.details["writeErrors"]}
+        except PyMongoError as e:
+            logger.error("Bulk insert of {} jokes failed: {}", len(docs), e)
+            errors = {position: None for position in range(len(docs))}
+
+        for position, doc in enumerate(docs):
+            if position not in errors:
+                joke_cache.invalidate(doc["_id"])
+                index_joke(doc["_id"], doc["joke_text"], doc["minhash"])
+                joke_stats.record(doc["created_at"], doc["source_id"])
+                joke_events.notify("created", joke_payload(doc))
+        return errors
+
+    @staticmethod
+    async def _record_deletes(joke_ids: List[ObjectId]):
+        """Leave change feed tombstones for deleted jokes.
+
+        Written after the delete, so a worker dying in between loses the
+        tombstone; replicas then keep the joke until they resync.
+        """
+        try:
+            with db_timer("record_deletes"):
+                await joke_change_feed.record_deletes(joke_ids)
+        except PyMongoError as e:
+            logger.error("Error writing tombstones for {} deleted jokes: {}", len(joke_ids), e)
+
+    @staticmethod
+    async def _near_duplicates(docs: List[dict]) -> Dict[int, ObjectId]:
+        """Map positions of new jokes to the id of a joke they nearly duplicate.
+
+        A joke is a near duplicate when its MinHash similarity to a stored joke,
+        or to an earlier joke of `docs`, reaches NEAR_DUPLICATE_THRESHOLD. Empty
+        when the check is disabled or the index is still building. Stored matches
+        are confirmed with one read, as jokes deleted by other workers can linger
+        in this worker's index until its next rebuild.
+        """
+        threshold = settings.near_duplicate_threshold
+        if not threshold or not joke_duplicate_index.ready:
+            return {}
+        candidates = {}
+        for position, doc in enumerate(docs):
+            similar = joke_duplicate_index.similar(doc["minhash"], threshold, limit=5)
+            if similar:
+                candidates[position] = [joke_id for joke_id, _ in similar]
+
+        found = {}
+        if candidates:
+            ids = list({joke_id for similar in candidates.values() for joke_id in similar})
+            with db_timer("near_duplicates"):
+                stored = {
+                    doc["_id"] async for doc in Joke.get_motor_collection().find({"_id": {"$in": ids}}, {"_id": 1})
+                }
+            for joke_id in ids:
+                if joke_id not in stored:
+                    joke_duplicate_index.remove(joke_id)
+            for position, similar in candidates.items():
+                match = next((joke_id for joke_id in similar if joke_id in stored), None)
+                if match is not None:
+                    found[position] = match
+
+        if len(docs) > 1:
+            batch = JokeDuplicateIndex(bucket_bits=max(8, min(16, len(docs).bit_length())))
+            for position, doc in enumerate(docs):
+                if position in found:
+                    continue
+                similar = batch.similar(doc["minhash"], threshold, limit=1)
+                if similar:
+                    found[position] = similar[0][0]
+                else:
+                    batch.add(doc["_id"], doc["minhash"])
+        return found
+
+    @staticmethod
+    async def bulk_create_jokes(items: List[Any], chunk_size: int = 1000) -> List[BulkItemResult]:
+        """Validate, dedupe and insert many jokes, reporting a result per item.
+
+        Items are deduplicated within the batch by content hash, then written with
+        unordered `insert_many` calls of `chunk_size` documents; duplicates of
+        stored jokes are reported from the unique index errors of each chunk.
+        With NEAR_DUPLICATE_THRESHOLD set, near duplicates are reported as
+        duplicates too.
+        """
+        logger.info("Bulk creating {} jokes", len(items))
+        results: List[Optional[BulkItemResult]] = [None] * len(items)
+        pending = []
+        seen_hashes = set()
+        now = datetime.now()
+        for index, item in enumerate(items):
+            try:
+                joke = JokeCreate.model_validate(item)
+            except ValidationError as e:
+                results[index] = BulkItemResult(index=index, status="invalid", detail=e.errors()[0]["msg"])
+                continue
+            digest = content_hash(joke.joke_text)
+            if digest in seen_hashes:
+                results[index] = BulkItemResult(index=index, status="duplicate", detail="Joke already exists")
+                continue
+            seen_hashes.add(digest)
+            pending.append((index, {
+                "_id": ObjectId(),
+                "joke_text": joke.joke_text,
+                "source_id": joke.source_id,
+                "created_at": now,
+                "updated_at": None,
+                "content_hash": digest,
+                "minhash": minhash(joke.joke_text),
+            }))
+
+        similar = await JokeService._near_duplicates([doc for _, doc in pending])
+        for position, joke_id in similar.items():
+            index = pending[position][0]
+            results[index] = BulkItemResult(index=index, status="duplicate", detail=f"Similar to joke {joke_id}")
+        if similar:
+            pending = [item for position, item in enumerate(pending) if position not in similar]
+
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            errors = await JokeService._insert_new_jokes([doc for _, doc in chunk], "bulk_create_jokes")
+            for position, (index, doc) in enumerate(chunk):
+                if position not in errors:
+                    results[index] = BulkItemResult(index=index, status="created", id=str(doc["_id"]))
+                elif errors[position] == DUPLICATE_KEY_ERROR:
+                    results[index] = BulkItemResult(index=index, status="duplicate", detail="Joke already exists")
+                else:
+                    results[index] = BulkItemResult(index=index, status="failed", detail="Failed to insert joke")
+
+        logger.opt(lazy=True).info(
+            "Bulk create finished: {} of {} created",
+            lambda: sum(r.status == "created" for r in results), lambda: len(items)
+        )
+        return results
+
+    @staticmethod
+    async def fetch_external_joke(client: "httpx.AsyncClient") -> dict:
+        """Fetch a single random joke from the external API using the given client.
+
+        Fails fast with `CircuitOpenException` while the external API circuit is
+        open. Only a well-formed joke counts as a success for the circuit breaker;
+        a malformed body counts as a failure and raises `ExternalAPIException`.
+        """
+        import httpx  # deferred off the import path, see create_http_client
+        external_api_breaker.before_call()
+        EXTERNAL_API_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            response = await client.get(
+                settings.dadjokes_api_url,
+                headers={"Accept": "application/json"}
+            )
         except httpx.HTTPError as e:
-            logger.error(f"HTTP error occurred while fetching joke: {str(e)}")
-            raise ExternalAPIException() 
\ No newline at end of file
+            external_api_breaker.record_failure()
+            EXTERNAL_API_ERRORS.inc(type(e).__name__)
+            logger.error("HTTP error occurred while fetching joke: {}", e)
+            raise ExternalAPIException()
+        except asyncio.CancelledError:  # lease lost, shutdown, client gone: says nothing about the API
+            external_api_breaker.record_abandoned()
+            raise
+        except Exception as e:
+            external_api_breaker.record_failure()
+            EXTERNAL_API_ERRORS.inc(type(e).__name__)
+            raise
+        finally:
+            EXTERNAL_API_IN_FLIGHT.dec()
+            elapsed = time.perf_counter() - started
+            EXTERNAL_API_DURATION.observe(elapsed)
+            record_span("external_http", elapsed)
+
+        if response.status_code != 200:
+            external_api_breaker.record_failure()
+            EXTERNAL_API_ERRORS.inc(f"status_{response.status_code}")
+            logger.error("External API returned status code: {}", response.status_code)
+            raise ExternalAPIException()
+
+        try:
+            joke_data = response.json()
+            if not isinstance(joke_data.get("joke"), str) or not isinstance(joke_data.get("id"), str):
+                raise ValueError(f"unexpected payload {str(joke_data)[:100]}")
+        except (ValueError, AttributeError) as e:  # not JSON, or JSON without a string joke and id
+            external_api_breaker.record_failure()
+            EXTERNAL_API_ERRORS.inc("invalid_payload")
+            logger.error("External API returned an invalid joke: {}", e)
+            raise ExternalAPIException()
+
+        external_api_breaker.record_success()
+        logger.debug("Received joke from API: {}...", joke_data['joke'][:30])
+        return joke_data
+
+    @staticmethod
+    async def fetch_and_save_joke(client: Optional["httpx.AsyncClient"] = None):
+        """Fetch a single joke from the API and save it to database"""
+        logger.info("Fetching new joke from external API")
+        if client is None:
+            import httpx
+            async with httpx.AsyncClient() as client:
+                joke_data = await JokeService.fetch_external_joke(client)
+        else:
+            joke_data = await JokeService.fetch_external_joke(client)
+        return await JokeService.save_external_joke(joke_data)
+
+    @staticmethod
+    async def save_external_joke(joke_data: dict) -> Joke:
+        """Store a joke as returned by the external API"""
+        return await JokeService.create_joke(
+            joke_text=joke_data["joke"],
+            source_id=joke_data["id"]
+        )
@@ -0,0 +1,144 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from loguru import logger
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from app.core.config import settings
+from app.models import DailyJokeCount, Joke, JokeStats, JokeStatsResponse
+
+TOTALS_KEY = "all"
+
+def day_key(day: date) -> str:
+    return f"day:{day:%Y-%m-%d}"
+
+class JokeStatsCounter:
+    """Joke counts kept up to date by the write paths instead of scanning the collection.
+
+    Writes record +1/-1 deltas per counter document (the totals and the day the
+    joke was created) in memory; `run()` flushes them every `flush_interval`
+    seconds as one unordered bulk of `$inc` upserts, so a burst of inserts costs
+    a handful of counter updates. Reads fetch the totals and one document per
+    requested day, plus this worker's unflushed deltas.
+
+    Counters can drift (a worker dies with unflushed deltas, jokes written
+    outside the API); `reconcile()` recounts with one aggregation over the
+    `created_at_source_id` index and overwrites them.
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, List[int]] = {}  # key -> [total, external]
+
+    def record(self, created_at: Optional[datetime], source_id: Optional[str], delta: int = 1):
+        """Count a created (delta 1) or deleted (delta -1) joke"""
+        external = delta if source_id is not None else 0
+        keys = (TOTALS_KEY, day_key(created_at)) if created_at is not None else (TOTALS_KEY,)
+        for key in keys:
+            counts = self._pending.get(key)
+            if counts is None:
+                counts = self._pending[key] = [0, 0]
+            counts[0] += delta
+            counts[1] += external
+
+    def clear(self):
+        self._pending.clear()
+
+    def _restore(self, pending: Dict[str, List[int]]):
+        """Put deltas back after a failed flush, merged with ones recorded since"""
+        for key, (total, external) in pending.items():
+            counts = self._pending.setdefault(key, [0, 0])
+            counts[0] += total
+            counts[1] += external
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        keys = [key for key, counts in pending.items() if any(counts)]
+        if not keys:
+            return
+        operations = [
+            UpdateOne({"_id": key}, {"$inc": {"total": pending[key][0], "external": pending[key][1]}}, upsert=True)
+            for key in keys
+        ]
+        try:
+            await JokeStats.get_motor_collection().bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Typically two workers upserting a new day at once; retry just those next time
+            self._restore({keys[error["index"]]: pending[keys[error["index"]]] for error in e.details["writeErrors"]})
+        except PyMongoError as e:
+            logger.error("Error flushing {} joke stats counters: {}", len(keys), e)
+            self._restore(pending)
+
+    async def read(self, days: int) -> JokeStatsResponse:
+        """Totals, totals by source and jokes created on each of the last `days` days"""
+        today = datetime.now().date()
+        days_wanted = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+        keys = [TOTALS_KEY] + [day_key(day) for day in days_wanted]
+        docs = {
+            doc["_id"]: doc async for doc in JokeStats.get_motor_collection().find({"_id": {"$in": keys}})
+        }
+
+        def count(key: str, field: int) -> int:
+            stored = docs.get(key, {}).get(("total", "external")[field], 0)
+            return stored + self._pending.get(key, (0, 0))[field]
+
+        total, external = count(TOTALS_KEY, 0), count(TOTALS_KEY, 1)
+        return JokeStatsResponse(
+            total=total,
+            external=external,
+            user=total - external,
+            per_day=[DailyJokeCount(date=day, count=count(day_key(day), 0)) for day in days_wanted],
+            reconciled_at=docs.get(TOTALS_KEY, {}).get("reconciled_at"),
+        )
+
+    async def reconcile(self) -> dict:
+        """Recount every counter from the collection and overwrite the stored ones.
+
+        Deltas flushed by other workers while the aggregation runs may be
+        counted twice or lost; the next reconciliation corrects them.
+        """
+        started = datetime.now()
+        pipeline = [
+            {"$sort": {"created_at": 1}},  # walk the created_at_source_id index
+            {"$project": {"_id": 0, "created_at": 1, "source_id": 1}},
+            {"$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                "total": {"$sum": 1},
+                "external": {"$sum": {"$cond": [{"$gt": ["$source_id", None]}, 1, 0]}},
+            }},
+        ]
+        counts = {TOTALS_KEY: [0, 0]}
+        async for group in Joke.get_motor_collection().aggregate(pipeline, allowDiskUse=True):
+            counts[TOTALS_KEY][0] += group["total"]
+            counts[TOTALS_KEY][1] += group["external"]
+            if isinstance(group["_id"], str):  # None for jokes without created_at
+                counts[f"day:{group['_id']}"] = [group["total"], group["external"]]
+
+        collection = JokeStats.get_motor_collection()
+        stored = {doc["_id"]: doc async for doc in collection.find({})}
+        drift = counts[TOTALS_KEY][0] - stored.get(TOTALS_KEY, {}).get("total", 0)
+        fixed = sum(
+            [doc.get("total", 0), doc.get("external", 0)] != counts.get(key)
+            for key, doc in stored.items() if key != TOTALS_KEY
+        ) + sum(key not in stored for key in counts if key != TOTALS_KEY)
+
+        operations = [
+            ReplaceOne({"_id": key}, {"total": total, "external": external}, upsert=True)
+            for key, (total, external) in counts.items() if key != TOTALS_KEY
+        ]
+        operations.append(DeleteMany({"_id": {"$regex": "^day:", "$nin": list(counts)}}))
+        operations.append(ReplaceOne({"_id": TOTALS_KEY}, {
+            "total": counts[TOTALS_KEY][0], "external": counts[TOTALS_KEY][1], "reconciled_at": started,
+        }, upsert=True))
+        await collection.bulk_write(operations, ordered=True)
+        stats = {"total": counts[TOTALS_KEY][0], "total_drift": drift, "days_fixed": fixed}
+        logger.info("Reconciled joke stats: {}", stats)
+        return stats
+
+    async def run(self):
+        """Flush recorded deltas every `flush_interval` seconds"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+joke_stats = JokeStatsCounter(flush_interval=settings.stats_flush_seconds)
@@ -0,0 +1,137 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+from typing import Hashable, List, Optional, Set
+from loguru import logger
+from app.core.config import settings
+from app.models import Joke
+
+class RandomJokePool:
+    """In-memory pool of randomly sampled jokes, refilled by a background task.
+
+    Requests pick from the pool instead of running `$sample` against the
+    collection, so `/jokes/random` costs O(count) regardless of collection size.
+    A short per-client window of recently served ids avoids repeats.
+    Concurrent refills share one aggregation.
+    """
+
+    def __init__(self, size: int, refill_interval: float, no_repeat_window: int, max_clients: int):
+        self.size = size
+        self.refill_interval = refill_interval
+        self.no_repeat_window = no_repeat_window
+        self.max_clients = max_clients
+        self._jokes: List[Joke] = []
+        self._recent: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self._refilling: Optional[asyncio.Future] = None
+        self._sampled_empty_at: Optional[float] = None
+
+    def __len__(self):
+        return len(self._jokes)
+
+    async def refill(self):
+        """Replace the pool with a fresh random sample of the collection, joining a refill already in flight"""
+        if self._refilling is None:
+            self._refilling = asyncio.ensure_future(self._sample())
+            self._refilling.add_done_callback(self._refill_done)
+        await asyncio.shield(self._refilling)
+
+    async def _sample(self):
+        self._jokes = await Joke.aggregate(
+            [{"$sample": {"size": self.size}}], projection_model=Joke
+        ).to_list()
+        self._sampled_empty_at = None if self._jokes else time.monotonic()
+        logger.debug("Refilled random joke pool with {} jokes", len(self._jokes))
+
+    def _refill_done(self, future: asyncio.Future):
+        self._refilling = None
+        if not future.cancelled():
+            future.exception()  # retrieved by the callers; marks it handled if they were cancelled
+
+    async def fill_if_cold(self):
+        """Fill an empty pool for a request on a cold worker.
+
+        An empty collection is resampled at most once per refill interval,
+        so requests against it don't each run a `$sample`.
+        """
+        if self._jokes:
+            return
+        if (self._refilling is None and self._sampled_empty_at is not None
+                and time.monotonic() - self._sampled_empty_at < self.refill_interval):
+            return
+        await self.refill()
+
+    def discard(self, joke_id):
+        """Drop a changed or deleted joke; it comes back with the next refill"""
+        self.discard_many({joke_id})
+
+    def discard_many(self, joke_ids: Set):
+        """Drop changed or deleted jokes in one pass over the pool"""
+        if self._jokes and joke_ids:
+            self._jokes = [joke for joke in self._jokes if joke.id not in joke_ids]
+
+    def clear(self):
+        self._jokes = []
+        self._recent.clear()
+        self._sampled_empty_at = None
+
+    def _recent_for(self, client_id: Optional[Hashable]) -> Optional[deque]:
+        if client_id is None or self.no_repeat_window <= 0:
+            return None
+        recent = self._recent.get(client_id)
+        if recent is None:
+            recent = self._recent[client_id] = deque(maxlen=self.no_repeat_window)
+            while len(self._recent) > self.max_clients:
+                self._recent.popitem(last=False)
+        else:
+            self._recent.move_to_end(client_id)
+        return recent
+
+    def pick(self, count: int, client_id: Optional[Hashable] = None) -> List[Joke]:
+        """Pick up to `count` distinct jokes, avoiding the client's recently served ones if possible"""
+        pool = self._jokes
+        count = min(count, len(pool))
+        recent = self._recent_for(client_id)
+        excluded = set(recent) if recent else set()
+        picked: List[Joke] = []
+        picked_ids = set()
+        # Bounded number of draws; fall back to allowing recent repeats when the pool is small
+        for _ in range(count * 4):
+            if len(picked) == count:
+                break
+            joke = pool[random.randrange(len(pool))]
+            if joke.id in picked_ids or joke.id in excluded:
+                continue
+            picked.append(joke)
+            picked_ids.add(joke.id)
+        if len(picked) < count:
+            # Draws kept colliding: scan the pool in random order, jokes not served recently first
+            remaining = random.sample(pool, len(pool))
+            remaining.sort(key=lambda joke: joke.id in excluded)
+            for joke in remaining:
+                if len(picked) == count:
+                    break
+                if joke.id not in picked_ids:
+                    picked.append(joke)
+                    picked_ids.add(joke.id)
+        if recent is not None:
+            recent.extend(picked_ids)
+        return picked
+
+    async def run(self):
+        """Keep the pool refilled (the first refill waits an interval if the pool is already warm)"""
+        if self._jokes:
+            await asyncio.sleep(self.refill_interval)
+        while True:
+            try:
+                await self.refill()
+            except Exception as e:
+                logger.error("Error refilling random joke pool: {}", e)
+            await asyncio.sleep(self.refill_interval)
+
+random_joke_pool = RandomJokePool(
+    size=settings.random_pool_size,
+    refill_interval=settings.random_pool_refill_seconds,
+    no_repeat_window=settings.random_no_repeat_window,
+    max_clients=settings.random_pool_max_clients,
+)
@@ -0,0 +1,273 @@
+import asyncio
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Tuple
+from bson import ObjectId
+from loguru import logger
+from app.core.config import settings
+from app.models import Joke
+from app.services.change_feed import joke_change_feed
+
+TOKEN_RE = re.compile(r"\w+")
+ID_SIZE = 12  # bytes in an ObjectId
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(unicodedata.normalize("NFKC", text).casefold())
+
+class JokeSearchIndex:
+    """In-process inverted index over `joke_text` with BM25 ranking and prefix matching.
+
+    Layout is kept compact for millions of jokes: each term maps to parallel
+    arrays of document ordinals (`array('I')`, ascending) and term frequencies
+    (`array('B')`); ids live in one bytearray of 12-byte ObjectIds and lengths
+    in an `array('H')`. Removal only clears an alive flag; postings are
+    rewritten by `compact()` once enough of them point at dead documents.
+    A hash of each joke's text makes re-adding an unchanged joke (a catch-up
+    replaying this worker's own writes) a no-op.
+
+    Queries match all terms (AND). Candidates come from the rarest term and are
+    checked against the other terms' postings by binary search. With `prefix`
+    the last term also matches the most frequent vocabulary terms it prefixes.
+    """
+
+    def __init__(self, max_prefix_expansions: int = 50, k1: float = 1.2, b: float = 0.75):
+        self.max_prefix_expansions = max_prefix_expansions
+        self.k1 = k1
+        self.b = b
+        self.reset()
+
+    def reset(self):
+        self._postings: Dict[str, array] = {}
+        self._tfs: Dict[str, array] = {}
+        self._vocab: List[str] = []
+        self._vocab_sorted = True
+        self._ids = bytearray()
+        self._ordinals: Dict[bytes, int] = {}
+        self._lengths = array("H")
+        self._text_hashes = array("q")
+        self._alive = bytearray()
+        self._live_count = 0
+        self._total_length = 0
+        self._max_length = 0
+        self._position = 0  # change feed position the index is up to date with
+        self.ready = False
+
+    def __len__(self):
+        return self._live_count
+
+    def __contains__(self, joke_id: ObjectId):
+        return joke_id.binary in self._ordinals
+
+    def add(self, joke_id: ObjectId, joke_text: str):
+        """Index a joke, replacing any previous version of it"""
+        key = joke_id.binary
+        text_hash = hash(joke_text)
+        replaced = key in self._ordinals
+        if replaced:
+            if self._text_hashes[self._ordinals[key]] == text_hash:
+                return
+            self._remove_key(key)
+        terms = tokenize(joke_text)
+        ordinal = len(self._lengths)
+        length = min(len(terms), 0xFFFF)
+        self._ids += key
+        self._ordinals[key] = ordinal
+        self._lengths.append(length)
+        self._text_hashes.append(text_hash)
+        self._alive.append(1)
+        self._live_count += 1
+        self._total_length += length
+        self._max_length = max(self._max_length, length)
+        for term, tf in Counter(terms).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = array("I")
+                self._tfs[term] = array("B")
+                if self._vocab_sorted:
+                    insort(self._vocab, term)
+                else:
+                    self._vocab.append(term)
+            postings.append(ordinal)
+            self._tfs[term].append(min(tf, 0xFF))
+        if replaced:
+            self._maybe_compact()
+
+    def remove(self, joke_id: ObjectId):
+        key = joke_id.binary
+        if key in self._ordinals:
+            self._remove_key(key)
+            self._maybe_compact()
+
+    def _remove_key(self, key: bytes):
+        ordinal = self._ordinals.pop(key)
+        self._alive[ordinal] = 0
+        self._live_count -= 1
+        self._total_length -= self._lengths[ordinal]
+
+    def _maybe_compact(self):
+        dead = len(self._lengths) - self._live_count
+        if dead > 1000 and dead > 0.3 * len(self._lengths):
+            self.compact()
+
+    def compact(self):
+        """Drop dead documents from all postings and renumber the ordinals"""
+        remap = array("i", [-1]) * len(self._lengths)
+        ids = bytearray()
+        lengths = array("H")
+        text_hashes = array("q")
+        for ordinal, alive in enumerate(self._alive):
+            if alive:
+                remap[ordinal] = len(lengths)
+                ids += self._ids[ordinal * ID_SIZE:(ordinal + 1) * ID_SIZE]
+                lengths.append(self._lengths[ordinal])
+                text_hashes.append(self._text_hashes[ordinal])
+
+        for term in list(self._postings):
+            postings, tfs = array("I"), array("B")
+            for ordinal, tf in zip(self._postings[term], self._tfs[term]):
+                new_ordinal = remap[ordinal]
+                if new_ordinal >= 0:
+                    postings.append(new_ordinal)
+                    tfs.append(tf)
+            if postings:
+                self._postings[term], self._tfs[term] = postings, tfs
+            else:
+                del self._postings[term], self._tfs[term]
+
+        self._ids = ids
+        self._lengths = lengths
+        self._text_hashes = text_hashes
+        self._alive = bytearray(b"\x01") * len(lengths)
+        self._ordinals = {bytes(ids[i * ID_SIZE:(i + 1) * ID_SIZE]): i for i in range(len(lengths))}
+        self._vocab = sorted(self._postings)
+        self._vocab_sorted = True
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """Vocabulary terms starting with `prefix`, most frequent first"""
+        if not self._vocab_sorted:
+            self._vocab.sort()
+            self._vocab_sorted = True
+        start = bisect_left(self._vocab, prefix)
+        matches = []
+        for term in self._vocab[start:start + 20 * self.max_prefix_expansions]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return heapq.nlargest(self.max_prefix_expansions, matches, key=lambda t: len(self._postings[t]))
+
+    def search(self, query: str, limit: int = 20, offset: int = 0, prefix: bool = True) -> Tuple[int, List[ObjectId]]:
+        """Return the number of matching jokes and one page of ids, best match first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._live_count:
+            return 0, []
+        groups = [[term] if term in self._postings else [] for term in terms]
+        if prefix and not query[-1].isspace():
+            groups[-1] = self._expand_prefix(terms[-1])
+        if not all(groups):
+            return 0, []
+
+        postings, tfs, lengths, alive = self._postings, self._tfs, self._lengths, self._alive
+        k1, b = self.k1, self.b
+        count = self._live_count
+        avg_length = self._total_length / count or 1.0
+        idf = {
+            term: math.log(1 + (count - len(postings[term]) + 0.5) / (len(postings[term]) + 0.5))
+            for group in groups for term in group
+        }
+        groups.sort(key=lambda group: sum(len(postings[term]) for term in group))
+
+        # BM25 length normalization only depends on the document length, so tabulate it
+        norms = [k1 * (1 - b + b * length / avg_length) for length in range(self._max_length + 1)]
+        k1_plus_1 = k1 + 1
+
+        if len(groups) == 1 and len(groups[0]) == 1:
+            # Single term: rank straight off the postings without building a score map
+            term = groups[0][0]
+            weight = idf[term] * k1_plus_1
+            matches = [
+                (weight * tf / (tf + norms[lengths[ordinal]]), -ordinal)
+                for ordinal, tf in zip(postings[term], tfs[term]) if alive[ordinal]
+            ]
+            top = heapq.nlargest(offset + limit, matches)[offset:]
+            return len(matches), [self._id_at(-negated) for _, negated in top]
+
+        scores: Dict[int, float] = {}
+        for term in groups[0]:
+            weight = idf[term] * k1_plus_1
+            get_score = scores.get
+            for ordinal, tf in zip(postings[term], tfs[term]):
+                if alive[ordinal]:
+                    score = weight * tf / (tf + norms[lengths[ordinal]])
+                    if score > get_score(ordinal, 0.0):
+                        scores[ordinal] = score
+
+        for group in groups[1:]:
+            if not scores:
+                break
+            matched = {}
+            for ordinal, score in scores.items():
+                best = 0.0
+                for term in group:
+                    term_postings = postings[term]
+                    i = bisect_left(term_postings, ordinal)
+                    if i < len(term_postings) and term_postings[i] == ordinal:
+                        tf = tfs[term][i]
+                        best = max(best, idf[term] * k1_plus_1 * tf / (tf + norms[lengths[ordinal]]))
+                if best:
+                    matched[ordinal] = score + best
+            scores = matched
+
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], -item[0]))[offset:]
+        return len(scores), [self._id_at(ordinal) for ordinal, _ in top]
+
+    def _id_at(self, ordinal: int) -> ObjectId:
+        return ObjectId(bytes(self._ids[ordinal * ID_SIZE:(ordinal + 1) * ID_SIZE]))
+
+    async def build(self, batch_size: int = 5000):
+        """(Re)build the index from a streamed cursor over the jokes collection"""
+        self.reset()
+        self._vocab_sorted = False
+        # Taken first: jokes written during the scan are applied again by the next catch-up
+        position = await joke_change_feed.position()
+        cursor = Joke.get_motor_collection().find({}, {"joke_text": 1}, batch_size=batch_size)
+        async for doc in cursor:
+            self.add(doc["_id"], doc["joke_text"])
+        self._vocab.sort()
+        self._vocab_sorted = True
+        self._position = position
+        self.ready = True
+        logger.info("Built search index over {} jokes ({} terms)", self._live_count, len(self._postings))
+
+    async def catch_up(self):
+        """Apply jokes created, updated and deleted since the last build or catch-up, by any worker"""
+        changes, self._position = await joke_change_feed.scan(self._position, {"joke_text": 1})
+        for doc in changes:
+            if "joke_text" in doc:
+                self.add(doc["_id"], doc["joke_text"])
+            else:  # tombstone
+                self.remove(doc["_id"])
+
+    async def run(self):
+        """Build the index, retrying with backoff, then periodically apply changes made by other workers"""
+        delay = settings.startup_retry_seconds
+        while True:
+            try:
+                await self.build()
+                break
+            except Exception as e:
+                logger.error("Error building search index, retrying in {}s: {}", delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, settings.search_refresh_seconds)
+        while True:
+            await asyncio.sleep(settings.search_refresh_seconds)
+            try:
+                await self.catch_up()
+            except Exception as e:
+                logger.error("Error refreshing search index: {}", e)
+
+joke_search_index = JokeSearchIndex(max_prefix_expansions=settings.search_max_prefix_expansions)
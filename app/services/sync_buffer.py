@@ -0,0 +1,69 @@
+import asyncio
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Optional
+from loguru import logger
+from app.core.config import settings
+from app.core.exceptions import CircuitOpenException, ExternalAPIException
+from app.core.metrics import SYNC_BUFFER_DEPTH
+from app.services.joke_service import JokeService
+
+if TYPE_CHECKING:
+    import httpx
+
+class ExternalJokeBuffer:
+    """Jokes fetched ahead of time from the external API, refilled by a background task.
+
+    `POST /jokes/sync` takes a joke from the buffer and only has to store it,
+    so it does not wait on the external API; it falls back to a live fetch
+    when the buffer is empty. Each worker keeps its own buffer of up to `size`
+    jokes and refills it as jokes are taken.
+    """
+
+    def __init__(self, size: int, retry_interval: float):
+        self.size = size
+        self.retry_interval = retry_interval
+        self._jokes: Deque[dict] = deque()
+        self._wanted: Optional[asyncio.Event] = None
+
+    def __len__(self):
+        return len(self._jokes)
+
+    def take(self) -> Optional[dict]:
+        """The oldest buffered joke, or None when the buffer is empty"""
+        if not self._jokes:
+            return None
+        joke_data = self._jokes.popleft()
+        SYNC_BUFFER_DEPTH.set(len(self._jokes))
+        if self._wanted is not None:
+            self._wanted.set()
+        return joke_data
+
+    def clear(self):
+        self._jokes.clear()
+        SYNC_BUFFER_DEPTH.set(0)
+
+    async def run(self, client: "httpx.AsyncClient"):
+        """Keep the buffer full, backing off while the external API fails"""
+        self._wanted = asyncio.Event()
+        while True:
+            if len(self._jokes) >= self.size:
+                self._wanted.clear()
+                await self._wanted.wait()
+                continue
+            try:
+                self._jokes.append(await JokeService.fetch_external_joke(client))
+                SYNC_BUFFER_DEPTH.set(len(self._jokes))
+            except CircuitOpenException as e:
+                await asyncio.sleep(max(self.retry_interval, int(e.headers["Retry-After"])))
+            except ExternalAPIException:
+                logger.warning("Prefetching external jokes failed, retrying in {}s", self.retry_interval)
+                await asyncio.sleep(self.retry_interval)
+            except Exception as e:
+                logger.exception("Unexpected error prefetching external jokes, retrying in {}s: {}",
+                                 self.retry_interval, e)
+                await asyncio.sleep(self.retry_interval)
+
+    def stats(self) -> dict:
+        return {"depth": len(self._jokes), "size": self.size}
+
+external_joke_buffer = ExternalJokeBuffer(settings.sync_buffer_size, settings.sync_buffer_retry_seconds)
@@ -0,0 +1,94 @@
+import asyncio
+import functools
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from app.core.config import settings
+from app.core.metrics import WRITE_BATCH_SIZE
+from app.models import Joke
+from app.services.change_feed import joke_change_feed
+
+DUPLICATE_KEY_ERROR = 11000
+
+class InsertCoalescer:
+    """Micro-batches concurrent single-document inserts into unordered `insert_many` calls.
+
+    `insert(doc)` queues the document and waits until its batch is flushed,
+    which happens once `max_size` documents are queued or `max_delay` seconds
+    after the first one, whichever comes first. Each caller gets its own outcome:
+    it returns on success and raises `DuplicateKeyError` (or another
+    `PyMongoError`) exactly as a single `insert_one` would; when the whole
+    batch fails, every caller gets the batch's error. `prepare`, if
+    given, is awaited with each batch's documents just before they are written.
+    """
+
+    def __init__(self, collection: Callable[[], AsyncIOMotorCollection], max_size: int, max_delay: float,
+                 prepare: Optional[Callable[[List[dict]], Awaitable[None]]] = None):
+        self.collection = collection
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.prepare = prepare
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def insert(self, doc: dict):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((doc, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._write(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, batch: List[Tuple[dict, asyncio.Future]]):
+        WRITE_BATCH_SIZE.observe(len(batch))
+        errors = {}
+        docs = [doc for doc, _ in batch]
+        try:
+            if self.prepare is not None:
+                await self.prepare(docs)
+            await self.collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = {error["index"]: error for error in e.details["writeErrors"]}
+        except Exception as e:  # also bson errors and failures in `prepare`; never leave callers waiting
+            logger.error("Coalesced insert of {} documents failed: {}", len(batch), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for position, (_, future) in enumerate(batch):
+            if future.done():  # caller went away
+                continue
+            error = errors.get(position)
+            if error is None:
+                future.set_result(None)
+            elif error["code"] == DUPLICATE_KEY_ERROR:
+                future.set_exception(DuplicateKeyError(error["errmsg"], error["code"], error))
+            else:
+                future.set_exception(WriteError(error["errmsg"], error["code"], error))
+
+    async def close(self):
+        """Flush queued documents and wait for in-flight batches"""
+        self._flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+joke_insert_coalescer = InsertCoalescer(
+    Joke.get_motor_collection,
+    max_size=settings.write_batch_max_size,
+    max_delay=settings.write_batch_max_delay_ms / 1000,
+    prepare=functools.partial(joke_change_feed.stamp, created=True),  # one block of change feed positions per batch
+)
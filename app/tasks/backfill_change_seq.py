@@ -0,0 +1,50 @@
+"""Give jokes stored before the change feed a position in it.
+
+Without one they only reach GET /jokes/changes when next written. Run once
+against an existing database, before consumers first walk the feed:
+
+    python -m app.tasks.backfill_change_seq [batch_size]
+"""
+import asyncio
+import sys
+from pymongo import UpdateOne
+from loguru import logger
+from app.database import init_db
+from app.models import Joke
+from app.services.change_feed import joke_change_feed
+
+async def backfill_change_seq(batch_size: int = 1000) -> dict:
+    """Stamp every joke missing a `change_seq`, one keyset batch (and one block of positions) at a time"""
+    collection = Joke.get_motor_collection()
+    stats = {"updated": 0}
+    last_id = None
+    while True:
+        query = {"change_seq": None}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await collection.find(query, {"_id": 1}).sort("_id", 1).limit(batch_size).to_list(None)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        stamps = [{} for _ in batch]
+        await joke_change_feed.stamp(stamps, created=True)  # first seen by the feed: reported as created
+        # Jokes written meanwhile already got a newer position; leave them be
+        result = await collection.bulk_write([
+            UpdateOne({"_id": doc["_id"], "change_seq": None}, {"$set": stamp})
+            for doc, stamp in zip(batch, stamps)
+        ], ordered=False)
+        stats["updated"] += result.modified_count
+        logger.info("Backfilled change feed positions up to {} ({} updated)", last_id, stats["updated"])
+    return stats
+
+async def main(batch_size: int = 1000):
+    client = await init_db()
+    try:
+        stats = await backfill_change_seq(batch_size)
+        logger.info("Change feed backfill complete: {}", stats)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
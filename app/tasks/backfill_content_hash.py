@@ -0,0 +1,63 @@
+"""Backfill `content_hash` on jokes stored before duplicate detection moved to a unique index.
+
+Run once against an existing database:
+
+    python -m app.tasks.backfill_content_hash [batch_size]
+"""
+import asyncio
+import sys
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from loguru import logger
+from app.database import init_db
+from app.models import Joke, content_hash
+
+DUPLICATE_KEY_ERROR = 11000
+
+async def backfill_content_hash(batch_size: int = 1000) -> dict:
+    """Hash every joke missing a content_hash, one keyset batch at a time.
+
+    Jokes whose normalized text collides with an already hashed joke are left
+    unhashed and counted as duplicates so they can be reviewed and removed.
+    """
+    collection = Joke.get_motor_collection()
+    stats = {"updated": 0, "duplicates": 0}
+    last_id = None
+    while True:
+        query = {"content_hash": None}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await collection.find(query, {"joke_text": 1}).sort("_id", 1).limit(batch_size).to_list(None)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        operations = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"content_hash": content_hash(doc["joke_text"])}})
+            for doc in batch
+        ]
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            stats["updated"] += result.modified_count
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            duplicates = [error for error in errors if error["code"] == DUPLICATE_KEY_ERROR]
+            if len(duplicates) != len(errors):
+                raise
+            stats["updated"] += e.details["nModified"]
+            stats["duplicates"] += len(duplicates)
+            for error in duplicates:
+                logger.warning("Duplicate joke left unhashed: {}", batch[error["index"]]["_id"])
+        logger.info("Backfilled content hashes up to {} ({} updated)", last_id, stats["updated"])
+    return stats
+
+async def main(batch_size: int = 1000):
+    client = await init_db()
+    try:
+        stats = await backfill_content_hash(batch_size)
+        logger.info("Content hash backfill complete: {}", stats)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
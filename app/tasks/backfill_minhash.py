@@ -0,0 +1,47 @@
+"""Backfill `minhash` on jokes stored before near-duplicate detection.
+
+The near-duplicate index hashes such jokes itself on every build, so this
+only makes worker startup cheaper. Run once against an existing database:
+
+    python -m app.tasks.backfill_minhash [batch_size]
+"""
+import asyncio
+import sys
+from pymongo import UpdateOne
+from loguru import logger
+from app.core.minhash import minhash
+from app.database import init_db
+from app.models import Joke
+
+async def backfill_minhash(batch_size: int = 1000) -> dict:
+    """Compute the signature of every joke missing one, one keyset batch at a time"""
+    collection = Joke.get_motor_collection()
+    stats = {"updated": 0}
+    last_id = None
+    while True:
+        query = {"minhash": None}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await collection.find(query, {"joke_text": 1}).sort("_id", 1).limit(batch_size).to_list(None)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        result = await collection.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"minhash": minhash(doc["joke_text"])}})
+            for doc in batch
+        ], ordered=False)
+        stats["updated"] += result.modified_count
+        logger.info("Backfilled MinHash signatures up to {} ({} updated)", last_id, stats["updated"])
+    return stats
+
+async def main(batch_size: int = 1000):
+    client = await init_db()
+    try:
+        stats = await backfill_minhash(batch_size)
+        logger.info("MinHash backfill complete: {}", stats)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
@@ -1,13 +1,130 @@
 import asyncio
+import random
+import time
+from dataclasses import dataclass, asdict
+from typing import TYPE_CHECKING, List, Optional
+from loguru import logger
+from app.core.config import settings
+from app.core.exceptions import CircuitOpenException, ExternalAPIException
+from app.core.lease import create_lease
+from app.services.change_feed import joke_change_feed
 from app.services.joke_service import JokeService
+from app.services.joke_stats import joke_stats
 
-async def periodic_joke_sync():
-    """Periodically fetch jokes every hour"""
-    joke_service = JokeService()
+if TYPE_CHECKING:
+    import httpx
+
+@dataclass
+class SyncStats:
+    fetched: int = 0
+    new: int = 0
+    duplicate: int = 0
+    failed: int = 0
+    duration: float = 0.0
+
+class RateLimiter:
+    """Spaces calls out to at most `rate` per second, shared by concurrent tasks"""
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def wait(self):
+        if not self._interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+async def fetch_with_retry(client: "httpx.AsyncClient", limiter: RateLimiter) -> Optional[dict]:
+    """Fetch one external joke, retrying with backoff; returns None once retries run out"""
+    for attempt in range(settings.sync_max_retries + 1):
+        await limiter.wait()
+        try:
+            return await JokeService.fetch_external_joke(client)
+        except CircuitOpenException:
+            return None  # the external API is known to be down; don't spend retries on it
+        except ExternalAPIException:
+            if attempt == settings.sync_max_retries:
+                return None
+            await asyncio.sleep(backoff_delay(
+                attempt, settings.sync_backoff_base_seconds, settings.sync_backoff_max_seconds
+            ))
+
+async def sync_jokes(client: "httpx.AsyncClient", count: Optional[int] = None) -> SyncStats:
+    """Fetch `count` jokes with bounded concurrency and store them through the bulk write path"""
+    count = count or settings.sync_batch_size
+    started = time.perf_counter()
+    stats = SyncStats()
+    limiter = RateLimiter(settings.sync_rate_limit)
+    fetched: List[dict] = []
+    remaining = count
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            joke_data = await fetch_with_retry(client, limiter)
+            if joke_data is None:
+                stats.failed += 1
+            else:
+                fetched.append({"joke_text": joke_data.get("joke"), "source_id": joke_data.get("id")})
+
+    await asyncio.gather(*(worker() for _ in range(min(settings.sync_concurrency, count))))
+    stats.fetched = len(fetched)
+
+    if fetched:
+        results = await JokeService.bulk_create_jokes(fetched, settings.bulk_chunk_size)
+        for result in results:
+            if result.status == "created":
+                stats.new += 1
+            elif result.status == "duplicate":
+                stats.duplicate += 1
+            else:
+                stats.failed += 1
+
+    stats.duration = round(time.perf_counter() - started, 3)
+    return stats
+
+# Only the holder of this lease runs periodic_joke_sync, cluster-wide
+sync_lease = create_lease("periodic_joke_sync")
+
+async def periodic_joke_sync(client: "httpx.AsyncClient"):
+    """Periodically fetch a batch of jokes over the worker's shared keep-alive client"""
+    while True:
+        try:
+            stats = await sync_jokes(client)
+            logger.info("Periodic sync finished: {}", asdict(stats))
+        except Exception as e:
+            logger.error("Error in periodic sync: {}", e)
+        await asyncio.sleep(settings.sync_interval_seconds)
+
+# Only the holder of this lease recounts the /jokes/stats counters, cluster-wide
+stats_lease = create_lease("reconcile_joke_stats")
+
+async def periodic_stats_reconciliation():
+    """Recount the joke stats from the collection now and every STATS_RECONCILE_SECONDS"""
+    while True:
+        try:
+            await joke_stats.reconcile()
+        except Exception as e:
+            logger.error("Error reconciling joke stats: {}", e)
+        await asyncio.sleep(settings.stats_reconcile_seconds)
+
+# Only the holder of this lease prunes change feed tombstones, cluster-wide
+changes_lease = create_lease("prune_joke_tombstones")
+
+async def periodic_tombstone_pruning():
+    """Drop tombstones past CHANGE_FEED_RETENTION_SECONDS now and every CHANGE_FEED_PRUNE_SECONDS"""
     while True:
         try:
-            await joke_service.fetch_and_save_joke()
+            await joke_change_feed.prune(settings.change_feed_retention_seconds)
         except Exception as e:
-            print(f"Error in periodic sync: {e}")
-        finally:
-            await asyncio.sleep(3600) 
\ No newline at end of file
+            logger.error("Error pruning joke tombstones: {}", e)
+        await asyncio.sleep(settings.change_feed_prune_seconds)
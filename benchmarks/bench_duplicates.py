@@ -0,0 +1,117 @@
+"""Near-duplicate index: insert latency, recall and false positives over synthetic jokes.
+
+    python -m benchmarks.bench_duplicates [--jokes 1000000] [--inserts 2000] [--threshold 0.6]
+
+Builds a `JokeDuplicateIndex` over jokes drawn from a Zipf-distributed
+vocabulary, then times what a create does with the check enabled: signing the
+new joke, looking it up and adding it. Recall is measured on perturbed copies of
+stored jokes (re-punctuated, one word added, one word swapped), false positives
+on fresh jokes. No database is needed.
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import sys
+import time
+from bson import ObjectId
+from app.core.minhash import minhash
+from app.services.duplicate_index import JokeDuplicateIndex
+from benchmarks.common import make_vocabulary, summarize
+
+def perturbations(rng: random.Random, vocabulary):
+    """Ways a copied joke gets reworded, each applied to the joke's word list"""
+    def repunctuate(joke):
+        return ", ".join(word.upper() if rng.random() < 0.3 else word for word in joke) + "?!"
+
+    def add_word(joke):
+        position = rng.randrange(len(joke) + 1)
+        return " ".join(joke[:position] + [rng.choice(vocabulary)] + joke[position:])
+
+    def swap_word(joke):
+        position = rng.randrange(len(joke))
+        return " ".join(joke[:position] + [rng.choice(vocabulary)] + joke[position + 1:])
+
+    return {"repunctuated": repunctuate, "one_word_added": add_word, "one_word_swapped": swap_word}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jokes", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--inserts", type=int, default=2000)
+    parser.add_argument("--probes", type=int, default=1000, help="Perturbed copies per kind for recall")
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--bucket-bits", type=int, default=16)
+    parser.add_argument("--clusters", action="store_true", help="Also time a full cluster scan")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    words, cum_weights = make_vocabulary(args.vocabulary, rng)
+
+    def new_joke():
+        return rng.choices(words, cum_weights=cum_weights, k=rng.randint(8, 20))
+
+    jokes = [new_joke() for _ in range(args.jokes)]
+    started = time.perf_counter()
+    signatures = [minhash(" ".join(joke)) for joke in jokes]
+    sign_seconds = time.perf_counter() - started
+
+    ids = [ObjectId() for _ in jokes]
+    index = JokeDuplicateIndex(bucket_bits=args.bucket_bits)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    for joke_id, signature in zip(ids, signatures):
+        index._append(joke_id, signature)  # as JokeDuplicateIndex.build does
+    index.reindex()
+    build_seconds = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    del signatures
+
+    # What create_joke does with NEAR_DUPLICATE_THRESHOLD set (minus the database write)
+    insert_samples = []
+    flagged = 0
+    for _ in range(args.inserts):
+        text = " ".join(new_joke())
+        started = time.perf_counter()
+        signature = minhash(text)
+        similar = index.similar(signature, args.threshold, limit=5)
+        index.add(ObjectId(), signature)
+        insert_samples.append(time.perf_counter() - started)
+        flagged += bool(similar)
+
+    recall = {}
+    for kind, perturb in perturbations(rng, words[:5000]).items():
+        found = 0
+        for _ in range(args.probes):
+            position = rng.randrange(args.jokes)
+            similar = index.similar(minhash(perturb(jokes[position])), args.threshold, limit=5)
+            found += any(joke_id == ids[position] for joke_id, _ in similar)
+        recall[kind] = round(found / args.probes, 4)
+
+    results = {
+        "jokes": args.jokes,
+        "threshold": args.threshold,
+        "bucket_bits": args.bucket_bits,
+        "sign_us_per_joke": round(sign_seconds / args.jokes * 1e6, 1),
+        "build_seconds": round(build_seconds, 2),
+        "index_rss_mb": round((rss_after - rss_before) / 1024, 1),
+        "insert": summarize(insert_samples),
+        "recall": recall,
+        "false_positive_rate": round(flagged / args.inserts, 4),
+    }
+    if args.clusters:
+        started = time.perf_counter()
+        clusters = asyncio.run(index.clusters(args.threshold))
+        results["clusters"] = {"count": len(clusters), "seconds": round(time.perf_counter() - started, 2)}
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    sys.exit(main())
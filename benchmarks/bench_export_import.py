@@ -0,0 +1,108 @@
+"""Measure streaming export and import throughput of the jokes collection.
+
+    python -m benchmarks.bench_export_import --size 1M
+    python -m benchmarks.bench_export_import --size 100k --gzip --backend memory
+
+Seeds `--size` synthetic jokes into a dedicated database (DATABASE_NAME, default
+`dadjokes_bench`), exports them with `JokeService.export_jokes` into a temporary
+file, empties the collection and imports the file back through
+`JokeService.import_jokes` in 64 KiB reads, as POST /jokes/import would receive
+them. Reports rows/s, MB/s and the process's peak RSS growth for each phase,
+which stays flat as the size grows (with `--backend memory` the data itself
+lives in the process, so only the throughput is meaningful).
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from benchmarks.seed import parse_size, seed
+
+READ_SIZE = 64 * 1024
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+async def read_file(path: str):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+async def run(args) -> dict:
+    from app.core.config import settings
+    from app.database import init_db
+    from app.models import Joke
+    from app.services.joke_service import JokeService, ndjson_lines
+
+    client = await init_db()
+    try:
+        await seed(args.size, drop=True)
+        gzip_level = settings.export_gzip_level if args.gzip else None
+        with tempfile.NamedTemporaryFile(suffix=".ndjson.gz" if args.gzip else ".ndjson", delete=False) as f:
+            path = f.name
+            rss_before = peak_rss_mb()
+            started = time.perf_counter()
+            async for chunk in JokeService.export_jokes(settings.export_batch_size, gzip_level):
+                f.write(chunk)
+            export_seconds = time.perf_counter() - started
+            export_rss = peak_rss_mb() - rss_before
+        size_mb = os.path.getsize(path) / 1e6
+
+        await Joke.get_motor_collection().delete_many({})
+        rss_before = peak_rss_mb()
+        started = time.perf_counter()
+        lines = ndjson_lines(read_file(path), args.gzip, settings.import_max_line_bytes)
+        result = await JokeService.import_jokes(lines, settings.bulk_chunk_size)
+        import_seconds = time.perf_counter() - started
+        import_rss = peak_rss_mb() - rss_before
+        os.unlink(path)
+    finally:
+        client.close()
+
+    return {
+        "export": {
+            "seconds": round(export_seconds, 2),
+            "rows_per_s": round(args.size / export_seconds),
+            "mb_per_s": round(size_mb / export_seconds, 2),
+            "peak_rss_growth_mb": round(export_rss, 1),
+        },
+        "import": {
+            "seconds": round(import_seconds, 2),
+            "rows_per_s": round(args.size / import_seconds),
+            "mb_per_s": round(size_mb / import_seconds, 2),
+            "peak_rss_growth_mb": round(import_rss, 1),
+            "created": result.created,
+            "rejected": result.duplicates + result.invalid + result.failed,
+        },
+        "file_mb": round(size_mb, 2),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="100k", help="Jokes to export and import, e.g. 100k, 1M")
+    parser.add_argument("--gzip", action="store_true", help="Compress the export (EXPORT_GZIP_LEVEL)")
+    parser.add_argument("--backend", choices=("mongo", "memory"), default="mongo")
+    args = parser.parse_args(argv)
+    args.size = parse_size(args.size)
+
+    # Never benchmark against the app's real database
+    os.environ.setdefault("DATABASE_NAME", "dadjokes_bench")
+    from app.core.config import settings
+    settings.database_name = os.environ["DATABASE_NAME"]
+    if args.backend == "memory":
+        from benchmarks.loadtest import use_memory_backend
+        use_memory_backend()
+
+    report = {"config": {"size": args.size, "gzip": args.gzip, "backend": args.backend}, **asyncio.run(run(args))}
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
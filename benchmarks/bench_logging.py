@@ -0,0 +1,92 @@
+"""Per-request logging overhead: synchronous sinks vs the queued, sampled pipeline.
+
+    python -m benchmarks.bench_logging [--requests 20000] [--sample-rate 0.1]
+
+Each simulated request makes the same loguru calls as a create/get round trip
+in the app. "before" mirrors the original setup (synchronous stdout and DEBUG
+file sinks formatted by loguru, eager f-strings); "after" uses the app's
+`configure_sinks` pipeline (records queued to a background writer, console
+INFO sampling, full DEBUG in the file) with lazy arguments. Both write to real
+files in a temporary directory. `per_request_us` is the time spent on the
+request path; `total_with_drain_seconds` includes waiting for the writer.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from bson import ObjectId
+from loguru import logger
+from app.core.config import settings
+from app.core.logging import _request_sampled, configure_sinks, shutdown_logging
+
+CONSOLE_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+FILE_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
+JOKE_TEXT = "Why did the scarecrow win an award? Because he was outstanding in his field!"
+
+def configure_before(directory: Path):
+    logger.remove()
+    logger.add(open(directory / "console.log", "a"), format=CONSOLE_FORMAT, level="INFO")
+    logger.add(directory / "app.log", format=FILE_FORMAT, level="DEBUG")
+
+def configure_after(directory: Path):
+    settings.log_level, settings.log_file_level, settings.log_enqueue = "INFO", "DEBUG", True
+    configure_sinks(open(directory / "console.log", "a"), directory / "app.log")
+
+def request_before(joke_id):
+    logger.info(f"Fetching joke with ID: {joke_id}")
+    logger.info(f"Creating new joke with text: {JOKE_TEXT[:30]}...")
+    logger.debug(f"Received joke from API: {JOKE_TEXT[:30]}...")
+    logger.info(f"Successfully created joke with ID: {joke_id}")
+
+def request_after(joke_id, sample_rate, rng_state=[0]):
+    # Deterministic sampling so both runs see the same share of sampled requests
+    rng_state[0] += 1
+    _request_sampled.set(rng_state[0] % round(1 / sample_rate) == 0 if sample_rate < 1 else True)
+    logger.info("Fetching joke with ID: {}", joke_id)
+    logger.info("Creating new joke with text: {}...", JOKE_TEXT[:30])
+    logger.debug("Received joke from API: {}...", JOKE_TEXT[:30])
+    logger.info("Successfully created joke with ID: {}", joke_id)
+
+def run(name, directory, requests, configure, make_request):
+    configure(directory)
+    joke_ids = [ObjectId() for _ in range(requests)]
+    started = time.perf_counter()
+    for joke_id in joke_ids:
+        make_request(joke_id)
+    request_seconds = time.perf_counter() - started
+    logger.complete()
+    shutdown_logging()
+    drained_seconds = time.perf_counter() - started
+    logger.remove()
+    return {
+        "run": name,
+        "per_request_us": round(request_seconds / requests * 1e6, 2),
+        "requests_per_second": round(requests / request_seconds),
+        "total_with_drain_seconds": round(drained_seconds, 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        results = [
+            run("before", directory, args.requests, configure_before, request_before),
+            run("after", directory, args.requests, configure_after,
+                lambda joke_id: request_after(joke_id, args.sample_rate)),
+        ]
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
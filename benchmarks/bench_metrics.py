@@ -0,0 +1,70 @@
+"""Per-request cost of the metrics middleware and DB timers.
+
+    python -m benchmarks.bench_metrics [--requests 200000]
+
+Drives a trivial ASGI app directly, with and without `MetricsMiddleware`, and
+reports the difference per request. The production target is < 5 us.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from app.core.metrics import MetricsMiddleware, db_timer
+
+class FakeRoute:
+    path = "/jokes/{joke_id}"
+
+async def endpoint(scope, receive, send):
+    scope["route"] = FakeRoute
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+async def send(message):
+    pass
+
+async def drive(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/jokes/1"}
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - started
+
+def time_db_timer(requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        with db_timer("get_joke"):
+            pass
+    return time.perf_counter() - started
+
+async def run(requests: int) -> dict:
+    await drive(MetricsMiddleware(endpoint), 1000)  # warm up
+    bare = min([await drive(endpoint, requests) for _ in range(3)])
+    wrapped = min([await drive(MetricsMiddleware(endpoint), requests) for _ in range(3)])
+    timer = min([time_db_timer(requests) for _ in range(3)])
+    return {
+        "requests": requests,
+        "bare_us": round(bare / requests * 1e6, 3),
+        "with_middleware_us": round(wrapped / requests * 1e6, 3),
+        "middleware_overhead_us": round((wrapped - bare) / requests * 1e6, 3),
+        "db_timer_us": round(timer / requests * 1e6, 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args.requests))
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Per-request cost of the profiling middleware: disabled, capturing spans, and profiling.
+
+    python -m benchmarks.bench_profiling [--requests 100000]
+
+Drives a trivial ASGI app that records one DB span, directly and wrapped in
+`ProfilingMiddleware` with every option off (the default), with slow-request
+capture on (spans collected, threshold never reached), and with every request
+profiled by the stack sampler and by cProfile. Profiles are written to a
+temporary directory. No database is needed.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from app.core.config import settings
+from app.core.metrics import db_timer
+from app.core.profiling import ProfilingMiddleware
+
+class FakeRoute:
+    name = "get_joke"
+    path = "/jokes/{joke_id}"
+
+async def endpoint(scope, receive, send):
+    scope["route"] = FakeRoute
+    with db_timer("get_joke"):
+        pass
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+async def send(message):
+    pass
+
+async def drive(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/jokes/1", "headers": [(b"x-profile", b"bench")]}
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - started
+
+async def best_of(app, requests: int) -> float:
+    return min([await drive(app, requests) for _ in range(3)]) / requests * 1e6
+
+async def run(requests: int, profiled_requests: int) -> dict:
+    await drive(ProfilingMiddleware(endpoint), 1000)  # warm up
+    bare = await best_of(endpoint, requests)
+    disabled = await best_of(ProfilingMiddleware(endpoint), requests)
+    settings.slow_request_ms = 60_000
+    spans = await best_of(ProfilingMiddleware(endpoint), requests)
+    with tempfile.TemporaryDirectory() as directory:
+        settings.profiling_dir, settings.profiling_token = directory, "bench"
+        sampled = await best_of(ProfilingMiddleware(endpoint), profiled_requests)
+        settings.profiling_mode = "cprofile"
+        cprofiled = await best_of(ProfilingMiddleware(endpoint), profiled_requests)
+    return {
+        "requests": requests,
+        "bare_us": round(bare, 3),
+        "disabled_overhead_us": round(disabled - bare, 3),
+        "span_capture_overhead_us": round(spans - bare, 3),
+        "sampled_profile_us": round(sampled - bare, 1),
+        "cprofile_us": round(cprofiled - bare, 1),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--profiled-requests", type=int, default=200)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args.requests, args.profiled_requests))
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Query latency of the in-process search index over synthetic jokes.
+
+    python -m benchmarks.bench_search [--jokes 1000000] [--queries 200]
+
+Jokes are drawn from a Zipf-distributed vocabulary so that common words have
+long postings lists, like real text. No database is needed.
+"""
+import argparse
+import json
+import random
+import resource
+import statistics
+import sys
+import time
+from bson import ObjectId
+from app.services.search_index import JokeSearchIndex
+from benchmarks.common import make_vocabulary, summarize
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jokes", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    words, cum_weights = make_vocabulary(args.vocabulary, rng)
+
+    index = JokeSearchIndex()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    for _ in range(args.jokes):
+        index.add(ObjectId(), " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(8, 20))))
+    index._vocab.sort()
+    build_seconds = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    common = words[:100]
+    medium = words[100:5000]
+    rare = words[5000:]
+    query_sets = {
+        "rare_term": lambda: rng.choice(rare),
+        "medium_term": lambda: rng.choice(medium),
+        "common_term": lambda: rng.choice(common),
+        "two_terms": lambda: f"{rng.choice(common)} {rng.choice(medium)}",
+        "typeahead_prefix": lambda: f"{rng.choice(common)} {rng.choice(medium)[:3]}",
+    }
+    results = {
+        "jokes": args.jokes,
+        "terms": len(index._postings),
+        "build_seconds": round(build_seconds, 2),
+        "index_rss_mb": round((rss_after - rss_before) / 1024, 1),
+        "queries": {},
+    }
+    for name, make_query in query_sets.items():
+        samples, matches = [], []
+        for _ in range(args.queries):
+            query = make_query()
+            started = time.perf_counter()
+            total_matches, _ = index.search(query, limit=20)
+            samples.append(time.perf_counter() - started)
+            matches.append(total_matches)
+        results["queries"][name] = {**summarize(samples), "median_matches": int(statistics.median(matches))}
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
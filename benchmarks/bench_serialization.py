@@ -0,0 +1,101 @@
+"""CPU cost of rendering joke pages: regular response_model path vs the orjson fast path.
+
+    python -m benchmarks.bench_serialization [--page-sizes 1 100 1000]
+
+Starts from raw documents as Motor returns them and times what each path does
+per page, excluding the database round trip: regular builds Beanie `Joke`
+documents, validates them against `response_model` and encodes with the stdlib
+JSON encoder; fast validates `JokeOut` once and encodes with orjson. Both must
+produce the same bytes. Beanie is initialized on mongomock-motor when installed,
+otherwise against MONGODB_URL.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+from beanie import init_beanie
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from beanie.odm.utils.parsing import parse_obj
+from app.core.responses import jokes_response
+from app.models import Joke
+
+async def init_models():
+    try:
+        from mongomock_motor import AsyncMongoMockClient as Client
+    except ImportError:
+        from motor.motor_asyncio import AsyncIOMotorClient as Client
+    from app.core.config import settings
+    client = Client(settings.mongodb_url)
+    await init_beanie(database=client[settings.database_name or "dadjokes_bench"], document_models=[Joke])
+
+def raw_documents(count: int) -> List[dict]:
+    created = datetime(2024, 1, 1, 12, 0, 0, 123000)
+    return [{
+        "_id": ObjectId(),
+        "joke_text": f"Why did joke {i} cross the road? To get to the other punchline, café \U0001F600",
+        "source_id": f"src{i}" if i % 2 else None,
+        "created_at": created + timedelta(seconds=i),
+        "updated_at": created + timedelta(minutes=i) if i % 3 == 0 else None,
+    } for i in range(count)]
+
+async def render_regular(field, documents: List[dict]) -> bytes:
+    jokes = [parse_obj(Joke, doc) for doc in documents]
+    content = await serialize_response(field=field, response_content=jokes, is_coroutine=True)
+    return JSONResponse(content).body
+
+async def render_fast(documents: List[dict]) -> bytes:
+    return jokes_response(documents).body
+
+async def time_render(render, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            await render()
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best
+
+async def run(page_sizes: List[int], budget: int) -> dict:
+    await init_models()
+    field = create_response_field(name="Response_get_jokes", type_=List[Joke], mode="serialization")
+    results = {}
+    for size in page_sizes:
+        documents = raw_documents(size)
+        regular_body = await render_regular(field, documents)
+        fast_body = await render_fast(documents)
+        if regular_body != fast_body:
+            sys.exit(f"Fast path output differs from the regular path at page size {size}")
+        repeat = max(1, budget // size)
+        regular = await time_render(lambda: render_regular(field, documents), repeat)
+        fast = await time_render(lambda: render_fast(documents), repeat)
+        results[str(size)] = {
+            "regular_ms": round(regular * 1000, 3),
+            "fast_ms": round(fast * 1000, 3),
+            "regular_us_per_joke": round(regular / size * 1e6, 2),
+            "fast_us_per_joke": round(fast / size * 1e6, 2),
+            "speedup": round(regular / fast, 2),
+        }
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--budget", type=int, default=20_000, help="Jokes rendered per timing run")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args.page_sizes, args.budget))
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
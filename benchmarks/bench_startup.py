@@ -0,0 +1,71 @@
+"""Measure cold start: app import time, and time to /health/live and /health/ready.
+
+    python -m benchmarks.bench_startup --runs 5 --budget 5
+
+Each run starts a fresh `uvicorn app.main:app` process against the MongoDB at
+MONGODB_URL and polls the health endpoints; `import` is measured in a separate
+fresh interpreter. Exits with status 1 when the median time to ready exceeds
+`--budget` seconds.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+from benchmarks.loadtest import free_port, start_server
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+def measure_import() -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], check=True, capture_output=True, text=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+def wait_for(url: str, started: float, timeout: float) -> float:
+    """Seconds from `started` until `url` answers 200"""
+    while time.perf_counter() - started < timeout:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} did not answer 200 within {timeout}s")
+
+def measure_start(timeout: float) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    server = start_server("app.main:app", port, {})
+    try:
+        live = wait_for(f"http://127.0.0.1:{port}/health/live", started, timeout)
+        ready = wait_for(f"http://127.0.0.1:{port}/health/ready", started, timeout)
+        startup = httpx.get(f"http://127.0.0.1:{port}/health/ready").json()["startup_seconds"]
+    finally:
+        server.terminate()
+        server.wait()
+    return {"live_s": round(live, 3), "ready_s": round(ready, 3), "startup_seconds": startup}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60, help="Give up on a run after this many seconds")
+    parser.add_argument("--budget", type=float, help="Fail if the median time to ready exceeds this many seconds")
+    args = parser.parse_args(argv)
+
+    imports = [measure_import() for _ in range(args.runs)]
+    starts = [measure_start(args.timeout) for _ in range(args.runs)]
+    report = {
+        "import_s": round(statistics.median(imports), 3),
+        "live_s": round(statistics.median(run["live_s"] for run in starts), 3),
+        "ready_s": round(statistics.median(run["ready_s"] for run in starts), 3),
+        "runs": starts,
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    if args.budget is not None and report["ready_s"] > args.budget:
+        print(f"Median time to ready {report['ready_s']}s exceeds the {args.budget}s budget", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
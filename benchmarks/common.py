@@ -0,0 +1,34 @@
+"""Helpers shared by the benchmarks: synthetic vocabularies and latency summaries."""
+import random
+import statistics
+from typing import List, Tuple
+
+def make_vocabulary(size: int, rng: random.Random) -> Tuple[List[str], List[float]]:
+    """`size` random words and Zipf cumulative weights for `rng.choices(words, cum_weights=...)`"""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 9))))
+    words = sorted(words)
+    rng.shuffle(words)
+    cum_weights, total = [], 0.0
+    for rank in range(size):
+        total += 1 / (rank + 1)
+        cum_weights.append(total)
+    return words, cum_weights
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def summarize(samples: List[float]) -> dict:
+    """Latency percentiles, max and mean in milliseconds of samples in seconds"""
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3) if ordered else 0.0,
+    }
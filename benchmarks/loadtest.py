@@ -0,0 +1,266 @@
+"""Load test every /jokes endpoint and compare against a stored baseline.
+
+    python -m benchmarks.loadtest --size 100k --mode asgi --output results.json
+    python -m benchmarks.loadtest --size 1M --mode uvicorn --workers 4 --baseline baseline.json
+
+The jokes collection is seeded with `--size` synthetic jokes, either in the
+MongoDB at MONGODB_URL (a dedicated DATABASE_NAME, default `dadjokes_bench`) or
+with `--backend memory` in mongomock_motor when it is installed (ASGI mode only).
+The app runs in-process through ASGI, or as `uvicorn --workers N` subprocesses;
+`/jokes/sync` is pointed at the local stub API in `benchmarks.stub_api`.
+
+Each endpoint is driven by `--concurrency` clients for `--requests` requests and
+reported as throughput and p50/p95/p99 latency in milliseconds. With
+`--baseline`, the run exits with status 1 when an endpoint's p95 grows, or its
+throughput drops, by more than `--threshold` (a fraction) against the baseline.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+import httpx
+from benchmarks.common import summarize
+from benchmarks.seed import parse_size, seed
+
+def summarize_run(latencies: List[float], errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        **summarize(latencies),
+    }
+
+async def drive(client: httpx.AsyncClient, make_request: Callable, requests: int, concurrency: int,
+                start: int = 0) -> dict:
+    """Issue requests `start` .. `start + requests` from `concurrency` concurrent clients"""
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count(start)
+
+    async def worker():
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if i >= start + requests:
+                return
+            method, url, kwargs, expected = make_request(i)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                await response.aread()
+                ok = response.status_code in expected
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize_run(latencies, errors, time.perf_counter() - started)
+
+def scenarios(ids: List[str], victims: List[str], run_id: str) -> Dict[str, Callable]:
+    """Request factories per endpoint: index -> (method, url, kwargs, expected statuses)"""
+    bulk_body = [{"joke_text": f"bulk {run_id} {j}"} for j in range(100)]
+    return {
+        "GET /jokes/{joke_id}": lambda i: ("GET", f"/jokes/{ids[i % len(ids)]}", {}, (200,)),
+        "GET /jokes/ (page)": lambda i: ("GET", "/jokes/", {"params": {"limit": 100}}, (200,)),
+        "GET /jokes/ (cursor)": lambda i: (
+            "GET", "/jokes/", {"params": {"limit": 100, "after": ids[i % len(ids)]}}, (200,)
+        ),
+        "GET /jokes/random": lambda i: (
+            "GET", "/jokes/random", {"params": {"count": 10}, "headers": {"X-Client-Id": f"c{i % 50}"}}, (200,)
+        ),
+        "GET /jokes/search": lambda i: (
+            "GET", "/jokes/search", {"params": {"q": ("cat", "dad road", "chick", "moon fish")[i % 4]}}, (200,)
+        ),
+        "GET /jokes/stats": lambda i: ("GET", "/jokes/stats", {"params": {"days": 30}}, (200,)),
+        "GET /jokes/changes": lambda i: ("GET", "/jokes/changes", {"params": {"limit": 100}}, (200,)),
+        "POST /jokes/": lambda i: ("POST", "/jokes/", {"json": {"joke_text": f"load {run_id} {i}"}}, (201,)),
+        "POST /jokes/bulk": lambda i: (
+            "POST", "/jokes/bulk",
+            {"json": [{"joke_text": item["joke_text"] + f" {i}"} for item in bulk_body]}, (200,)
+        ),
+        "PUT /jokes/{joke_id}": lambda i: (
+            "PUT", f"/jokes/{victims[i % len(victims)]}", {"json": {"joke_text": f"edited {run_id} {i}"}}, (200,)
+        ),
+        "DELETE /jokes/{joke_id}": lambda i: ("DELETE", f"/jokes/{victims[i % len(victims)]}", {}, (204, 404)),
+        "POST /jokes/sync": lambda i: ("POST", "/jokes/sync", {}, (201, 400)),
+    }
+
+async def wait_until_ready(client: httpx.AsyncClient, url: str, timeout: float = 600):
+    """Wait until `url` answers with 200 (for the app: until the search index is built)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get(url)
+            if response.status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in time")
+
+async def run_scenarios(client: httpx.AsyncClient, args, only: Optional[List[str]] = None) -> dict:
+    await wait_until_ready(client, "/jokes/search?q=dad")
+    response = await client.get("/jokes/", params={"limit": 1000})
+    ids = [joke["_id"] for joke in response.json()]
+    run_id = str(int(time.time() * 1000))
+    warmup = min(args.requests // 10, 100)
+    created = await client.post("/jokes/bulk", json=[
+        {"joke_text": f"victim {run_id} {i}"} for i in range(args.requests + warmup)
+    ])
+    victims = [result["id"] for result in created.json()["results"] if result["id"]]
+
+    results = {}
+    for name, make_request in scenarios(ids, victims, run_id).items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        # Warm up caches, pools and connections before measuring, on separate request indexes
+        await drive(client, make_request, warmup, args.concurrency, start=args.requests)
+        results[name] = await drive(client, make_request, args.requests, args.concurrency)
+        print(f"{name:<28} {json.dumps(results[name])}", file=sys.stderr)
+    return results
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(app_path: str, port: int, env: dict, workers: int = 1) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app_path, "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, **env}, stdout=subprocess.DEVNULL,
+    )
+
+def use_memory_backend():
+    """Point the app's Mongo client at mongomock_motor (single process only)"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("--backend memory needs mongomock_motor: pip install mongomock-motor")
+    import app.database
+    app.database.AsyncIOMotorClient = AsyncMongoMockClient
+
+async def seed_database(count: int):
+    from app.database import init_db
+    client = await init_db()
+    try:
+        await seed(count, drop=True)
+    finally:
+        client.close()
+
+async def run_asgi(args, stub_url: str) -> dict:
+    from asgi_lifespan import LifespanManager
+    from app.core.config import settings
+    from app.main import app
+    settings.dadjokes_api_url = stub_url
+    if args.backend == "memory":
+        use_memory_backend()
+
+    async with LifespanManager(app, startup_timeout=600, shutdown_timeout=30):
+        # Warm-up (database and Beanie) continues in the background after startup
+        while not app.state.resources.ready:
+            await asyncio.sleep(0.05)
+        # Seed after startup so the in-memory backend shares the app's client
+        await seed(args.size, drop=True)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await run_scenarios(client, args, args.only)
+
+async def run_uvicorn(args, stub_url: str) -> dict:
+    if args.backend == "memory":
+        sys.exit("--backend memory only works with --mode asgi (workers do not share memory)")
+    await seed_database(args.size)
+    port = free_port()
+    server = start_server("app.main:app", port, {
+        "DADJOKES_API_URL": stub_url,
+        "DATABASE_NAME": os.environ["DATABASE_NAME"],
+    }, args.workers)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            return await run_scenarios(client, args, args.only)
+    finally:
+        server.terminate()
+        server.wait()
+
+async def wait_for_stub(url: str):
+    async with httpx.AsyncClient() as client:
+        await wait_until_ready(client, url, timeout=30)
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Describe every endpoint that regressed past `threshold` against the baseline"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s"
+            )
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="1k", help="Seeded jokes, e.g. 1k, 100k, 1M")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--backend", choices=("mongo", "memory"), default="mongo")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (uvicorn mode)")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--only", nargs="*", help="Only run endpoints whose name contains one of these")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against results JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed regression, as a fraction")
+    args = parser.parse_args(argv)
+    args.size = parse_size(args.size)
+
+    # Never benchmark against the app's real database
+    os.environ.setdefault("DATABASE_NAME", "dadjokes_bench")
+    from app.core.config import settings
+    settings.database_name = os.environ["DATABASE_NAME"]
+
+    stub_port = free_port()
+    stub = start_server("benchmarks.stub_api:app", stub_port, {})
+    stub_url = f"http://127.0.0.1:{stub_port}/"
+    try:
+        asyncio.run(wait_for_stub(stub_url))
+        runner = run_asgi if args.mode == "asgi" else run_uvicorn
+        results = asyncio.run(runner(args, stub_url))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    report = {
+        "config": {key: getattr(args, key) for key in ("size", "mode", "backend", "workers", "requests", "concurrency")},
+        "results": results,
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print("Regressions against " + args.baseline + ":\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+        print(f"No regressions past {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
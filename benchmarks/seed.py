@@ -0,0 +1,58 @@
+"""Seed the jokes collection with synthetic jokes for benchmarking.
+
+    python -m benchmarks.seed 100k [--drop]
+
+Uses MONGODB_URL / DATABASE_NAME like the app and writes through the bulk path.
+"""
+import argparse
+import asyncio
+import random
+from app.models import Joke
+from app.services.joke_service import JokeService
+
+WORDS = (
+    "dad cat dog scarecrow cookie doctor math book field award egg crack pun bar walk "
+    "road chicken skeleton ghost coffee cow moon bicycle fish tree computer mushroom"
+).split()
+
+def parse_size(value: str) -> int:
+    """Parse dataset sizes like 1k, 100k or 1M"""
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    suffix = value[-1].lower()
+    if suffix in multipliers:
+        return int(float(value[:-1]) * multipliers[suffix])
+    return int(value)
+
+def synthetic_jokes(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    for i in range(count):
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16)))
+        yield {"joke_text": f"{words} #{i}", "source_id": f"seed-{i}" if i % 2 else None}
+
+async def seed(count: int, drop: bool = False, chunk_size: int = 10_000):
+    """Insert `count` synthetic jokes (Beanie must already be initialized)"""
+    if drop:
+        await Joke.get_motor_collection().delete_many({})
+    batch = []
+    for joke in synthetic_jokes(count):
+        batch.append(joke)
+        if len(batch) == chunk_size:
+            await JokeService.bulk_create_jokes(batch, chunk_size)
+            batch = []
+    if batch:
+        await JokeService.bulk_create_jokes(batch, chunk_size)
+
+async def main(count: int, drop: bool):
+    from app.database import init_db
+    client = await init_db()
+    try:
+        await seed(count, drop)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("size", help="Number of jokes, e.g. 1k, 100k, 1M")
+    parser.add_argument("--drop", action="store_true", help="Delete existing jokes first")
+    args = parser.parse_args()
+    asyncio.run(main(parse_size(args.size), args.drop))
@@ -0,0 +1,28 @@
+"""Local stand-in for icanhazdadjoke.com used by the load tests.
+
+    uvicorn benchmarks.stub_api:app --port 8099
+
+Returns a random joke in the same JSON shape as the real API, with an optional
+artificial latency (STUB_API_LATENCY_MS) to mimic a remote upstream.
+"""
+import asyncio
+import os
+import random
+import uuid
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+LATENCY = float(os.getenv("STUB_API_LATENCY_MS", "0")) / 1000
+
+async def random_joke(request):
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    joke_id = uuid.uuid4().hex[:10]
+    return JSONResponse({
+        "id": joke_id,
+        "joke": f"Stub joke {joke_id}: why did the benchmark cross the road? {random.random()}",
+        "status": 200,
+    })
+
+app = Starlette(routes=[Route("/", random_joke)])
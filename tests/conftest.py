@@ -3,7 +3,17 @@ import asyncio
 from httpx import AsyncClient
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
-from app.models import Joke
+from app.models import ChangeSequence, Joke, JokeStats, JokeTombstone, Lease
+from app.core.admission import admission
+from app.core.cache import joke_cache
+from app.core.circuit_breaker import external_api_breaker
+from app.core.profiling import slow_requests
+from app.services.duplicate_index import joke_duplicate_index
+from app.services.events import joke_events
+from app.services.joke_stats import joke_stats
+from app.services.random_pool import random_joke_pool
+from app.services.search_index import joke_search_index
+from app.services.sync_buffer import external_joke_buffer
 from app.main import app
 
 
@@ -26,7 +36,7 @@ async def db():
     # Initialize Beanie with the test database
     await init_beanie(
         database=database,
-        document_models=[Joke]
+        document_models=[Joke, JokeStats, JokeTombstone, ChangeSequence, Lease]
     )
     await database["joke"].create_index("id")  
     yield database
@@ -42,6 +52,20 @@ async def setup_db(db):
     finally:
         if db is not None:
             await Joke.delete_all()
+            await Lease.delete_all()
+            await JokeStats.delete_all()
+            await JokeTombstone.delete_all()
+            await ChangeSequence.delete_all()
+        joke_cache.clear()
+        random_joke_pool.clear()
+        joke_search_index.reset()
+        joke_duplicate_index.reset()
+        joke_events.reset()
+        joke_stats.clear()
+        admission.reset()
+        external_api_breaker.reset()
+        external_joke_buffer.clear()
+        slow_requests.clear()
 
 @pytest.fixture
 async def test_client(db):
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.core.admission import ConcurrencyLimiter, TokenBucketLimiter, admission
+from app.core.config import settings
+from app.core.exceptions import RateLimitExceededException, ServiceOverloadedException
+from app.services.joke_service import JokeService
+
+pytestmark = pytest.mark.asyncio
+
+class TestConcurrencyLimiter:
+    async def test_queue_then_shed(self):
+        """Test requests past the limit queue in order, and are rejected once the queue is full"""
+        limiter = ConcurrencyLimiter("test", limit=1, max_queue=2, max_wait=1)
+        await limiter.acquire()
+        admitted = []
+
+        async def request(name):
+            await limiter.acquire()
+            admitted.append(name)
+
+        waiting = [asyncio.create_task(request(name)) for name in ("first", "second")]
+        await asyncio.sleep(0)
+        with pytest.raises(ServiceOverloadedException) as shed:
+            await limiter.acquire()
+        assert shed.value.headers["Retry-After"] == "1"
+
+        limiter.release()
+        await waiting[0]
+        limiter.release()
+        await waiting[1]
+        assert admitted == ["first", "second"]
+        assert limiter.stats() == {"limit": 1, "active": 1, "queued": 0, "max_queue": 2, "rejected": 1}
+
+    async def test_queue_timeout(self):
+        """Test a request waiting longer than max_wait is rejected and leaves the queue"""
+        limiter = ConcurrencyLimiter("test", limit=1, max_queue=5, max_wait=0.01)
+        await limiter.acquire()
+
+        with pytest.raises(ServiceOverloadedException):
+            await limiter.acquire()
+
+        assert limiter.stats()["queued"] == 0
+        limiter.release()
+        assert limiter.active == 0
+
+    async def test_cancelled_waiter_does_not_leak_slot(self):
+        """Test a client that goes away while queued does not keep a slot"""
+        limiter = ConcurrencyLimiter("test", limit=1, max_queue=5, max_wait=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limiter.release()
+
+        assert (limiter.active, limiter.stats()["queued"]) == (0, 0)
+
+class TestTokenBucketLimiter:
+    async def test_burst_then_limit(self):
+        """Test a client may burst, is then limited, and other clients are unaffected"""
+        limiter = TokenBucketLimiter("test", rate=1, burst=2, max_clients=10)
+        limiter.check("a")
+        limiter.check("a")
+
+        with pytest.raises(RateLimitExceededException) as limited:
+            limiter.check("a")
+        limiter.check("b")
+
+        assert limited.value.status_code == 429
+        assert limited.value.headers["Retry-After"] == "1"
+
+class TestAdmissionEndpoints:
+    async def test_rate_limited_route(self, test_client, monkeypatch):
+        """Test a per-route rate limit answers 429 only on that route"""
+        monkeypatch.setattr(settings, "rate_limits", {"create_joke": 1})
+        monkeypatch.setattr(settings, "rate_limit_burst_seconds", 2)
+        admission.reset()
+        headers = {"X-Client-Id": "greedy"}
+
+        statuses = [
+            (await test_client.post("/jokes/", json={"joke_text": f"Limited joke {i}"}, headers=headers)).status_code
+            for i in range(3)
+        ]
+
+        assert statuses == [201, 201, 429]
+        assert (await test_client.get("/jokes/", headers=headers)).status_code == 200
+
+    async def test_overload_sheds_with_retry_after(self, test_client, monkeypatch):
+        """Test requests beyond the concurrency limit and queue get a fast 503"""
+        monkeypatch.setattr(settings, "admission_max_concurrency", 1)
+        monkeypatch.setattr(settings, "admission_max_queue", 0)
+        admission.reset()
+        database_busy = asyncio.Event()
+
+        async def slow_list_jokes(limit, after=None):
+            await database_busy.wait()
+            return []
+
+        with patch.object(JokeService, "list_jokes", staticmethod(slow_list_jokes)):
+            first = asyncio.create_task(test_client.get("/jokes/"))
+            while not admission.default.active:
+                assert not first.done()
+                await asyncio.sleep(0.01)
+
+            shed = await test_client.get("/jokes/")
+            database_busy.set()
+            assert (await first).status_code == 200
+
+        assert shed.status_code == 503
+        assert shed.headers["retry-after"] == "1"
+        assert (await test_client.get("/admin/admission")).json()["concurrency"]["default"]["rejected"] == 1
+
+    async def test_slot_held_until_stream_is_sent(self, test_client):
+        """Test a streamed response gives its slot back once the body is sent"""
+        await test_client.post("/jokes/", json={"joke_text": "Exported joke"})
+
+        response = await test_client.get("/jokes/export")
+
+        assert response.status_code == 200
+        assert admission.default.active == 0
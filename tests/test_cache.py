@@ -0,0 +1,36 @@
+from unittest.mock import patch
+from app.core.cache import LRUTTLCache, MISSING
+
+class TestLRUTTLCache:
+    def test_evicts_least_recently_used(self):
+        """Test the oldest unused entry is evicted once the cache is full"""
+        cache = LRUTTLCache(max_size=2, ttl=60, negative_ttl=5)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_entries_expire(self):
+        """Test entries expire after their TTL, negative entries sooner"""
+        cache = LRUTTLCache(max_size=10, ttl=60, negative_ttl=5)
+        with patch("app.core.cache.time.monotonic", return_value=100):
+            cache.set("found", 1)
+            cache.set("not-found", None)
+        with patch("app.core.cache.time.monotonic", return_value=110):
+            assert cache.get("found") == 1
+            assert cache.get("not-found") is MISSING
+        with patch("app.core.cache.time.monotonic", return_value=170):
+            assert cache.get("found") is MISSING
+        assert cache.stats()["expirations"] == 2
+
+    def test_invalidate(self):
+        """Test invalidated entries are no longer served"""
+        cache = LRUTTLCache(max_size=10, ttl=60, negative_ttl=5)
+        cache.set("a", None)
+        cache.invalidate("a")
+
+        assert cache.get("a") is MISSING
@@ -0,0 +1,116 @@
+import orjson
+import pytest
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app.core.config import settings
+from app.models import Joke, JokeTombstone
+from app.services.change_feed import decode_cursor, encode_cursor, joke_change_feed
+from app.tasks.backfill_change_seq import backfill_change_seq
+
+pytestmark = pytest.mark.asyncio
+
+@pytest.fixture
+def settled(monkeypatch):
+    monkeypatch.setattr(settings, "change_feed_settle_ms", 0)
+
+async def read_feed(client, since=None, limit=None):
+    params = {key: value for key, value in (("since", since), ("limit", limit)) if value is not None}
+    response = await client.get("/jokes/changes", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+def summary(page):
+    return [(change["op"], change["_id"]) for change in page["changes"]]
+
+class TestChangeFeed:
+    async def test_pages_follow_writes(self, test_client, settled):
+        """Test creates, updates and deletes come back in order, each joke at its latest change"""
+        ids = [(await test_client.post("/jokes/", json={"joke_text": f"Joke {i}"})).json()["_id"] for i in range(3)]
+        first = await read_feed(test_client, limit=2)
+        await test_client.put(f"/jokes/{ids[0]}", json={"joke_text": "Joke 0, reworded"})
+        await test_client.delete(f"/jokes/{ids[1]}")
+
+        second = await read_feed(test_client, first["next_cursor"], limit=2)
+        third = await read_feed(test_client, second["next_cursor"], limit=2)
+
+        assert summary(first) == [("created", ids[0]), ("created", ids[1])] and first["has_more"]
+        assert summary(second) == [("created", ids[2]), ("updated", ids[0])] and second["has_more"]
+        assert second["changes"][1]["joke"]["joke_text"] == "Joke 0, reworded"
+        assert summary(third) == [("deleted", ids[1])] and not third["has_more"]
+        assert third["changes"][0]["joke"] is None
+        assert (await read_feed(test_client, third["next_cursor"]))["changes"] == []
+        # From the start, jokes appear only at their latest change
+        assert summary(await read_feed(test_client)) == [("created", ids[2]), ("updated", ids[0]), ("deleted", ids[1])]
+
+    async def test_bulk_writes(self, test_client, settled):
+        """Test the bulk create, update and delete paths take their positions in one block each"""
+        created = (await test_client.post("/jokes/bulk", json=[{"joke_text": f"Bulk {i}"} for i in range(3)])).json()
+        ids = [result["id"] for result in created["results"]]
+        await test_client.patch("/jokes/", json=[{"id": ids[2], "joke_text": "Bulk 2, reworded"}])
+        await test_client.request("DELETE", "/jokes/", json={"ids": [ids[0], str(ObjectId())]})
+
+        page = await read_feed(test_client)
+
+        assert summary(page) == [("created", ids[1]), ("updated", ids[2]), ("deleted", ids[0])]
+        seqs = sorted([doc["change_seq"] async for doc in Joke.get_motor_collection().find({})])
+        assert seqs == [2, 4]
+        assert (await JokeTombstone.get_motor_collection().find_one({}))["change_seq"] == 5
+
+    async def test_imported_jokes_are_created(self, test_client, settled):
+        """Test restored jokes that were edited before the backup are reported as created, then updated once rewritten"""
+        joke_id = str(ObjectId())
+        line = {"_id": joke_id, "joke_text": "Restored joke", "created_at": "2026-01-01T00:00:00",
+                "updated_at": "2026-02-01T00:00:00"}
+        body = orjson.dumps(line) + b"\n"
+        await test_client.post("/jokes/import", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+        first = await read_feed(test_client)
+        await test_client.put(f"/jokes/{joke_id}", json={"joke_text": "Restored joke, reworded"})
+
+        assert summary(first) == [("created", joke_id)]
+        assert summary(await read_feed(test_client, first["next_cursor"])) == [("updated", joke_id)]
+
+    async def test_coalesced_creates(self, test_client, settled, monkeypatch):
+        """Test jokes inserted through the write coalescer get positions too"""
+        monkeypatch.setattr(settings, "write_coalescing", True)
+
+        joke = (await test_client.post("/jokes/", json={"joke_text": "Coalesced joke"})).json()
+
+        assert summary(await read_feed(test_client)) == [("created", joke["_id"])]
+
+    async def test_recent_changes_held_back(self, test_client):
+        """Test changes younger than the settle delay wait, without moving the cursor"""
+        await test_client.post("/jokes/", json={"joke_text": "Just written"})
+
+        page = await read_feed(test_client)
+
+        assert page["changes"] == [] and not page["has_more"]
+        assert decode_cursor(page["next_cursor"]) == 0
+
+    async def test_invalid_and_expired_cursors(self, test_client, settled):
+        """Test a garbled cursor is rejected and one older than pruned tombstones must resync"""
+        joke = (await test_client.post("/jokes/", json={"joke_text": "Short-lived"})).json()
+        cursor = (await read_feed(test_client))["next_cursor"]
+        await test_client.delete(f"/jokes/{joke['_id']}")
+        await JokeTombstone.get_motor_collection().update_many({}, {"$set": {"changed_at": datetime.now() - timedelta(days=30)}})
+
+        pruned = await joke_change_feed.prune(retention_seconds=24 * 3600)
+
+        assert pruned == 1
+        assert (await test_client.get("/jokes/changes", params={"since": "not-a-cursor"})).status_code == 400
+        assert (await test_client.get("/jokes/changes", params={"since": encode_cursor(0) + "x"})).status_code == 400
+        assert (await test_client.get("/jokes/changes", params={"since": cursor})).status_code == 410
+        assert (await read_feed(test_client))["changes"] == []
+
+    async def test_backfill(self, test_client, settled):
+        """Test jokes stored before the feed get positions once, after the ones already in it"""
+        await Joke.get_motor_collection().insert_many([
+            {"joke_text": f"Legacy {i}", "created_at": datetime(2026, 1, 1)} for i in range(3)
+        ])
+        joke = (await test_client.post("/jokes/", json={"joke_text": "New joke"})).json()
+
+        assert await backfill_change_seq(batch_size=2) == {"updated": 3}
+        assert await backfill_change_seq(batch_size=2) == {"updated": 0}
+        changes = (await read_feed(test_client))["changes"]
+        assert changes[0]["_id"] == joke["_id"]
+        assert [change["joke"]["joke_text"] for change in changes[1:]] == ["Legacy 0", "Legacy 1", "Legacy 2"]
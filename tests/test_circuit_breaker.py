@@ -0,0 +1,144 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.exceptions import CircuitOpenException, ExternalAPIException
+from app.services.joke_service import JokeService
+from app.services.sync_buffer import ExternalJokeBuffer
+
+pytestmark = pytest.mark.asyncio
+
+class TestCircuitBreaker:
+    async def test_opens_after_consecutive_failures(self):
+        """Test the circuit opens after the failure threshold and then rejects calls"""
+        breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=10)
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+        breaker.before_call()
+        breaker.record_success()  # a success resets the count
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+
+        with pytest.raises(CircuitOpenException) as rejected:
+            breaker.before_call()
+
+        assert breaker.state == "open"
+        assert rejected.value.status_code == 503
+        assert rejected.value.headers["Retry-After"] == "10"
+
+    async def test_half_open_trial(self):
+        """Test after the recovery timeout one trial call decides whether the circuit closes or reopens"""
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.05)
+        breaker.before_call()
+        breaker.record_failure()
+        await asyncio.sleep(0.06)
+
+        assert breaker.state == "half_open"
+        breaker.before_call()
+        with pytest.raises(CircuitOpenException):
+            breaker.before_call()  # only one trial at a time
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        await asyncio.sleep(0.06)
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.stats()["opened"] == 2
+
+    async def test_malformed_payload_counts_as_failure(self):
+        """Test a 200 with an unusable body trips the breaker instead of counting as a success"""
+        breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=10)
+        responses = [MagicMock(status_code=200), MagicMock(status_code=200)]
+        responses[0].json.side_effect = ValueError("Expecting value")
+        responses[1].json.return_value = {"status": 200}
+        client = MagicMock(get=AsyncMock(side_effect=responses))
+
+        with patch("app.services.joke_service.external_api_breaker", breaker):
+            for _ in responses:
+                with pytest.raises(ExternalAPIException):
+                    await JokeService.fetch_external_joke(client)
+
+        assert breaker.state == "open"
+
+    async def test_cancelled_trial_releases_slot(self):
+        """Test a half-open trial cancelled mid-call frees its slot instead of rejecting calls for good"""
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.05)
+        breaker.before_call()
+        breaker.record_failure()
+        await asyncio.sleep(0.06)
+        started = asyncio.Event()
+
+        async def hang(*args, **kwargs):
+            started.set()
+            await asyncio.sleep(10)
+
+        client = MagicMock(get=hang)
+        with patch("app.services.joke_service.external_api_breaker", breaker):
+            task = asyncio.create_task(JokeService.fetch_external_joke(client))
+            await started.wait()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert breaker.state == "half_open"
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+class TestExternalJokeBuffer:
+    async def test_fills_and_refills(self):
+        """Test the buffer fetches up to its size and tops up after a joke is taken"""
+        buffer = ExternalJokeBuffer(size=2, retry_interval=0.01)
+        fetched = iter(range(100))
+        fetch = AsyncMock(side_effect=lambda client: {"id": str(next(fetched)), "joke": "Buffered"})
+
+        with patch.object(JokeService, "fetch_external_joke", fetch):
+            task = asyncio.create_task(buffer.run(client=None))
+            try:
+                while len(buffer) < 2:
+                    await asyncio.sleep(0.01)
+                assert buffer.take()["id"] == "0"
+                while len(buffer) < 2:
+                    await asyncio.sleep(0.01)
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        assert fetch.await_count == 3
+        assert [buffer.take()["id"] for _ in range(2)] == ["1", "2"]
+        assert buffer.take() is None
+
+    async def test_backs_off_on_failure(self):
+        """Test failed prefetches are retried after the retry interval"""
+        buffer = ExternalJokeBuffer(size=1, retry_interval=0.01)
+        fetch = AsyncMock(side_effect=[ExternalAPIException(), {"id": "1", "joke": "Finally"}])
+
+        with patch.object(JokeService, "fetch_external_joke", fetch):
+            task = asyncio.create_task(buffer.run(client=None))
+            try:
+                while not len(buffer):
+                    await asyncio.sleep(0.01)
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        assert fetch.await_count == 2
+
+    async def test_survives_unexpected_errors(self):
+        """Test the prefetch task keeps running after an error it does not expect"""
+        buffer = ExternalJokeBuffer(size=1, retry_interval=0.01)
+        fetch = AsyncMock(side_effect=[KeyError("joke"), {"id": "1", "joke": "Still here"}])
+
+        with patch.object(JokeService, "fetch_external_joke", fetch):
+            task = asyncio.create_task(buffer.run(client=None))
+            try:
+                while not len(buffer):
+                    assert not task.done()
+                    await asyncio.sleep(0.01)
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        assert buffer.take()["joke"] == "Still here"
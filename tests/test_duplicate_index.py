@@ -0,0 +1,222 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from app.core.config import settings
+from app.core.minhash import minhash, similarity
+from app.models import Joke
+from app.services.change_feed import joke_change_feed
+from app.services.duplicate_index import JokeDuplicateIndex, joke_duplicate_index
+
+JOKE = "Why don't skeletons fight each other? They don't have the guts."
+REPUNCTUATED = "why dont skeletons fight each other -- they dont have the guts!!"
+REWORDED = "Why don't skeletons ever fight each other? They don't have the guts."
+UNRELATED = "I used to hate facial hair, but then it grew on me."
+
+def build_index(texts):
+    index = JokeDuplicateIndex(bucket_bits=8)
+    ids = [ObjectId() for _ in texts]
+    for joke_id, text in zip(ids, texts):
+        index.add(joke_id, minhash(text))
+    return index, ids
+
+class TestMinHash:
+    def test_similarity(self):
+        """Test case, punctuation and small rewordings keep signatures close"""
+        assert similarity(minhash(JOKE), minhash(REPUNCTUATED)) == 1.0
+        assert similarity(minhash(JOKE), minhash(REWORDED)) > 0.6
+        assert similarity(minhash(JOKE), minhash(UNRELATED)) < 0.2
+
+    def test_stored_on_joke(self):
+        """Test the signature is filled in like the content hash"""
+        assert Joke(joke_text=JOKE).minhash == minhash(JOKE)
+
+class TestJokeDuplicateIndex:
+    def test_similar(self):
+        """Test lookups find close jokes, best first, and nothing for unrelated ones"""
+        index, ids = build_index([REWORDED, UNRELATED, REPUNCTUATED])
+
+        found = index.similar(minhash(JOKE), threshold=0.5)
+
+        assert [joke_id for joke_id, _ in found] == [ids[2], ids[0]]
+        assert found[0][1] == 1.0
+        assert index.similar(minhash("Completely different words entirely"), threshold=0.5) == []
+
+    def test_update_and_remove(self):
+        """Test re-adding replaces a signature and removed jokes stop matching"""
+        index, ids = build_index([JOKE, UNRELATED])
+
+        index.add(ids[0], minhash("Something else altogether"))
+        index.remove(ids[1])
+
+        assert index.similar(minhash(JOKE), threshold=0.5) == []
+        assert index.similar(minhash(UNRELATED), threshold=0.5) == []
+        assert len(index) == 1
+
+    def test_empty_text_is_not_indexed(self):
+        """Test jokes without words never match each other"""
+        index, _ = build_index(["?!", "..."])
+
+        assert len(index) == 0
+        assert index.similar(minhash("!!"), threshold=0.1) == []
+
+    def test_compact_keeps_results(self):
+        """Test compaction drops removed jokes without changing lookups"""
+        index, ids = build_index([f"joke number {i} about {'cats' if i % 2 else 'dogs'}" for i in range(10)] + [JOKE])
+        for joke_id in ids[:4]:
+            index.remove(joke_id)
+        before = index.similar(minhash(REWORDED), threshold=0.5)
+
+        index.compact()
+
+        assert index.similar(minhash(REWORDED), threshold=0.5) == before
+        assert before[0][0] == ids[-1]
+        assert len(index) == 7
+
+    @pytest.mark.asyncio
+    async def test_clusters(self):
+        """Test clusters link near duplicates and leave unique jokes out"""
+        index, ids = build_index([JOKE, UNRELATED, REPUNCTUATED, "A joke nobody copied", REWORDED])
+
+        clusters = await index.clusters(threshold=0.5)
+
+        assert [set(cluster) for cluster in clusters] == [{ids[0], ids[2], ids[4]}]
+
+    @pytest.mark.asyncio
+    async def test_build_hashes_legacy_jokes(self, db):
+        """Test the index builds from the collection, hashing jokes stored without a signature"""
+        joke = await Joke(joke_text=JOKE).insert()
+        await Joke.get_motor_collection().insert_one({"joke_text": UNRELATED})
+        index = JokeDuplicateIndex(bucket_bits=8)
+
+        await index.build()
+
+        assert index.ready and len(index) == 2
+        assert index.similar(minhash(REPUNCTUATED), threshold=0.9)[0][0] == joke.id
+
+    @pytest.mark.asyncio
+    async def test_catch_up_applies_other_workers_changes(self, db, monkeypatch):
+        """Test updates, deletes and imports made elsewhere reach the index through the change feed"""
+        monkeypatch.setattr(settings, "change_feed_settle_ms", 0)
+        reworded = await Joke(joke_text=JOKE).insert()
+        deleted = await Joke(joke_text=REPUNCTUATED).insert()
+        index = JokeDuplicateIndex(bucket_bits=8)
+        await index.build()
+
+        # Another worker's writes, which never touch this index directly
+        collection = Joke.get_motor_collection()
+        update = {"joke_text": UNRELATED, "minhash": minhash(UNRELATED)}
+        await joke_change_feed.stamp([update])
+        await collection.update_one({"_id": reworded.id}, {"$set": update})
+        await collection.delete_one({"_id": deleted.id})
+        await joke_change_feed.record_deletes([deleted.id])
+        imported = {"_id": ObjectId("5f0000000000000000000001"), "joke_text": REWORDED}  # an old _id
+        await joke_change_feed.stamp([imported])
+        await collection.insert_one(imported)
+
+        await index.catch_up()
+        await index.catch_up()  # replaying is harmless
+
+        assert len(index) == 2 and index._size == 4  # two built, one rewritten, one imported
+        assert [joke_id for joke_id, _ in index.similar(minhash(JOKE), threshold=0.6)] == [imported["_id"]]
+        assert index.similar(minhash(UNRELATED), threshold=0.9)[0][0] == reworded.id
+
+    @pytest.mark.asyncio
+    async def test_run_retries_failed_build(self, db, monkeypatch):
+        """Test a failed first build is retried instead of disabling the index for good"""
+        monkeypatch.setattr(settings, "startup_retry_seconds", 0.01)
+        await Joke(joke_text=JOKE).insert()
+        index = JokeDuplicateIndex(bucket_bits=8)
+        build = index.build
+        attempts = []
+
+        async def flaky_build():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise PyMongoError("connection refused")
+            await build()
+
+        monkeypatch.setattr(index, "build", flaky_build)
+        task = asyncio.create_task(index.run())
+        try:
+            while not index.ready:
+                assert not task.done()
+                await asyncio.sleep(0.01)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert len(attempts) == 2 and len(index) == 1
+
+    def test_models_import_without_numpy(self):
+        """Test importing the models does not load numpy, which the startup budget excludes"""
+        code = "import sys, app.models; assert 'numpy' not in sys.modules"
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).parent.parent)
+
+@pytest.mark.asyncio
+class TestNearDuplicateEndpoints:
+    async def test_create_rejects_near_duplicate(self, test_client, monkeypatch):
+        """Test POST /jokes/ rejects near duplicates only when a threshold is set"""
+        joke_duplicate_index.ready = True
+        first = (await test_client.post("/jokes/", json={"joke_text": JOKE})).json()
+
+        allowed = await test_client.post("/jokes/", json={"joke_text": REWORDED})
+        monkeypatch.setattr(settings, "near_duplicate_threshold", 0.6)
+        rejected = await test_client.post("/jokes/", json={"joke_text": REPUNCTUATED})
+
+        assert allowed.status_code == 201
+        assert rejected.status_code == 400
+        assert rejected.json()["detail"] in (
+            f"A similar joke already exists: {first['_id']}",
+            f"A similar joke already exists: {allowed.json()['_id']}",
+        )
+        stored = await Joke.get_motor_collection().find_one({"_id": ObjectId(first["_id"])})
+        assert bytes(stored["minhash"]) == minhash(JOKE)
+
+    async def test_create_ignores_jokes_deleted_elsewhere(self, test_client, monkeypatch):
+        """Test a match deleted by another worker is dropped from the index instead of rejecting"""
+        monkeypatch.setattr(settings, "near_duplicate_threshold", 0.6)
+        joke_duplicate_index.ready = True
+        stale_id = ObjectId()
+        joke_duplicate_index.add(stale_id, minhash(JOKE))
+
+        response = await test_client.post("/jokes/", json={"joke_text": JOKE})
+
+        assert response.status_code == 201
+        assert stale_id not in joke_duplicate_index
+
+    async def test_bulk_create_reports_near_duplicates(self, test_client, monkeypatch):
+        """Test POST /jokes/bulk reports near duplicates of stored and earlier items"""
+        monkeypatch.setattr(settings, "near_duplicate_threshold", 0.6)
+        joke_duplicate_index.ready = True
+        stored = (await test_client.post("/jokes/", json={"joke_text": UNRELATED})).json()
+
+        response = await test_client.post("/jokes/bulk", json=[
+            {"joke_text": JOKE},
+            {"joke_text": "I used to hate facial hair... but then it grew on me!"},
+            {"joke_text": REWORDED},
+        ])
+
+        results = response.json()["results"]
+        assert [result["status"] for result in results] == ["created", "duplicate", "duplicate"]
+        assert results[1]["detail"] == f"Similar to joke {stored['_id']}"
+        assert results[2]["detail"] == f"Similar to joke {results[0]['id']}"
+        assert await Joke.count() == 2
+
+    async def test_admin_clusters(self, test_client):
+        """Test GET /admin/duplicates lists clusters once the index is ready"""
+        for text in (JOKE, UNRELATED, REPUNCTUATED):
+            await test_client.post("/jokes/", json={"joke_text": text})
+
+        assert (await test_client.get("/admin/duplicates")).status_code == 503
+        joke_duplicate_index.ready = True
+        response = await test_client.get("/admin/duplicates", params={"threshold": 0.9})
+
+        body = response.json()
+        assert response.status_code == 200
+        assert body["indexed"] == 3
+        assert [cluster["size"] for cluster in body["clusters"]] == [2]
+        assert {joke["joke_text"] for joke in body["clusters"][0]["jokes"]} == {JOKE, REPUNCTUATED}
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from app.services.events import JokeEventBroadcaster, RESET_FRAME, HEARTBEAT_FRAME, joke_events
+from app.services.joke_service import JokeService
+
+pytestmark = pytest.mark.asyncio
+
+def frames(subscriber):
+    """Frames queued for a subscriber, without waiting"""
+    queued = []
+    while subscriber._frames:
+        queued.append(subscriber._frames.popleft())
+    return queued
+
+def event_id(frame: bytes) -> str:
+    return frame.split(b"\n", 1)[0].decode().split(": ", 1)[1]
+
+class TestJokeEventBroadcaster:
+    async def test_fan_out(self):
+        """Test every subscriber gets the same encoded event"""
+        broadcaster = JokeEventBroadcaster(queue_size=10, history_size=10)
+        first, second = broadcaster.subscribe(), broadcaster.subscribe()
+
+        broadcaster.publish("deleted", {"_id": "abc"})
+
+        assert frames(first) == frames(second) == [
+            b"id: %s-1\nevent: deleted\ndata: {\"_id\":\"abc\"}\n\n" % broadcaster.epoch.encode()
+        ]
+
+    async def test_slow_subscriber_is_dropped(self):
+        """Test a subscriber that falls behind is disconnected without affecting others"""
+        broadcaster = JokeEventBroadcaster(queue_size=2, history_size=10)
+        slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+
+        for i in range(3):
+            broadcaster.publish("deleted", {"_id": str(i)})
+            frames(fast)
+
+        assert slow.dropped and not fast.dropped
+        assert await slow.next() is None
+        assert len(broadcaster) == 1
+
+    async def test_resume_from_last_event_id(self):
+        """Test a reconnecting subscriber gets the events it missed"""
+        broadcaster = JokeEventBroadcaster(queue_size=10, history_size=10)
+        subscriber = broadcaster.subscribe()
+        broadcaster.publish("deleted", {"_id": "1"})
+        last_seen = event_id(frames(subscriber)[0])
+        broadcaster.unsubscribe(subscriber)
+
+        broadcaster.publish("deleted", {"_id": "2"})
+        broadcaster.publish("deleted", {"_id": "3"})
+        resumed = broadcaster.subscribe(last_seen)
+
+        assert [b'"_id":"2"' in frame for frame in frames(resumed)] == [True, False]
+
+    async def test_resume_outside_history_resets(self):
+        """Test resuming from an unknown or evicted event id asks the client to refetch"""
+        broadcaster = JokeEventBroadcaster(queue_size=10, history_size=2)
+        for i in range(5):
+            broadcaster.publish("deleted", {"_id": str(i)})
+
+        assert frames(broadcaster.subscribe(f"{broadcaster.epoch}-1")) == [RESET_FRAME]
+        assert frames(broadcaster.subscribe("otherworker-4")) == [RESET_FRAME]
+        assert frames(broadcaster.subscribe(f"{broadcaster.epoch}-5")) == []
+
+    async def test_heartbeat_while_idle(self):
+        """Test an idle stream sends heartbeat comments"""
+        broadcaster = JokeEventBroadcaster(queue_size=10, history_size=10)
+        stream = broadcaster.stream(broadcaster.subscribe(), heartbeat=0.01)
+
+        assert await stream.__anext__() == b"retry: 3000\n\n"
+        assert await stream.__anext__() == HEARTBEAT_FRAME
+        await stream.aclose()
+        assert len(broadcaster) == 0
+
+    async def test_service_publishes_writes(self, db):
+        """Test creating, updating and deleting jokes publishes events"""
+        subscriber = joke_events.subscribe()
+
+        joke = await JokeService.create_joke("Evented joke")
+        await JokeService.update_joke(joke.id, {"joke_text": "Evented joke, edited"})
+        await JokeService.delete_joke(joke.id)
+
+        events = [frame.split(b"\n")[1] for frame in frames(subscriber)]
+        assert events == [b"event: created", b"event: updated", b"event: deleted"]
+
+    async def test_stream_endpoint(self, test_client, monkeypatch):
+        """Test GET /jokes/stream delivers events as SSE until the subscriber is dropped"""
+        monkeypatch.setattr(joke_events, "queue_size", 2)
+        request = asyncio.create_task(test_client.get("/jokes/stream"))
+        while not len(joke_events):
+            await asyncio.sleep(0.01)
+
+        created = await test_client.post("/jokes/", json={"joke_text": "Breaking joke"})
+        await asyncio.sleep(0.05)
+        for i in range(3):  # overflow the queue so the stream ends
+            joke_events.publish("deleted", {"_id": str(i)})
+        response = await asyncio.wait_for(request, 2)
+
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert b"event: created" in response.content
+        assert created.json()["_id"].encode() in response.content
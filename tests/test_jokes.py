@@ -1,7 +1,17 @@
+import asyncio
+import gzip
+import json
 import pytest
 from httpx import AsyncClient
 from bson import ObjectId
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
+from pymongo.errors import PyMongoError
+from app.core.circuit_breaker import external_api_breaker
+from app.services.random_pool import random_joke_pool
+from app.services.search_index import joke_search_index
+from app.services.sync_buffer import external_joke_buffer
+from app.core.config import settings
+from app.models import Joke
 
 
 pytestmark = pytest.mark.asyncio
@@ -36,6 +46,46 @@ class TestJokeEndpoints:
         assert response.status_code == 400
         assert response.json()["detail"] == "Joke already exists"
 
+    async def test_bulk_create_jokes(self, test_client: AsyncClient):
+        """Test bulk creating jokes reports a result per item"""
+        await test_client.post("/jokes/", json={"joke_text": "Already stored"})
+        items = [
+            {"joke_text": "Bulk joke one", "source_id": "b1"},
+            {"joke_text": "bulk joke ONE"},
+            {"joke_text": "Already stored"},
+            {"source_id": "missing text"},
+            {"joke_text": "Bulk joke two"},
+        ]
+
+        response = await test_client.post("/jokes/bulk", json=items)
+        assert response.status_code == 200
+        data = response.json()
+        assert [r["status"] for r in data["results"]] == [
+            "created", "duplicate", "duplicate", "invalid", "created"
+        ]
+        assert (data["created"], data["duplicates"], data["invalid"], data["failed"]) == (2, 2, 1, 0)
+
+        created_id = data["results"][0]["id"]
+        get_response = await test_client.get(f"/jokes/{created_id}")
+        assert get_response.json()["source_id"] == "b1"
+
+    async def test_bulk_create_jokes_ndjson(self, test_client: AsyncClient):
+        """Test bulk creating jokes from an NDJSON body"""
+        body = '{"joke_text": "NDJSON joke 1"}\nnot json\n{"joke_text": "NDJSON joke 2"}\n'
+
+        response = await test_client.post(
+            "/jokes/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+        assert [r["status"] for r in response.json()["results"]] == ["created", "invalid", "created"]
+
+    async def test_bulk_create_jokes_invalid_body(self, test_client: AsyncClient):
+        """Test a bulk body that is not a JSON array returns 400"""
+        response = await test_client.post("/jokes/bulk", json={"joke_text": "Not a list"})
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Bulk body must be a JSON array or NDJSON"
+
     async def test_get_all_jokes(self, test_client: AsyncClient):
         """Test retrieving all jokes"""
         jokes = [
@@ -51,6 +101,170 @@ class TestJokeEndpoints:
         assert len(data) == 3
         assert all(joke["joke_text"].startswith("Test joke") for joke in data)
 
+    async def test_get_jokes_paginated(self, test_client: AsyncClient):
+        """Test walking all jokes page by page with the keyset cursor"""
+        for i in range(5):
+            await test_client.post("/jokes/", json={"joke_text": f"Paged joke {i}"})
+
+        seen = []
+        params = {"limit": 2}
+        while True:
+            response = await test_client.get("/jokes/", params=params)
+            assert response.status_code == 200
+            seen.extend(joke["joke_text"] for joke in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            params = {"limit": 2, "after": cursor}
+
+        assert seen == [f"Paged joke {i}" for i in range(5)]
+
+    async def test_get_jokes_invalid_cursor(self, test_client: AsyncClient):
+        """Test an invalid pagination cursor returns 400"""
+        response = await test_client.get("/jokes/", params={"after": "not-a-cursor"})
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid pagination cursor"
+
+    async def test_get_jokes_fast_path_matches(self, test_client: AsyncClient, monkeypatch):
+        """Test the opt-in orjson read path returns the same bytes and headers"""
+        for i in range(3):
+            await test_client.post("/jokes/", json={"joke_text": f"Fast joke {i} \u00e9\U0001F600", "source_id": f"s{i}"})
+        joke_id = (await test_client.get("/jokes/")).json()[0]["_id"]
+        await test_client.put(f"/jokes/{joke_id}", json={"joke_text": "Edited fast joke \u2028"})
+
+        requests = [("/jokes/", {"limit": 2}), ("/jokes/", {}), (f"/jokes/{joke_id}", {})]
+        regular = [await test_client.get(url, params=params) for url, params in requests]
+        monkeypatch.setattr(settings, "fast_read_routes", {"get_jokes", "get_joke"})
+        fast = [await test_client.get(url, params=params) for url, params in requests]
+
+        for before, after in zip(regular, fast):
+            assert after.status_code == before.status_code == 200
+            assert after.content == before.content
+            assert after.headers.get("X-Next-Cursor") == before.headers.get("X-Next-Cursor")
+            assert after.headers.get("ETag") == before.headers.get("ETag")
+
+    async def test_get_jokes_stream(self, test_client: AsyncClient):
+        """Test streaming all jokes as NDJSON"""
+        for i in range(3):
+            await test_client.post("/jokes/", json={"joke_text": f"Streamed joke {i}"})
+
+        response = await test_client.get("/jokes/", params={"stream": "true"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [joke["joke_text"] for joke in lines] == [f"Streamed joke {i}" for i in range(3)]
+        assert all("_id" in joke for joke in lines)
+
+    async def test_export_import_round_trip(self, test_client: AsyncClient):
+        """Test a gzip export loads back with the same ids, text and timestamps"""
+        await test_client.post("/jokes/bulk", json=[{"joke_text": f"Exported joke {i}", "source_id": str(i)} for i in range(5)])
+        original = (await test_client.get("/jokes/", params={"limit": 100})).json()
+
+        export = await test_client.get("/jokes/export", params={"gzip": "true"})
+        assert export.status_code == 200
+        assert export.headers["content-type"] == "application/gzip"
+        assert len(gzip.decompress(export.content).splitlines()) == 5
+        await test_client.request("DELETE", "/jokes/", json={"ids": [joke["_id"] for joke in original]})
+
+        response = await test_client.post(
+            "/jokes/import", content=export.content, headers={"Content-Type": "application/gzip"}
+        )
+        assert response.status_code == 200
+        assert response.json() == {"created": 5, "duplicates": 0, "invalid": 0, "failed": 0, "errors": []}
+        assert (await test_client.get("/jokes/", params={"limit": 100})).json() == original
+
+    async def test_import_reports_bad_lines(self, test_client: AsyncClient):
+        """Test import skips duplicates and invalid lines and reports them by line"""
+        await test_client.post("/jokes/", json={"joke_text": "Already here"})
+        body = (
+            '{"joke_text": "Imported joke"}\n'
+            '{"joke_text": "Already here"}\n'
+            '\n'
+            'not json\n'
+            '{"_id": "nope", "joke_text": "Bad id"}\n'
+            '{"joke_text": "Imported joke"}'
+        )
+
+        response = await test_client.post("/jokes/import", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+        data = response.json()
+        assert (data["created"], data["duplicates"], data["invalid"]) == (1, 2, 2)
+        assert [(error["index"], error["status"]) for error in data["errors"]] == [
+            (1, "duplicate"), (3, "invalid"), (4, "invalid"), (5, "duplicate")
+        ]
+
+    async def test_import_invalid_gzip(self, test_client: AsyncClient):
+        """Test a body that is not gzip returns 400"""
+        response = await test_client.post("/jokes/import", content=b"plain text", headers={"Content-Encoding": "gzip"})
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Body is not valid gzip"
+
+    async def test_get_random_jokes(self, test_client: AsyncClient):
+        """Test random jokes come from the pool without repeats for a client"""
+        for i in range(6):
+            await test_client.post("/jokes/", json={"joke_text": f"Random joke {i}"})
+
+        headers = {"X-Client-Id": "client-1"}
+        first = await test_client.get("/jokes/random", params={"count": 3}, headers=headers)
+        second = await test_client.get("/jokes/random", params={"count": 3}, headers=headers)
+
+        assert first.status_code == 200
+        served = [joke["_id"] for joke in first.json() + second.json()]
+        assert len(served) == 6
+        assert len(set(served)) == 6
+
+    async def test_get_random_jokes_excludes_deleted(self, test_client: AsyncClient):
+        """Test deleted jokes are dropped from the random pool"""
+        ids = []
+        for i in range(2):
+            response = await test_client.post("/jokes/", json={"joke_text": f"Random joke {i}"})
+            ids.append(response.json()["_id"])
+        await test_client.get("/jokes/random")
+
+        await test_client.delete(f"/jokes/{ids[0]}")
+        response = await test_client.get("/jokes/random", params={"count": 2})
+
+        assert [joke["_id"] for joke in response.json()] == [ids[1]]
+
+    async def test_get_random_jokes_empty_collection(self, test_client: AsyncClient, monkeypatch):
+        """Test requests against an empty collection share one refill and don't resample until the interval passes"""
+        samples = []
+        sample = random_joke_pool._sample
+
+        async def counted_sample():
+            samples.append(1)
+            await asyncio.sleep(0.01)
+            await sample()
+
+        monkeypatch.setattr(random_joke_pool, "_sample", counted_sample)
+        responses = await asyncio.gather(*(test_client.get("/jokes/random") for _ in range(5)))
+        responses.append(await test_client.get("/jokes/random"))
+
+        assert all(response.status_code == 200 and response.json() == [] for response in responses)
+        assert len(samples) == 1
+
+    async def test_search_jokes(self, test_client: AsyncClient):
+        """Test searching jokes, including jokes created after the index was built"""
+        response = await test_client.get("/jokes/search", params={"q": "cookie"})
+        assert response.status_code == 503
+
+        await test_client.post("/jokes/", json={"joke_text": "Why did the cookie go to the doctor?"})
+        await joke_search_index.build()
+        await test_client.post("/jokes/", json={"joke_text": "Cookies are crumbly"})
+
+        response = await test_client.get("/jokes/search", params={"q": "cookie"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 2
+        assert {joke["joke_text"] for joke in data["results"]} == {
+            "Why did the cookie go to the doctor?", "Cookies are crumbly"
+        }
+
+        response = await test_client.get("/jokes/search", params={"q": "cookie", "prefix": "false"})
+        assert response.json()["total"] == 1
+
     async def test_get_joke_by_id(self, test_client: AsyncClient):
         """Test retrieving a specific joke by ID"""
         joke_data = {
@@ -67,6 +281,36 @@ class TestJokeEndpoints:
         assert data["joke_text"] == joke_data["joke_text"]
         assert data["_id"] == joke_id
 
+    async def test_get_joke_etag_not_modified(self, test_client: AsyncClient):
+        """Test a matching If-None-Match returns 304 until the joke changes"""
+        create_response = await test_client.post("/jokes/", json={"joke_text": "Cached joke"})
+        joke_id = create_response.json()["_id"]
+
+        response = await test_client.get(f"/jokes/{joke_id}")
+        etag = response.headers["ETag"]
+        cached = await test_client.get(f"/jokes/{joke_id}", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        await test_client.put(f"/jokes/{joke_id}", json={"joke_text": "Edited cached joke"})
+        response = await test_client.get(f"/jokes/{joke_id}", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["joke_text"] == "Edited cached joke"
+        assert response.headers["ETag"] != etag
+
+    async def test_get_joke_cache_stats(self, test_client: AsyncClient):
+        """Test repeat lookups are served from the cache"""
+        create_response = await test_client.post("/jokes/", json={"joke_text": "Popular joke"})
+        joke_id = create_response.json()["_id"]
+        before = (await test_client.get("/admin/cache")).json()
+
+        for _ in range(3):
+            await test_client.get(f"/jokes/{joke_id}")
+
+        after = (await test_client.get("/admin/cache")).json()
+        assert after["misses"] - before["misses"] == 1
+        assert after["hits"] - before["hits"] == 2
+
     async def test_get_nonexistent_joke(self, test_client: AsyncClient):
         """Test retrieving a non-existent joke returns 404"""
         nonexistent_id = str(ObjectId())
@@ -110,6 +354,83 @@ class TestJokeEndpoints:
         assert delete_response.status_code == 204
         assert get_response.status_code == 404
 
+    async def test_delete_nonexistent_joke(self, test_client: AsyncClient):
+        """Test deleting a non-existent joke returns 404"""
+        response = await test_client.delete(f"/jokes/{ObjectId()}")
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Joke not found"
+
+    async def test_update_null_text_rejected(self, test_client: AsyncClient):
+        """Test a null joke_text is a validation error, not a server error"""
+        create_response = await test_client.post("/jokes/", json={"joke_text": "Keep me"})
+        joke_id = create_response.json()["_id"]
+
+        response = await test_client.put(f"/jokes/{joke_id}", json={"joke_text": None})
+
+        assert response.status_code == 422
+        assert (await test_client.get(f"/jokes/{joke_id}")).json()["joke_text"] == "Keep me"
+
+    async def test_update_nonexistent_joke(self, test_client: AsyncClient):
+        """Test updating a non-existent joke returns 404"""
+        response = await test_client.put(f"/jokes/{ObjectId()}", json={"joke_text": "Nobody home"})
+
+        assert response.status_code == 404
+
+    async def test_bulk_update_jokes(self, test_client: AsyncClient):
+        """Test updating many jokes with one PATCH"""
+        ids = [(await test_client.post("/jokes/", json={"joke_text": f"Moderated joke {i}"})).json()["_id"] for i in range(3)]
+        await test_client.get(f"/jokes/{ids[0]}")  # cached before the update
+
+        response = await test_client.patch("/jokes/", json=[
+            {"id": ids[0], "joke_text": "Cleaned up joke 0"},
+            {"id": ids[1], "joke_text": "Moderated joke 2"},
+            {"id": str(ObjectId()), "joke_text": "Missing joke"},
+        ])
+
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["updated"], data["duplicates"], data["not_found"]) == (1, 1, 1)
+        assert (await test_client.get(f"/jokes/{ids[0]}")).json()["joke_text"] == "Cleaned up joke 0"
+
+    async def test_bulk_update_read_back_error(self, test_client: AsyncClient):
+        """Test a failed read-back after a bulk update maps to the database error instead of escaping"""
+        joke_id = (await test_client.post("/jokes/", json={"joke_text": "Read back joke"})).json()["_id"]
+        collection = MagicMock(wraps=Joke.get_motor_collection())
+        collection.find.side_effect = PyMongoError("connection reset")
+
+        with patch.object(Joke, "get_motor_collection", return_value=collection):
+            response = await test_client.patch("/jokes/", json=[{"id": joke_id, "joke_text": "Read back, reworded"}])
+
+        assert response.status_code == 500
+        assert response.json()["detail"] == "Jokes were updated, but their results could not be read"
+        assert (await test_client.get(f"/jokes/{joke_id}")).json()["joke_text"] == "Read back, reworded"
+
+    async def test_bulk_delete_jokes(self, test_client: AsyncClient):
+        """Test deleting many jokes by id with one request"""
+        ids = [(await test_client.post("/jokes/", json={"joke_text": f"Doomed joke {i}"})).json()["_id"] for i in range(3)]
+        await test_client.get(f"/jokes/{ids[0]}")  # cached before the delete
+        await test_client.get("/jokes/random")  # and in the random pool
+
+        with patch.object(random_joke_pool, "discard_many", wraps=random_joke_pool.discard_many) as discard_many:
+            response = await test_client.request("DELETE", "/jokes/", json={"ids": ids[:2] + [str(ObjectId())]})
+
+        assert response.status_code == 200
+        assert response.json() == {"deleted": 2, "not_found": 1}
+        assert (await test_client.get(f"/jokes/{ids[0]}")).status_code == 404
+        remaining = (await test_client.get("/jokes/")).json()
+        assert [joke["_id"] for joke in remaining] == [ids[2]]
+        assert discard_many.call_count == 1  # the pool is filtered once, not once per id
+        random_jokes = (await test_client.get("/jokes/random", params={"count": 3})).json()
+        assert [joke["_id"] for joke in random_jokes] == [ids[2]]
+
+    async def test_bulk_delete_jokes_invalid_id(self, test_client: AsyncClient):
+        """Test bulk delete rejects malformed ids"""
+        response = await test_client.request("DELETE", "/jokes/", json={"ids": ["not-an-id"]})
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid joke ID format"
+
     async def test_sync_joke(self, test_client: AsyncClient):
         """Test fetching and saving a joke from external API"""
         mock_joke = {
@@ -140,6 +461,36 @@ class TestJokeEndpoints:
             response = await test_client.post("/jokes/sync")
         
         assert response.status_code == 503
-        assert response.json()["detail"] == "Failed to fetch joke from external API" 
+        assert response.json()["detail"] == "Failed to fetch joke from external API"
+
+    async def test_sync_joke_from_buffer(self, test_client: AsyncClient):
+        """Test a prefetched joke is stored without calling the external API"""
+        external_joke_buffer._jokes.append({"id": "buffered1", "joke": "Prefetched joke"})
+
+        with patch('httpx.AsyncClient.get') as get:
+            response = await test_client.post("/jokes/sync")
+
+        assert response.status_code == 201
+        assert response.json()["source_id"] == "buffered1"
+        get.assert_not_called()
+        assert len(external_joke_buffer) == 0
+
+    async def test_sync_joke_fails_fast_when_circuit_open(self, test_client: AsyncClient, monkeypatch):
+        """Test repeated upstream failures open the circuit and later syncs fail without calling it"""
+        monkeypatch.setattr(external_api_breaker, "failure_threshold", 2)
+        mock_response = AsyncMock()
+        mock_response.status_code = 500
+
+        with patch('httpx.AsyncClient.get', return_value=mock_response) as get:
+            for _ in range(2):
+                await test_client.post("/jokes/sync")
+            response = await test_client.post("/jokes/sync")
+
+        assert get.call_count == 2
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == str(int(external_api_breaker.recovery_timeout))
+        status = (await test_client.get("/admin/external")).json()
+        assert status["circuit_breaker"]["state"] == "open"
+        assert status["sync_buffer"]["depth"] == 0 
 
 
@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+from pymongo.errors import PyMongoError
+from app.core.lease import LeaderLease
+from app.models import Lease
+
+pytestmark = pytest.mark.asyncio
+
+def make_workers(count, ttl=0.3, renew_interval=0.05):
+    """Leases on the same job as seen by several workers"""
+    return [LeaderLease("test_job", ttl, renew_interval, worker_id=f"worker-{i}") for i in range(count)]
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+class TestLeaderLease:
+    async def test_single_holder(self, db):
+        """Test only one of several workers acquires the lease, and it can renew"""
+        workers = make_workers(3)
+
+        acquired = [await worker.try_acquire() for worker in workers]
+
+        assert acquired == [True, False, False]
+        assert await workers[0].try_acquire()
+        assert (await Lease.get("test_job")).holder == "worker-0"
+
+    async def test_expired_lease_is_taken_over(self, db):
+        """Test a lease that is not renewed can be taken by another worker after the ttl"""
+        first, second = make_workers(2, ttl=0.1)
+        assert await first.try_acquire()
+        assert not await second.try_acquire()
+
+        await asyncio.sleep(0.15)
+
+        assert not first.is_leader
+        assert await second.try_acquire()
+        assert not await first.try_acquire()
+
+    async def test_job_runs_on_one_worker_and_fails_over(self, db):
+        """Test the job runs once across workers and moves to another when the holder dies"""
+        workers = make_workers(3)
+        running = set()
+
+        def job_for(worker):
+            async def job():
+                running.add(worker.worker_id)
+                try:
+                    await asyncio.Event().wait()
+                finally:
+                    running.discard(worker.worker_id)
+            return job
+
+        tasks = {worker.worker_id: asyncio.create_task(worker.run(job_for(worker))) for worker in workers}
+        try:
+            await wait_for(lambda: len(running) == 1)
+            await asyncio.sleep(0.2)
+            assert len(running) == 1
+            leader = next(iter(running))
+
+            # Crash the holder without releasing the lease: the others wait out the ttl
+            with patch.object(LeaderLease, "release", AsyncMock()):
+                tasks[leader].cancel()
+                await asyncio.gather(tasks[leader], return_exceptions=True)
+            await wait_for(lambda: len(running) == 1 and leader not in running)
+            assert (await Lease.get("test_job")).holder in running
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        assert running == set()
+
+    async def test_holder_stops_job_when_it_cannot_renew(self, db):
+        """Test a holder that loses the database stops its job once its lease runs out"""
+        worker, = make_workers(1, ttl=0.2)
+        running = asyncio.Event()
+        stopped = asyncio.Event()
+
+        async def job():
+            running.set()
+            try:
+                await asyncio.Event().wait()
+            finally:
+                stopped.set()
+
+        task = asyncio.create_task(worker.run(job))
+        try:
+            await asyncio.wait_for(running.wait(), 1)
+            with patch.object(Lease, "get_motor_collection", side_effect=PyMongoError("down")):
+                await asyncio.wait_for(stopped.wait(), 1)
+                assert not worker.is_leader
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def test_release_on_shutdown(self, db):
+        """Test a worker shutting down releases the lease for an immediate takeover"""
+        first, second = make_workers(2, ttl=10)
+        task = asyncio.create_task(first.run(AsyncMock()))
+        await wait_for(lambda: first.is_leader)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert await second.try_acquire()
+
+    async def test_lease_status_endpoint(self, test_client):
+        """Test the admin endpoint reports the sync lease holder"""
+        response = await test_client.get("/admin/leases")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["worker_id"]
+        assert data["leases"][0]["name"] == "periodic_joke_sync"
+        assert data["leases"][0]["expired"] is True
@@ -0,0 +1,107 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from asgi_lifespan import LifespanManager
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+
+pytestmark = pytest.mark.asyncio
+
+async def wait_until_ready(resources, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not resources.ready:
+        assert asyncio.get_running_loop().time() < deadline, "worker did not become ready"
+        await asyncio.sleep(0.01)
+
+class TestLifespan:
+    async def test_lifespan_opens_and_closes_shared_clients(self):
+        """Test the lifespan owns one Motor and one HTTP client and closes both"""
+        mongo_client = MagicMock()
+
+        with patch('app.core.resources.init_db', AsyncMock(return_value=mongo_client)), \
+                patch('app.main.periodic_joke_sync', AsyncMock()) as periodic_sync, \
+                patch('app.main.sync_lease.run', AsyncMock()) as lease_run, \
+                patch('app.main.stats_lease.run', AsyncMock()), \
+                patch('app.main.changes_lease.run', AsyncMock()), \
+                patch('app.main.joke_stats.run', AsyncMock()), \
+                patch('app.main.random_joke_pool.refill', AsyncMock()), \
+                patch('app.main.random_joke_pool.run', AsyncMock()), \
+                patch('app.main.joke_search_index.run', AsyncMock()), \
+                patch('app.main.joke_duplicate_index.run', AsyncMock()), \
+                patch('app.main.external_joke_buffer.run', AsyncMock()):
+            async with LifespanManager(app):
+                resources = app.state.resources
+                await wait_until_ready(resources)
+                http_client = resources.http_client
+                assert resources.mongo_client is mongo_client
+                # The sync loop only runs as the job of the cluster-wide lease
+                job = lease_run.call_args.args[0]
+                await job()
+                periodic_sync.assert_called_once_with(http_client)
+
+        assert http_client.is_closed
+        mongo_client.close.assert_called_once()
+        assert resources.tasks == []
+        del app.state.resources
+
+    async def test_readiness_gates_traffic_until_warmed_up(self):
+        """Test startup returns before the database is up, and traffic is admitted once warm-up finishes"""
+        database_up = asyncio.Event()
+
+        async def slow_init_db():
+            await database_up.wait()
+            return MagicMock()
+
+        with patch('app.core.resources.init_db', slow_init_db), \
+                patch('app.main.sync_lease.run', AsyncMock()), \
+                patch('app.main.stats_lease.run', AsyncMock()), \
+                patch('app.main.changes_lease.run', AsyncMock()), \
+                patch('app.main.joke_stats.run', AsyncMock()), \
+                patch('app.main.random_joke_pool.refill', AsyncMock()), \
+                patch('app.main.random_joke_pool.run', AsyncMock()), \
+                patch('app.main.joke_search_index.run', AsyncMock()), \
+                patch('app.main.joke_duplicate_index.run', AsyncMock()), \
+                patch('app.main.external_joke_buffer.run', AsyncMock()):
+            async with LifespanManager(app):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    assert (await client.get("/health/live")).status_code == 200
+                    not_ready = await client.get("/health/ready")
+                    assert not_ready.status_code == 503
+                    assert not_ready.headers["retry-after"] == "1"
+                    assert (await client.get("/jokes/")).status_code == 503
+
+                    database_up.set()
+                    await wait_until_ready(app.state.resources)
+
+                    ready = await client.get("/health/ready")
+                    assert ready.status_code == 200
+                    assert {"import", "database", "http_client", "random_pool", "warm_up"} <= set(ready.json()["startup_seconds"])
+        del app.state.resources
+
+    async def test_warm_up_retries_until_database_is_reachable(self):
+        """Test a failed connection attempt is retried instead of crashing the worker"""
+        init_db = AsyncMock(side_effect=[ConnectionError("down"), MagicMock()])
+
+        with patch('app.core.resources.init_db', init_db), \
+                patch('app.main.settings.startup_retry_seconds', 0.01), \
+                patch('app.main.sync_lease.run', AsyncMock()), \
+                patch('app.main.stats_lease.run', AsyncMock()), \
+                patch('app.main.changes_lease.run', AsyncMock()), \
+                patch('app.main.joke_stats.run', AsyncMock()), \
+                patch('app.main.random_joke_pool.refill', AsyncMock()), \
+                patch('app.main.random_joke_pool.run', AsyncMock()), \
+                patch('app.main.joke_search_index.run', AsyncMock()), \
+                patch('app.main.joke_duplicate_index.run', AsyncMock()), \
+                patch('app.main.external_joke_buffer.run', AsyncMock()):
+            async with LifespanManager(app):
+                await wait_until_ready(app.state.resources)
+                assert init_db.await_count == 2
+        del app.state.resources
+
+    def test_heavy_imports_stay_off_the_import_path(self):
+        """Test importing the app loads neither httpx nor numpy; they are imported when first used"""
+        code = "import sys, app.main; assert not {'httpx', 'numpy'} & set(sys.modules), sorted(sys.modules)"
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).parent.parent)
@@ -0,0 +1,26 @@
+import pytest
+from bson import ObjectId
+from httpx import AsyncClient
+from loguru import logger
+from app.core.config import settings
+from app.core.logging import _sampled
+
+pytestmark = pytest.mark.asyncio
+
+class TestLogSampling:
+    async def test_info_logs_sampled_per_route(self, test_client: AsyncClient, monkeypatch):
+        """Test a route's INFO records are dropped at sample rate 0 while warnings pass"""
+        monkeypatch.setattr(settings, "log_sample_rates", {"get_joke": 0.0})
+        messages = []
+        handler_id = logger.add(lambda message: messages.append(message.record), filter=_sampled, level="INFO")
+        try:
+            await test_client.get(f"/jokes/{ObjectId()}")
+            await test_client.post("/jokes/", json={"joke_text": "Sampled joke"})
+            await test_client.post("/jokes/", json={"joke_text": "Sampled joke"})
+        finally:
+            logger.remove(handler_id)
+
+        functions = {(record["function"], record["level"].name) for record in messages}
+        assert ("get_joke", "INFO") not in functions
+        assert ("create_joke", "INFO") in functions
+        assert ("create_joke", "WARNING") in functions
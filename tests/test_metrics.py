@@ -0,0 +1,67 @@
+import threading
+import pytest
+from bson import ObjectId
+from httpx import AsyncClient
+from unittest.mock import patch, AsyncMock
+from app.core.metrics import Gauge, Histogram, HTTP_REQUEST_DURATION, EXTERNAL_API_ERRORS
+
+pytestmark = pytest.mark.asyncio
+
+class TestMetrics:
+    def test_histogram_render(self):
+        """Test histogram buckets are rendered cumulatively with sum and count"""
+        histogram = Histogram("test_seconds", "Test histogram", ("route",), (0.1, 1))
+        histogram.observe(0.05, "/a")
+        histogram.observe(0.5, "/a")
+        histogram.observe(5, "/a")
+
+        lines = histogram.render()
+
+        assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{route="/a",le="1"} 2' in lines
+        assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+        assert 'test_seconds_sum{route="/a"} 5.55' in lines
+        assert 'test_seconds_count{route="/a"} 3' in lines
+
+    def test_render_while_other_threads_add_labels(self):
+        """Test rendering tolerates label sets added concurrently, as the Mongo pool listener does"""
+        gauge = Gauge("test_connections", "Test gauge", ("address",))
+        histogram = Histogram("test_seconds", "Test histogram", ("route",), (0.1, 1))
+
+        def add_labels():
+            for i in range(20_000):
+                gauge.inc(f"host:{i}")
+                histogram.observe(0.5, f"/route/{i}")
+
+        thread = threading.Thread(target=add_labels)
+        thread.start()
+        try:
+            while thread.is_alive():
+                gauge.render()
+                histogram.render()
+        finally:
+            thread.join()
+
+    async def test_request_and_db_metrics(self, test_client: AsyncClient):
+        """Test requests are recorded by route template and status, with DB timings"""
+        labels = ("GET", "/jokes/{joke_id}", "404")
+        before = HTTP_REQUEST_DURATION.count(*labels)
+
+        await test_client.get(f"/jokes/{ObjectId()}")
+        response = await test_client.get("/metrics")
+
+        assert response.status_code == 200
+        assert HTTP_REQUEST_DURATION.count(*labels) == before + 1
+        assert 'db_operation_duration_seconds_count{operation="get_joke"}' in response.text
+        assert "http_requests_in_flight" in response.text
+
+    async def test_external_api_error_metrics(self, test_client: AsyncClient):
+        """Test failed external fetches are counted by reason"""
+        before = EXTERNAL_API_ERRORS.value("status_500")
+        mock_response = AsyncMock()
+        mock_response.status_code = 500
+
+        with patch('httpx.AsyncClient.get', return_value=mock_response):
+            await test_client.post("/jokes/sync")
+
+        assert EXTERNAL_API_ERRORS.value("status_500") == before + 1
@@ -0,0 +1,90 @@
+import pstats
+import pytest
+from bson import ObjectId
+from app.core.config import settings
+from app.core.metrics import current_spans, db_timer, span, RequestSpans
+from app.core.profiling import slow_requests
+
+pytestmark = pytest.mark.asyncio
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "profiling_token", "secret")
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+    return tmp_path
+
+class TestSpans:
+    async def test_spans_recorded_only_when_captured(self):
+        """Test timers add to the current request's spans and do nothing outside one"""
+        with db_timer("get_joke"):
+            pass
+        spans = RequestSpans()
+        token = current_spans.set(spans)
+        try:
+            with db_timer("get_joke"), span("serialization"):
+                pass
+            with db_timer("list_jokes"):
+                pass
+        finally:
+            current_spans.reset(token)
+
+        assert spans.calls == {"db": 2, "serialization": 1}
+        assert current_spans.get() is None
+
+class TestSlowRequests:
+    async def test_breakdown(self, test_client, monkeypatch):
+        """Test requests over the threshold are kept with their DB and serialization time"""
+        monkeypatch.setattr(settings, "slow_request_ms", 0.001)
+
+        response = await test_client.post("/jokes/", json={"joke_text": "A slow joke"})
+        slow = (await test_client.get("/admin/slow-requests")).json()
+
+        assert response.status_code == 201
+        assert "x-profile-id" not in response.headers
+        entry = slow["requests"][-1]
+        assert (entry["method"], entry["path"], entry["route"], entry["status"]) == ("POST", "/jokes/", "create_joke", 201)
+        assert entry["spans"]["db"]["calls"] >= 1
+        assert set(entry["spans"]) >= {"db", "serialization", "queue"}
+        assert entry["duration_ms"] >= entry["spans"]["db"]["ms"]
+        assert entry["profile"] is None
+
+    async def test_fast_requests_not_kept(self, test_client, monkeypatch):
+        """Test requests under the threshold, or with capture disabled, are not kept"""
+        await test_client.get(f"/jokes/{ObjectId()}")
+        monkeypatch.setattr(settings, "slow_request_ms", 60_000)
+        await test_client.get(f"/jokes/{ObjectId()}")
+
+        assert len(slow_requests) == 0
+
+class TestProfiling:
+    async def test_header_token_writes_folded_stacks(self, test_client, profiling):
+        """Test a request with the profiling token gets a flamegraph-ready profile"""
+        await test_client.post("/jokes/", json={"joke_text": "A profiled joke"})
+
+        response = await test_client.get("/jokes/", headers={"X-Profile": "secret"})
+
+        profile_id = response.headers["x-profile-id"]
+        [path] = profiling.iterdir()
+        assert path.name.endswith(f"-get_jokes-{profile_id}.folded")
+        for line in path.read_text().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            assert int(count) > 0 and stack
+
+    async def test_wrong_or_missing_token_not_profiled(self, test_client, profiling):
+        """Test requests without the right token are served without profiling"""
+        missing = await test_client.get("/jokes/")
+        wrong = await test_client.get("/jokes/", headers={"X-Profile": "guess"})
+
+        assert missing.status_code == wrong.status_code == 200
+        assert "x-profile-id" not in missing.headers and "x-profile-id" not in wrong.headers
+        assert list(profiling.iterdir()) == []
+
+    async def test_cprofile_mode(self, test_client, profiling, monkeypatch):
+        """Test cProfile mode writes stats pstats can load"""
+        monkeypatch.setattr(settings, "profiling_mode", "cprofile")
+
+        response = await test_client.get(f"/jokes/{ObjectId()}", headers={"X-Profile": "secret"})
+
+        [path] = profiling.iterdir()
+        assert path.name.endswith(f"{response.headers['x-profile-id']}.prof")
+        assert pstats.Stats(str(path)).total_calls > 0
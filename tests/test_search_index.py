@@ -0,0 +1,143 @@
+import asyncio
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from app.core.config import settings
+from app.models import Joke
+from app.services.change_feed import joke_change_feed
+from app.services.joke_service import JokeService
+from app.services.search_index import JokeSearchIndex
+
+def build_index(texts):
+    index = JokeSearchIndex()
+    ids = [ObjectId() for _ in texts]
+    for joke_id, text in zip(ids, texts):
+        index.add(joke_id, text)
+    return index, ids
+
+class TestJokeSearchIndex:
+    def test_search_requires_all_terms_and_ranks(self):
+        """Test all query terms must match and rarer terms weigh more"""
+        index, ids = build_index([
+            "The cat sat on the mat",
+            "A cat and a dog walk into a bar",
+            "The dog barked at the cat, the cat ignored the dog",
+            "Nothing to see here",
+        ])
+
+        total, found = index.search("cat dog", prefix=False)
+
+        assert total == 2
+        assert found == [ids[2], ids[1]]
+
+    def test_prefix_matching(self):
+        """Test the last term matches as a prefix only when prefix is on"""
+        index, ids = build_index(["Scarecrows are outstanding", "Scary skeletons", "Cookies crumble"])
+
+        assert index.search("scar")[0] == 2
+        assert index.search("scar", prefix=False)[0] == 0
+        assert index.search("scar ")[0] == 0
+
+    def test_pagination(self):
+        """Test offset and limit page through the ranked results"""
+        index, ids = build_index([f"pun number {i}" for i in range(5)])
+
+        total, first = index.search("pun", limit=2)
+        _, rest = index.search("pun", limit=10, offset=2)
+
+        assert total == 5
+        assert len(first) == 2
+        assert set(first + rest) == set(ids)
+
+    def test_update_and_remove(self):
+        """Test re-adding replaces a joke and removed jokes stop matching"""
+        index, ids = build_index(["old text", "other text"])
+
+        index.add(ids[0], "new words")
+        index.remove(ids[1])
+
+        assert index.search("text")[0] == 0
+        assert index.search("new")[1] == [ids[0]]
+        assert len(index) == 1
+
+    def test_compact_keeps_results(self):
+        """Test compaction drops dead entries without changing results"""
+        index, ids = build_index([f"joke {i} about {'cats' if i % 2 else 'dogs'}" for i in range(10)])
+        for joke_id in ids[:4]:
+            index.remove(joke_id)
+        before = index.search("cats")
+
+        index.compact()
+
+        assert index.search("cats") == before
+        assert before[0] == 3
+
+    def test_readding_unchanged_text_keeps_postings(self):
+        """Test replaying a joke the index already holds adds no dead entries, and rewrites get compacted"""
+        index, ids = build_index([f"joke {i} about cats" for i in range(2000)])
+
+        for i, joke_id in enumerate(ids):
+            index.add(joke_id, f"joke {i} about cats")
+
+        assert len(index._lengths) == 2000
+        assert len(index._postings["cats"]) == 2000
+
+        for i, joke_id in enumerate(ids[:1500]):
+            index.add(joke_id, f"reworded joke {i} about cats")
+
+        assert len(index._lengths) < 3500
+        assert index.search("reworded")[0] == 1500
+        assert index.search("cats")[0] == 2000
+
+@pytest.mark.asyncio
+class TestSearchIndexRefresh:
+    async def test_catch_up_applies_other_workers_changes(self, db, monkeypatch):
+        """Test updates, deletes and creates made elsewhere reach the index through the change feed"""
+        monkeypatch.setattr(settings, "change_feed_settle_ms", 0)
+        kept = await JokeService.create_joke("Knock knock, who is there")
+        deleted = await JokeService.create_joke("Knock knock, nobody home")
+        index = JokeSearchIndex()
+        await index.build()
+
+        # Another worker's writes, which never touch this index directly
+        collection = Joke.get_motor_collection()
+        update = {"joke_text": "A reworded pun", "updated_at": datetime.now()}
+        await joke_change_feed.stamp([update])
+        await collection.update_one({"_id": kept.id}, {"$set": update})
+        await collection.delete_one({"_id": deleted.id})
+        await joke_change_feed.record_deletes([deleted.id])
+        created = {"_id": ObjectId(), "joke_text": "A brand new knock knock"}
+        await joke_change_feed.stamp([created])
+        await collection.insert_one(created)
+
+        await index.catch_up()
+
+        assert index.search("knock") == (1, [created["_id"]])
+        assert index.search("reworded") == (1, [kept.id])
+        assert len(index) == 2
+
+    async def test_run_retries_failed_build(self, db, monkeypatch):
+        """Test a failed first build is retried instead of leaving the index unavailable"""
+        monkeypatch.setattr(settings, "startup_retry_seconds", 0.01)
+        index = JokeSearchIndex()
+        build = index.build
+        attempts = []
+
+        async def flaky_build():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise PyMongoError("connection refused")
+            await build()
+
+        monkeypatch.setattr(index, "build", flaky_build)
+        task = asyncio.create_task(index.run())
+        try:
+            while not index.ready:
+                assert not task.done()
+                await asyncio.sleep(0.01)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert len(attempts) == 2
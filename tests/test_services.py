@@ -1,6 +1,10 @@
 import pytest
-from app.services.joke_service import JokeService
-from app.core.exceptions import DuplicateJokeException, ExternalAPIException
+import gzip
+from app.services.joke_service import JokeService, ndjson_lines
+from app.models import Joke, content_hash
+from app.tasks.backfill_content_hash import backfill_content_hash
+from app.core.exceptions import DuplicateJokeException, ExternalAPIException, JokeNotFoundException
+from bson import ObjectId
 from unittest.mock import patch, AsyncMock
 
 pytestmark = pytest.mark.asyncio
@@ -28,16 +32,119 @@ class TestJokeService:
         with pytest.raises(DuplicateJokeException):
             await joke_service.create_joke(joke_text, "test456")
 
+    async def test_create_duplicate_joke_normalized(self, db):
+        """Test duplicates are detected regardless of case and whitespace"""
+        
+        joke_service = JokeService()
+        await joke_service.create_joke("Why did the scarecrow win an award?", "test123")
+        with pytest.raises(DuplicateJokeException):
+            await joke_service.create_joke("  why did the SCARECROW   win an award?", "test456")
+
+    async def test_update_joke_duplicate(self, db):
+        """Test updating a joke to another joke's text raises exception"""
+        
+        joke_service = JokeService()
+        await joke_service.create_joke("First text", "test123")
+        joke = await joke_service.create_joke("Second text", "test456")
+        with pytest.raises(DuplicateJokeException):
+            await joke_service.update_joke(joke.id, {"joke_text": "First text"})
+
+    async def test_bulk_create_jokes_in_chunks(self, db):
+        """Test bulk create across several chunks with duplicates of stored jokes"""
+        
+        joke_service = JokeService()
+        await joke_service.create_joke("Joke 3", "test123")
+        items = [{"joke_text": f"Joke {i}"} for i in range(5)]
+
+        results = await joke_service.bulk_create_jokes(items, chunk_size=2)
+
+        assert [r.status for r in results] == ["created", "created", "created", "duplicate", "created"]
+        assert await Joke.count() == 5
+
+    async def test_ndjson_lines_across_chunks(self):
+        """Test lines split across (gzip) chunks are reassembled and oversized lines skipped"""
+        body = b'{"a": 1}\n' + b"x" * 50 + b'\n{"b": 2}'
+        compressed = gzip.compress(body)
+
+        async def chunks(data, size):
+            for start in range(0, len(data), size):
+                yield data[start:start + size]
+
+        plain = [line async for lines in ndjson_lines(chunks(body, 7), max_line_bytes=20) for line in lines]
+        inflated = [line async for lines in ndjson_lines(chunks(compressed, 5), True, 20) for line in lines]
+
+        assert plain == inflated == [b'{"a": 1}', None, b'{"b": 2}']
+
+    async def test_import_jokes_in_chunks(self, db):
+        """Test import writes in chunks and dedupes against jokes imported earlier in the stream"""
+        joke_service = JokeService()
+        lines = [f'{{"joke_text": "Imported {i % 4}"}}'.encode() for i in range(6)]
+
+        async def batches():
+            yield lines[:3]
+            yield lines[3:]
+
+        result = await joke_service.import_jokes(batches(), chunk_size=2)
+
+        assert (result.created, result.duplicates) == (4, 2)
+        assert [error.index for error in result.errors] == [4, 5]
+        assert await Joke.count() == 4
+
+    async def test_backfill_content_hash(self, db):
+        """Test backfilling content hashes on jokes stored without one"""
+        
+        collection = Joke.get_motor_collection()
+        await collection.insert_many([
+            {"joke_text": "Legacy joke one"},
+            {"joke_text": "Legacy joke two"},
+            {"joke_text": "legacy joke ONE"},
+        ])
+
+        stats = await backfill_content_hash(batch_size=2)
+
+        assert stats == {"updated": 2, "duplicates": 1}
+        doc = await collection.find_one({"joke_text": "Legacy joke two"})
+        assert doc["content_hash"] == content_hash("Legacy joke two")
+
     async def test_update_joke(self, db):
         """Test updating a joke"""
         
         joke_service = JokeService()
         joke = await joke_service.create_joke("Original text", "test123")
         update_data = {"joke_text": "Updated text"}
-        updated_joke = await joke_service.update_joke(joke, update_data)
+        updated_joke = await joke_service.update_joke(joke.id, update_data)
 
         assert updated_joke.joke_text == update_data["joke_text"]
         assert updated_joke.updated_at is not None
+        stored = await Joke.get(joke.id)
+        assert stored.content_hash == content_hash("Updated text")
+
+    async def test_update_missing_joke(self, db):
+        """Test updating a joke that does not exist raises not found"""
+        
+        joke_service = JokeService()
+        with pytest.raises(JokeNotFoundException):
+            await joke_service.update_joke(ObjectId(), {"joke_text": "Nobody home"})
+
+    async def test_bulk_update_jokes(self, db):
+        """Test bulk updates report updated, duplicate, not found and invalid items"""
+        
+        joke_service = JokeService()
+        first = await joke_service.create_joke("First text", "test123")
+        second = await joke_service.create_joke("Second text", "test456")
+        items = [
+            {"id": str(first.id), "joke_text": "First text, edited"},
+            {"id": str(second.id), "joke_text": "first TEXT, edited"},
+            {"id": str(ObjectId()), "joke_text": "Missing joke"},
+            {"id": "not-an-id", "joke_text": "Bad id"},
+            {"id": str(second.id)},
+        ]
+
+        results = await joke_service.bulk_update_jokes(items)
+
+        assert [r.status for r in results] == ["updated", "duplicate", "not_found", "invalid", "invalid"]
+        assert (await Joke.get(first.id)).joke_text == "First text, edited"
+        assert (await Joke.get(second.id)).joke_text == "Second text"
 
     async def test_fetch_and_save_joke(self, db):
         """Test fetching and saving a joke from external API"""
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from pymongo.errors import PyMongoError
+from app.models import Joke, JokeStats
+from app.services.joke_service import JokeService
+from app.services.joke_stats import JokeStatsCounter, day_key, joke_stats
+
+pytestmark = pytest.mark.asyncio
+
+class TestJokeStats:
+    async def test_counters_follow_writes(self, test_client):
+        """Test creates, syncs and deletes update the counters without a recount"""
+        created = [(await test_client.post("/jokes/", json={"joke_text": f"User joke {i}"})).json() for i in range(3)]
+        await JokeService.bulk_create_jokes([{"joke_text": f"Synced joke {i}", "source_id": f"ext{i}"} for i in range(2)])
+        await test_client.delete(f"/jokes/{created[0]['_id']}")
+        await test_client.request("DELETE", "/jokes/", json={"ids": [created[1]["_id"], "6500000000000000000000aa"]})
+        await joke_stats.flush()
+
+        response = await test_client.get("/jokes/stats", params={"days": 2})
+
+        assert response.status_code == 200
+        stats = response.json()
+        assert (stats["total"], stats["external"], stats["user"]) == (3, 2, 1)
+        assert stats["per_day"] == [
+            {"date": (datetime.now() - timedelta(days=1)).date().isoformat(), "count": 0},
+            {"date": datetime.now().date().isoformat(), "count": 3},
+        ]
+
+    async def test_reads_include_unflushed_deltas(self, test_client):
+        """Test a worker sees its own writes before they are flushed"""
+        await test_client.post("/jokes/", json={"joke_text": "Fresh joke"})
+
+        stats = (await test_client.get("/jokes/stats")).json()
+
+        assert stats["total"] == 1
+        assert len(stats["per_day"]) == 30
+        assert await JokeStats.count() == 0
+
+    async def test_flush_batches_deltas(self, db, monkeypatch):
+        """Test deltas are merged into the stored counters and a failed flush keeps them"""
+        counter = JokeStatsCounter(flush_interval=1)
+        today = datetime.now()
+        for _ in range(3):
+            counter.record(today, None)
+        counter.record(today, "ext", -1)
+        await counter.flush()
+        counter.record(today, "ext")
+
+        collection = JokeStats.get_motor_collection()
+        async def failing_bulk_write(*args, **kwargs):
+            raise PyMongoError("connection lost")
+        monkeypatch.setattr(collection, "bulk_write", failing_bulk_write)
+        await counter.flush()
+        monkeypatch.undo()
+        stored = await collection.find_one({"_id": day_key(today.date())})
+
+        assert (stored["total"], stored["external"]) == (2, -1)
+        assert (await counter.read(1)).external == 0  # the failed delta is still pending
+        await counter.flush()
+        assert (await collection.find_one({"_id": "all"}))["external"] == 0
+
+    async def test_reconcile_fixes_drift(self, db):
+        """Test reconciliation recounts from the collection and drops stale days"""
+        old_day = datetime(2026, 1, 2, 12)
+        await Joke.get_motor_collection().insert_many([
+            {"joke_text": "Written behind the API's back", "created_at": old_day},
+            {"joke_text": "Synced behind the API's back", "source_id": "ext", "created_at": old_day},
+            {"joke_text": "Another today", "created_at": datetime.now()},
+        ])
+        await JokeStats.get_motor_collection().insert_many([
+            {"_id": "all", "total": 10, "external": 0},
+            {"_id": "day:2025-12-31", "total": 7, "external": 0},
+        ])
+
+        result = await joke_stats.reconcile()
+
+        assert result == {"total": 3, "total_drift": -7, "days_fixed": 3}
+        stored = {doc["_id"]: doc async for doc in JokeStats.get_motor_collection().find({})}
+        assert set(stored) == {"all", "day:2026-01-02", day_key(datetime.now().date())}
+        assert (stored["all"]["total"], stored["all"]["external"]) == (3, 1)
+        assert stored["day:2026-01-02"]["total"] == 2
+        assert stored["all"]["reconciled_at"] is not None
+
+    async def test_days_validation(self, test_client):
+        """Test the number of days is bounded"""
+        assert (await test_client.get("/jokes/stats", params={"days": 0})).status_code == 422
+        assert (await test_client.get("/jokes/stats", params={"days": 10_000})).status_code == 422
+
+    async def test_created_at_is_per_joke(self, db):
+        """Test each joke gets its own creation time, so it is counted on the right day"""
+        first = Joke(joke_text="Early joke")
+        await asyncio.sleep(0.01)
+        second = Joke(joke_text="Later joke")
+
+        assert first.created_at < second.created_at
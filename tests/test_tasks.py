@@ -0,0 +1,46 @@
+import pytest
+import httpx
+from unittest.mock import patch, AsyncMock
+from app.core.config import settings
+from app.models import Joke
+from app.tasks.joke_tasks import sync_jokes, RateLimiter
+
+pytestmark = pytest.mark.asyncio
+
+def make_response(status_code, joke=None):
+    response = AsyncMock()
+    response.status_code = status_code
+    response.json = lambda: joke
+    return response
+
+class TestJokeSync:
+    async def test_sync_jokes(self, db, monkeypatch):
+        """Test a sync run stores new jokes and reports duplicates and failures"""
+        monkeypatch.setattr(settings, "sync_max_retries", 1)
+        monkeypatch.setattr(settings, "sync_backoff_base_seconds", 0)
+        monkeypatch.setattr(settings, "sync_rate_limit", 0)
+        responses = [
+            make_response(200, {"id": "a", "joke": "External joke A"}),
+            make_response(200, {"id": "b", "joke": "External joke B"}),
+            make_response(200, {"id": "a", "joke": "External joke A"}),
+            make_response(500),
+            make_response(500),
+        ]
+
+        with patch('httpx.AsyncClient.get', side_effect=responses):
+            async with httpx.AsyncClient() as client:
+                stats = await sync_jokes(client, count=4)
+
+        assert (stats.fetched, stats.new, stats.duplicate, stats.failed) == (3, 2, 1, 1)
+        assert await Joke.count() == 2
+
+    async def test_rate_limiter_spaces_calls(self):
+        """Test the rate limiter hands out evenly spaced slots"""
+        limiter = RateLimiter(rate=100)
+        with patch('asyncio.sleep', new_callable=AsyncMock) as sleep:
+            for _ in range(3):
+                await limiter.wait()
+
+        delays = [call.args[0] for call in sleep.call_args_list]
+        assert len(delays) == 2
+        assert delays[1] > delays[0] > 0
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from bson.errors import InvalidDocument
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.core.metrics import WRITE_BATCH_SIZE
+from app.models import Joke, content_hash
+from app.services.events import joke_events
+from app.services.joke_service import JokeService
+from app.services.joke_stats import joke_stats
+from app.services.search_index import joke_search_index
+from app.services.write_coalescer import InsertCoalescer, joke_insert_coalescer
+
+pytestmark = pytest.mark.asyncio
+
+def joke_doc(text):
+    return {"joke_text": text, "content_hash": content_hash(text)}
+
+class RecordingCollection:
+    """Collection wrapper recording the size of each insert_many batch"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.batches = []
+
+    async def insert_many(self, docs, **kwargs):
+        self.batches.append(len(docs))
+        return await self.collection.insert_many(docs, **kwargs)
+
+class TestInsertCoalescer:
+    async def test_concurrent_inserts_share_a_batch(self, db):
+        """Test concurrent inserts are written in batches, each caller getting its own outcome"""
+        collection = RecordingCollection(Joke.get_motor_collection())
+        coalescer = InsertCoalescer(lambda: collection, max_size=3, max_delay=0.01)
+        await Joke.get_motor_collection().insert_one(joke_doc("Stored joke"))
+        texts = ["Joke A", "Joke B", "Stored joke", "Joke C", "Joke A"]
+
+        outcomes = await asyncio.gather(
+            *(coalescer.insert(joke_doc(text)) for text in texts), return_exceptions=True
+        )
+
+        assert [isinstance(outcome, DuplicateKeyError) for outcome in outcomes] == [False, False, True, False, True]
+        assert collection.batches == [3, 2]
+        assert await Joke.count() == 4
+
+    async def test_flush_after_delay(self, db):
+        """Test a lone insert is flushed once the batch window ends"""
+        coalescer = InsertCoalescer(Joke.get_motor_collection, max_size=100, max_delay=0.01)
+
+        await asyncio.wait_for(coalescer.insert(joke_doc("Lonely joke")), 1)
+
+        assert await Joke.count() == 1
+
+    async def test_unexpected_error_reaches_every_caller(self, db):
+        """Test a batch failing with a non-PyMongo error fails its callers instead of leaving them waiting"""
+        class BrokenCollection:
+            async def insert_many(self, docs, **kwargs):
+                raise InvalidDocument("cannot encode object")
+
+        coalescer = InsertCoalescer(BrokenCollection, max_size=2, max_delay=0.01)
+
+        outcomes = await asyncio.wait_for(asyncio.gather(
+            *(coalescer.insert(joke_doc(text)) for text in ("Joke A", "Joke B", "Joke C")), return_exceptions=True
+        ), 1)
+
+        assert [type(outcome) for outcome in outcomes] == [InvalidDocument] * 3
+
+    async def test_create_joke_endpoint_semantics(self, test_client, monkeypatch):
+        """Test coalesced POST /jokes/ keeps 201 for new jokes and 400 for duplicates"""
+        monkeypatch.setattr(settings, "write_coalescing", True)
+        before = WRITE_BATCH_SIZE.count()
+        texts = [f"Burst joke {i}" for i in range(8)] + ["Burst joke 0"]
+
+        responses = await asyncio.gather(*(test_client.post("/jokes/", json={"joke_text": text}) for text in texts))
+
+        assert sorted(response.status_code for response in responses) == [201] * 8 + [400]
+        created = [response.json() for response in responses if response.status_code == 201]
+        fetched = (await test_client.get(f"/jokes/{created[0]['_id']}")).json()
+        assert fetched["joke_text"] == created[0]["joke_text"]
+        assert WRITE_BATCH_SIZE.count() > before
+        assert await Joke.count() == 8
+
+    async def test_cancelled_create_still_records_joke(self, db, monkeypatch):
+        """Test a create cancelled while its joke waits in a batch still counts, indexes and publishes it"""
+        monkeypatch.setattr(settings, "write_coalescing", True)
+        monkeypatch.setattr(joke_insert_coalescer, "max_delay", 0.05)
+        events = joke_events.subscribe()
+
+        task = asyncio.create_task(JokeService.create_joke("Abandoned joke"))
+        while not joke_insert_coalescer._pending:
+            await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        frame = await asyncio.wait_for(events.next(), 1)
+
+        assert task.cancelled()
+        assert await Joke.count() == 1
+        assert b"event: created" in frame
+        assert joke_search_index.search("abandoned")[0] == 1
+        assert (await joke_stats.read(1)).total == 1
+